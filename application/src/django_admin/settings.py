@@ -24,6 +24,9 @@ for cfg in (BASE_DIR / "config").glob("*.yml"):
 if 'database' not in custom_settings:
     custom_settings['database'] = {}
 
+if 'cache' not in custom_settings:
+    custom_settings['cache'] = {}
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/3.1/howto/deployment/checklist/
 
@@ -83,6 +86,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'tira.request_memo.RequestMemoMiddleware',
+    'tira.git_clients.GitClientMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'django_admin.urls'
@@ -249,19 +254,43 @@ GIT_CI_AVAILABLE_RESOURCES = {
 }
 
 DEFAULT_GIT_INTEGRATION_URL = 'https://git.webis.de/code-research/tira'
+# The size of the thread pools that refresh the data from the git hosters and the rate limit of requests to each host
+GIT_REFRESH_THREADS = custom_settings.get('git_refresh_threads', 8)
+GIT_REQUESTS_PER_SECOND_PER_HOST = custom_settings.get('git_requests_per_second_per_host', 20)
+# Requests to the git hosters that fail with 429 or 5xx are retried with jittered exponential backoff (in seconds)
+GIT_RETRIES = custom_settings.get('git_retries', 3)
+GIT_RETRY_BACKOFF = custom_settings.get('git_retry_backoff', 0.5)
+# The shared secret of GitLab webhooks (api/gitlab-webhook) that report pipeline states. Disabled if None.
+GITLAB_WEBHOOK_SECRET = custom_settings.get('gitlab_webhook_secret', None)
+
+# Zips of published runs are cached in this directory (disabled if None), at most the given bytes (no limit if None)
+RUN_ARCHIVE_CACHE_DIR = custom_settings.get('run_archive_cache_dir', None)
+RUN_ARCHIVE_CACHE_MAX_BYTES = custom_settings.get('run_archive_cache_max_bytes', None)
+
+# Exports of ir_datasets are cached in this directory to link them into new datasets (disabled if None)
+IRDS_EXPORT_CACHE_DIR = custom_settings.get('irds_export_cache_dir', TIRA_ROOT / "state" / "irds-export-cache")
 
 IR_MEASURES_IMAGE = custom_settings.get('IR_MEASURES_IMAGE', 'webis/tira-ir-measures-evaluator:0.0.1')
 IR_MEASURES_COMMAND = custom_settings.get('IR_MEASURES_COMMAND', 'echo "hello world"')
 
-# Caching
+# Caching: a per-process LRU cache in front of a shared backend (configurable via the "cache" section of the config)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
-        'LOCATION': 'tira_database_cache_table',
+        'BACKEND': 'tira.tiered_cache.TieredCache',
         'TIMEOUT': 900, # 900 seconds (i.e., 15 minutes) as timeout, to use for the cache
         'OPTIONS': {
-            'MAX_ENTRIES': 100000
+            'SHARED_CACHE': 'shared',
+            'LOCAL_MAX_ENTRIES': custom_settings['cache'].get('local_max_entries', 1000),
+            'LOCAL_TIMEOUT': custom_settings['cache'].get('local_timeout', 10),
         }
+    },
+    'shared': {
+        # The entries of TieredCache are (refreshed_at, value) tuples, the prefix separates them from older raw values
+        'KEY_PREFIX': 'tiered',
+        'BACKEND': custom_settings['cache'].get('backend', 'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': custom_settings['cache'].get('location', 'tira_database_cache_table'),
+        'TIMEOUT': 900,
+        'OPTIONS': custom_settings['cache'].get('options', {'MAX_ENTRIES': 100000})
     }
 }
 
@@ -453,28 +453,22 @@ Best regards'''
         organizer_id_from_dataset_id, organizer_id_from_run_id = None, None
 
         if run_id_from_params:
-            try:
-                dataset_id_from_run = model.get_run(run_id=run_id_from_params, vm_id=None, dataset_id=None)['dataset']
-                organizer_id_from_run_id = model.get_dataset(dataset_id_from_run)['organizer_id']
-            except:
+            run = model.get_run_permission_metadata(run_id_from_params)
+            dataset_of_run = model.get_dataset_permission_metadata(run['dataset_id']) \
+                if run and not run['deleted'] else None
+            if not dataset_of_run:
                 return False
+            organizer_id_from_run_id = dataset_of_run['organizer_id']
 
         if dataset_id_from_params:
-            try:
-                organizer_id_from_dataset_id = model.get_dataset(dataset_id_from_params).get('organizer_id', None)
-            except:
-                return False
+            organizer_id_from_dataset_id = (model.get_dataset_permission_metadata(dataset_id_from_params) or {}) \
+                .get('organizer_id', None)
 
         potentially_inconsistent_ids = [organizer_id_from_params, organizer_id_from_dataset_id, organizer_id_from_run_id]
         if len(set([i for i in potentially_inconsistent_ids if i is not None])) > 1:
             return False
 
-        task = None
-        if task_id:
-            try:
-                task = model.get_task(task_id)
-            except:
-                pass
+        task = model.get_task_permission_metadata(task_id) if task_id else None
 
         return path == '/api/organizer-list' \
                or (task and 'organizer_id' in task and task['organizer_id'] in organizer_ids) \
@@ -52,15 +52,15 @@ def check_permissions(func):
                 return redirect('tira:request_vm')
             role = auth.get_role(request, user_id=auth.get_user_id(request), vm_id=vm_id)
             if run_id and dataset_id:  # this prevents participants from viewing hidden runs
-                if not model.run_exists(vm_id, dataset_id, run_id):
+                run = model.get_run_permission_metadata(run_id)
+                if not run:
                     return Http404(f'The VM {vm_id} has no run with the id {run_id} on {dataset_id}.')
-                review = model.get_run_review(dataset_id, vm_id, run_id)
-                dataset = model.get_dataset(dataset_id)
-                is_review_visible = (not review['blinded']) or review['published'] or not dataset.get('is_confidential', True)
+                dataset = model.get_dataset_permission_metadata(dataset_id) or {}
+                is_review_visible = (not run['blinded']) or run['published'] or not dataset.get('is_confidential', True)
                 if not is_review_visible:
                     role = auth.ROLE_USER
             if task_id:  # This checks if the registration requirement is fulfilled.
-                if model.get_task(task_id)["require_registration"]:
+                if model.get_task_permission_metadata(task_id)["require_registration"]:
                     if not model.user_is_registered(task_id, request):
                         return HttpResponseNotAllowed(f"Access forbidden. You must register first.")
 
@@ -123,12 +123,12 @@ def check_conditional_permissions(restricted=False, public_data_ok=False, privat
                 role_on_vm = auth.get_role(request, user_id=auth.get_user_id(request), vm_id=vm_id)
                 if run_id and dataset_id:
                     role = auth.ROLE_USER
-                    if not model.run_exists(vm_id, dataset_id, run_id):
+                    run = model.get_run_permission_metadata(run_id)
+                    if not run:
                         return Http404(f'The VM {vm_id} has no run with the id {run_id} on {dataset_id}.')
 
-                    review = model.get_run_review(dataset_id, vm_id, run_id)
-                    is_review_visible = (not review['blinded']) or review['published']
-                    is_dataset_confidential = model.get_dataset(dataset_id).get('is_confidential', True)
+                    is_review_visible = (not run['blinded']) or run['published']
+                    is_dataset_confidential = (model.get_dataset_permission_metadata(dataset_id) or {}).get('is_confidential', True)
                     # if the run is visible OR if we make an exception for public datasets
                     if is_review_visible:
                         role = role_on_vm
@@ -140,7 +140,7 @@ def check_conditional_permissions(restricted=False, public_data_ok=False, privat
                     role = role_on_vm
 
                 if task_id and not not_registered_ok:  # This checks if the registration requirement is fulfilled.
-                    if model.get_task(task_id)["require_registration"]:
+                    if model.get_task_permission_metadata(task_id)["require_registration"]:
                         if not model.user_is_registered(task_id, request):
                             return HttpResponseNotAllowed(f"Access forbidden. You must register first.")
 
@@ -3,6 +3,7 @@ from pathlib import Path
 import logging
 from django.conf import settings
 from django.db import IntegrityError
+from django.db.models import Count, Q
 from shutil import rmtree
 from datetime import datetime as dt
 import randomname
@@ -19,6 +20,14 @@ import tira.data.data as dbops
 logger = logging.getLogger("tira_db")
 
 
+def _is_numeric(value):
+    try:
+        float(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
 class HybridDatabase(object):
     """
     This is the class to interface a the Tira Model from a Database.
@@ -73,26 +82,37 @@ class HybridDatabase(object):
                                               roles='reviewer')
         self._save_vm(vm_id=admin_user_name, user_name=admin_user_name, initial_user_password=admin_password)
 
-    def index_model_from_files(self):
+    def index_model_from_files(self, processes=None):
+        """ Index the model from the protobuf files. Returns the throughput statistics of each indexing phase. """
         self.vm_list_file.touch(exist_ok=True)
-        dbops.index(self.organizers_file_path, self.users_file_path, self.vm_dir_path, self.tasks_dir_path,
-                    self.datasets_dir_path, self.softwares_dir_path, self.runs_dir_path)
+        return dbops.index(self.organizers_file_path, self.users_file_path, self.vm_dir_path, self.tasks_dir_path,
+                           self.datasets_dir_path, self.softwares_dir_path, self.runs_dir_path, processes)
+
+    def build_model(self):
+        """ Incrementally re-index the model: only files that changed since they were last indexed are parsed. """
+        self.vm_list_file.touch(exist_ok=True)
+        return dbops.reindex(self.organizers_file_path, self.users_file_path, self.vm_dir_path, self.tasks_dir_path,
+                             self.datasets_dir_path, self.softwares_dir_path, self.runs_dir_path)
 
     def reload_vms(self):
         """ reload VM and user data from the export format of the model """
-        dbops.reload_vms(self.users_file_path, self.vm_dir_path)
+        return dbops.reload_vms(self.users_file_path, self.vm_dir_path)
 
     def reload_datasets(self):
         """ reload dataset data from the export format of the model """
-        dbops.reload_datasets(self.datasets_dir_path)
+        return dbops.reload_datasets(self.datasets_dir_path)
 
     def reload_tasks(self):
         """ reload task data from the export format of the model """
-        dbops.reload_tasks(self.tasks_dir_path)
+        return dbops.reload_tasks(self.tasks_dir_path)
 
     def reload_runs(self, vm_id):
-        """ reload run data for a VM from the export format of the model """
-        dbops.reload_runs(self.runs_dir_path, vm_id)
+        """ reload run data for a VM from the export format of the model. Only new or changed runs are parsed. """
+        return dbops.reload_runs(self.runs_dir_path, vm_id)
+
+    def reload_run_dirs(self, run_dirs):
+        """ reload the runs in the passed run directories (i.e., runs_dir_path/<dataset_id>/<vm_id>/<run_id>) """
+        return dbops.reload_run_dirs(self.runs_dir_path, run_dirs)
 
     # _load methods parse files on the fly when pages are called
     def load_review(self, dataset_id, vm_id, run_id):
@@ -283,10 +303,38 @@ class HybridDatabase(object):
         return self._task_to_dict(modeldb.Task.objects.select_related('organizer').get(task_id=task_id),
                                   include_dataset_stats)
 
-    def _dataset_to_dict(self, dataset):
+    @staticmethod
+    def _dataset_stats(dataset_ids) -> dict:
+        """ Count the softwares, runs, evaluations, and published evaluations of all passed datasets at once.
+        Uses two aggregated queries, independent of the number of datasets and runs.
+
+        :returns: a dict {dataset_id: {"software_count", "runs_count", "evaluations_count", "evaluations_public_count"}}
+        """
+        ret = {dataset_id: {"software_count": 0, "runs_count": 0, 'evaluations_count': 0, 'evaluations_public_count': 0}
+               for dataset_id in dataset_ids}
+
+        for stats in modeldb.Software.objects.filter(dataset__dataset_id__in=dataset_ids).values('dataset_id') \
+                .annotate(software_count=Count('id')):
+            ret[stats['dataset_id']]["software_count"] = stats['software_count']
+
+        for stats in modeldb.Run.objects.filter(input_dataset__dataset_id__in=dataset_ids, deleted=False) \
+                .values('input_dataset_id') \
+                .annotate(runs_count=Count('run_id'),
+                          evaluations_count=Count('run_id', filter=Q(evaluator__isnull=False)),
+                          evaluations_public_count=Count('run_id', filter=Q(evaluator__isnull=False,
+                                                                            review__published=True))):
+            ret[stats['input_dataset_id']].update({"runs_count": stats['runs_count'],
+                                                   'evaluations_count': stats['evaluations_count'],
+                                                   'evaluations_public_count': stats['evaluations_public_count']})
+
+        return ret
+
+    def _dataset_to_dict(self, dataset, stats=None):
+        """ Serialize a modeldb.Dataset. The counts of softwares, runs, and evaluations are only included if the
+        stats of the dataset (as returned by _dataset_stats) are passed.
+        """
         evaluator_id = None if not dataset.evaluator else dataset.evaluator.evaluator_id
-        runs = modeldb.Run.objects.filter(input_dataset__dataset_id=dataset.dataset_id, deleted=False)
-        return {
+        ret = {
             "display_name": dataset.display_name,
             "evaluator_id": evaluator_id,
             "dataset_id": dataset.dataset_id,
@@ -295,11 +343,6 @@ class HybridDatabase(object):
             "task": dataset.default_task.task_id,
             'organizer': dataset.default_task.organizer.name,
             'organizer_id': dataset.default_task.organizer.organizer_id,
-            "software_count": modeldb.Software.objects.filter(dataset__dataset_id=dataset.dataset_id).count(),
-            "runs_count": runs.count(),
-            'evaluations_count': runs.filter(evaluator__isnull=False).count(),
-            'evaluations_public_count': modeldb.Review.objects.filter(run__run_id__in=[r.run_id for r in runs.filter(evaluator__isnull=False)]
-                                                                      ).filter(published=True).count(),
             "default_upload_name": dataset.default_upload_name,
             "created": dataset.created,
             "last_modified": dataset.last_modified,
@@ -307,18 +350,34 @@ class HybridDatabase(object):
             "irds_import_command": dataset.irds_import_command,
             "irds_import_truth_command": dataset.irds_import_truth_command,
         }
+        if stats is not None:
+            ret.update(stats)
 
-    def get_dataset(self, dataset_id: str) -> dict:
+        return ret
+
+    def _datasets_to_dicts(self, datasets, include_stats=True) -> list:
+        """ Serialize a list of modeldb.Dataset and compute their stats with the same queries. """
+        stats = self._dataset_stats([d.dataset_id for d in datasets]) if include_stats else {}
+        return [self._dataset_to_dict(d, stats.get(d.dataset_id)) for d in datasets]
+
+    def get_dataset(self, dataset_id: str, include_stats=True) -> dict:
+        """ Return the dataset as dict, or {} if it does not exist.
+        @param include_stats: If False, skip counting the softwares, runs, and evaluations of the dataset.
+        """
         try:
-            return self._dataset_to_dict(modeldb.Dataset.objects.select_related('default_task', 'evaluator')
-                                         .get(dataset_id=dataset_id))
+            dataset = modeldb.Dataset.objects.select_related('default_task__organizer', 'evaluator') \
+                .get(dataset_id=dataset_id)
         except modeldb.Dataset.DoesNotExist:
             return {}
 
+        return self._datasets_to_dicts([dataset], include_stats)[0]
+
     def get_datasets(self) -> dict:
         """ Get a dict of dataset_id: dataset_json_descriptor """
-        return {dataset.dataset_id: self._dataset_to_dict(dataset)
-                for dataset in modeldb.Dataset.objects.select_related('default_task', 'evaluator').all()}
+        datasets = self._datasets_to_dicts(
+            list(modeldb.Dataset.objects.select_related('default_task__organizer', 'evaluator').all()))
+
+        return {dataset['dataset_id']: dataset for dataset in datasets}
 
     def get_datasets_by_task(self, task_id: str, include_deprecated=False) -> list:
         """ return the list of datasets associated with this task_id
@@ -326,9 +385,10 @@ class HybridDatabase(object):
         @param include_deprecated: Default False. If True, also returns datasets marked as deprecated.
         @return: a list of json-formatted datasets, as returned by get_dataset
         """
-        return [self._dataset_to_dict(d.dataset)
-                for d in modeldb.TaskHasDataset.objects.filter(task=task_id)
-                if not (d.dataset.is_deprecated and not include_deprecated)]
+        return self._datasets_to_dicts(
+            [d.dataset for d in modeldb.TaskHasDataset.objects
+                .select_related('dataset__default_task__organizer', 'dataset__evaluator').filter(task=task_id)
+             if not (d.dataset.is_deprecated and not include_deprecated)])
 
     def get_docker_software(self, docker_software_id: str) -> dict:
         try:
@@ -447,15 +507,19 @@ class HybridDatabase(object):
                     .filter(input_dataset__dataset_id=dataset_id, software__vm__vm_id=vm_id)
                 if (run.deleted or not return_deleted)]
 
-    def _get_ordered_runs_from_reviews(self, reviews, vm_id, preloaded=True, is_upload=False, is_docker=False):
-        """ yields all runs with reviews and their evaluation runs with reviews produced by software from a given vm
+    # The relations of modeldb.Review that _get_ordered_runs_from_reviews accesses, to avoid one query per run
+    _review_run_relations = ('run', 'run__software', 'run__evaluator', 'run__docker_software__vm', 'run__upload',
+                             'run__input_run', 'run__input_dataset')
+
+    def _get_ordered_runs_from_reviews(self, reviews, evaluation_reviews, is_upload=False, is_docker=False):
+        """ yields all runs with reviews and their evaluation runs with reviews.
             evaluation runs (which have a run as input run) are yielded directly after the runs they use.
 
-        :param reviews: a querySet of modeldb.Review objects to
-        :param vm_id: the vm_id of the software or upload
-        :param preloaded: If False, do a new database request to get the evaluation runs.
-            Otherwise assume they were preloaded
-        :param is_upload: if true, get only uploaded runs
+        :param reviews: an iterable of modeldb.Review objects of the runs, e.g., all reviews of one software
+        :param evaluation_reviews: a dict that maps the run_id of an input run to the modeldb.Review objects of
+            its evaluation runs (see _group_reviews_by_input_run). No queries are issued to find evaluation runs.
+        :param is_upload: mark the runs as uploaded runs
+        :param is_docker: mark the runs as runs of docker software
         """
         def _run_dict(review_obj):
             run = self._run_as_dict(review_obj.run)
@@ -467,28 +531,29 @@ class HybridDatabase(object):
             run['is_docker'] = is_docker
             return run
 
-        if is_upload:
-            reviews_qs = reviews.filter(run__upload__vm__vm_id=vm_id).all()
-        elif is_docker:
-            reviews_qs = reviews.filter(run__docker_software__vm__vm_id=vm_id).all()
-        else:
-            reviews_qs = reviews.filter(run__software__vm__vm_id=vm_id).all()
-
-        for review in reviews_qs:
+        for review in reviews:
             yield _run_dict(review)
 
-            r2 = reviews.filter(run__input_run__run_id=review.run.run_id).all() if preloaded \
-                else modeldb.Review.objects.select_related('run').filter(run__input_run__run_id=review.run.run_id).all()
-
-            for review2 in r2:
+            for review2 in evaluation_reviews.get(review.run.run_id, []):
                 yield _run_dict(review2)
 
+    @staticmethod
+    def _group_reviews_by_input_run(reviews):
+        """ Group the modeldb.Review objects of evaluation runs by the run_id of their input run. """
+        ret = {}
+        for review in reviews:
+            if review.run.input_run_id:
+                ret.setdefault(review.run.input_run_id, []).append(review)
+
+        return ret
+
     def get_upload_with_runs(self, task_id, vm_id):
         def _runs_by_upload(up):
-            reviews = modeldb.Review.objects.select_related("run", "run__upload", "run__evaluator", "run__input_run",
-                                                            "run__input_dataset").filter(run__upload=up).all()
+            reviews = modeldb.Review.objects.select_related(*self._review_run_relations).filter(run__upload=up)
+            evaluation_reviews = self._group_reviews_by_input_run(
+                modeldb.Review.objects.select_related(*self._review_run_relations).filter(run__input_run__upload=up))
 
-            return list(self._get_ordered_runs_from_reviews(reviews, vm_id, preloaded=False, is_upload=True))
+            return list(self._get_ordered_runs_from_reviews(reviews, evaluation_reviews, is_upload=True))
 
         try:
             upload = modeldb.Upload.objects.get(vm__vm_id=vm_id, task__task_id=task_id)
@@ -513,18 +578,22 @@ class HybridDatabase(object):
                 }
 
     def get_docker_softwares_with_runs(self, task_id, vm_id):
-        def _runs_by_docker_software(ds):
-            reviews = modeldb.Review.objects.select_related("run", "run__upload", "run__evaluator", "run__input_run",
-                                                            "run__input_dataset").filter(run__docker_software=ds).all()
+        docker_softwares = modeldb.DockerSoftware.objects.select_related('task', 'vm', 'input_docker_software') \
+            .filter(vm__vm_id=vm_id, task__task_id=task_id, deleted=False)
 
-            return list(self._get_ordered_runs_from_reviews(reviews, vm_id, preloaded=False, is_docker=True))
-    
-        docker_softwares = modeldb.DockerSoftware.objects.filter(vm__vm_id=vm_id, task__task_id=task_id, deleted=False)
+        reviews_by_docker_software = {}
+        for review in modeldb.Review.objects.select_related(*self._review_run_relations) \
+                .filter(run__docker_software__in=docker_softwares):
+            reviews_by_docker_software.setdefault(review.run.docker_software_id, []).append(review)
 
-        docker_softwares = [{**self._docker_software_to_dict(ds), 'runs': _runs_by_docker_software(ds)}
-                            for ds in docker_softwares]
+        evaluation_reviews = self._group_reviews_by_input_run(
+            modeldb.Review.objects.select_related(*self._review_run_relations)
+            .filter(run__input_run__docker_software__in=docker_softwares))
 
-        return docker_softwares
+        return [{**self._docker_software_to_dict(ds),
+                 'runs': list(self._get_ordered_runs_from_reviews(
+                     reviews_by_docker_software.get(ds.docker_software_id, []), evaluation_reviews, is_docker=True))
+                 } for ds in docker_softwares]
 
     def delete_docker_software(self, task_id, vm_id, docker_software_id):
         software_qs = modeldb.DockerSoftware.objects.filter(vm_id=vm_id, task_id=task_id,
@@ -587,26 +656,31 @@ class HybridDatabase(object):
          "blinded_count": blinded_count,
          "published_count": published_count}
          """
-        results = []
-        reviews = modeldb.Review.objects.select_related('run', 'run__software', 'run__docker_software',
-                                                        'run__evaluator', 'run__upload',
-                                                        'run__input_run').filter(
-            run__input_dataset__dataset_id=dataset_id).all()
-
-        upload_vms = {vm_id["run__upload__vm__vm_id"] for vm_id in reviews.values('run__upload__vm__vm_id')}
-        software_vms = {vm_id["run__software__vm__vm_id"] for vm_id in reviews.values('run__software__vm__vm_id')}
-        docker_vms = {vm_id["run__docker_software__vm__vm_id"] for vm_id in reviews.values('run__docker_software__vm__vm_id')}
+        reviews = list(modeldb.Review.objects.select_related(*self._review_run_relations)
+                       .filter(run__input_dataset__dataset_id=dataset_id))
+        evaluation_reviews = self._group_reviews_by_input_run(reviews)
+
+        # group the reviews by the vm that produced the run: {vm_id: {'upload': [...], 'software': [...], ...}}
+        reviews_by_vm = {}
+        for review in reviews:
+            run = review.run
+            if run.upload:
+                reviews_by_vm.setdefault(run.upload.vm_id, {}).setdefault('upload', []).append(review)
+            if run.software:
+                reviews_by_vm.setdefault(run.software.vm_id, {}).setdefault('software', []).append(review)
+            if run.docker_software:
+                reviews_by_vm.setdefault(run.docker_software.vm_id, {}).setdefault('docker', []).append(review)
 
-        for vm_id in upload_vms.union(software_vms).union(docker_vms):
+        results = []
+        for vm_id, vm_reviews in reviews_by_vm.items():
             if not vm_id:
                 continue
             runs = []
-            if vm_id in upload_vms:
-                runs += list(self._get_ordered_runs_from_reviews(reviews, vm_id, is_upload=True))
-            if vm_id in software_vms:
-                runs += list(self._get_ordered_runs_from_reviews(reviews, vm_id, is_upload=False))
-            if vm_id in docker_vms:
-                runs += list(self._get_ordered_runs_from_reviews(reviews, vm_id, is_docker=True))
+            runs += list(self._get_ordered_runs_from_reviews(vm_reviews.get('upload', []), evaluation_reviews,
+                                                             is_upload=True))
+            runs += list(self._get_ordered_runs_from_reviews(vm_reviews.get('software', []), evaluation_reviews))
+            runs += list(self._get_ordered_runs_from_reviews(vm_reviews.get('docker', []), evaluation_reviews,
+                                                             is_docker=True))
 
             results.append({"vm_id": vm_id,
                             "runs": runs,
@@ -675,6 +749,8 @@ class HybridDatabase(object):
             which will be the column titles, and a list of evaluations. Each evaluations contains the vm and run id
             to identify it, and a key 'measures' which holds the scores in the same order as 'ev-keys'/
 
+        The leaderboard is read from the materialized modeldb.LeaderboardEntry rows of the dataset with a single
+        query. The rows are kept up to date by dbops whenever runs, evaluations, or reviews change.
 
         @param include_unpublished: If True, also contains evaluations that were not marked as 'published'
         @param round_floats: If True, round float-valued scores to 3 digits.
@@ -692,81 +768,64 @@ class HybridDatabase(object):
             except ValueError:
                 return fl
 
-        def format_evaluation(r, ks, run_id_to_software_name):
-            """
-            @param r: a queryset of modeldb.Run
-            @param ks: a list of keys of evaluation parameters
-            """
-            def if_exists(evals):
-                for k in ks:
-                    ev = evals.filter(run__run_id=run.run_id, measure_key=k).all()
-                    if ev.exists():
-                        yield round_if_float(ev[0].measure_value)
-                    else:
-                        yield "-"
-
-            # print(r.all().values())
-            for run in r:
-                if run.run_id in exclude:
-                    continue
-                values = evaluations.filter(run__run_id=run.run_id).all()
-                if not values.exists():
-                    continue
-                try:
-                    input_run = run.input_run
-                    # print(input_run.software)
-                    # print(input_run.docker_software)
-                    # print(input_run.upload)
-                    software_name = ''
-                    if input_run.software:
-                        vm_id = run.input_run.software.vm.vm_id
-                    elif input_run.docker_software:
-                        vm_id = run.input_run.docker_software.vm.vm_id
-                        software_name = run.input_run.docker_software.display_name
-                    elif input_run.upload:
-                        vm_id = run.input_run.upload.vm.vm_id
-                        software_name = 'Run Upload'
-                    else:
-                        logger.error(
-                            f"The input run {run.run_id} has no vm assigned. Assigning None instead")
-                        vm_id = "None"
-
-                except AttributeError as e:
-                    logger.error(f"The vm or software of run {run.run_id} does not exist. Maybe either was deleted?", e)
-                    vm_id = "None"
-
-                rev = modeldb.Review.objects.get(run__run_id=run.run_id)
-
-                yield {"vm_id": vm_id,
-                       "run_id": run.run_id if '-evaluated-run-' not in run.run_id else run.run_id.split('-evaluated-run-')[1],
-                       'input_run_id': run.input_run.run_id,
-                       "input_software_name": software_name,
-                       'published': rev.published,
-                       'blinded': rev.blinded,
-                       "measures": list(if_exists(evaluations))}
-
-        run_id_to_software_name = {}
-
-        for run in modeldb.Run.objects.filter(input_dataset=dataset_id).exclude(input_run__isnull=False).all():
-            docker_software = run.docker_software
-            if not docker_software:
-                continue
+        entries = list(modeldb.LeaderboardEntry.objects.filter(dataset__dataset_id=dataset_id))
+        keys = list(dict.fromkeys(k for entry in entries for k, _ in entry.measures))
 
-            docker_software_name = docker_software.display_name
-            if not docker_software_name:
+        ret = []
+        for entry in entries:
+            if entry.input_run_id is None or (entry.hidden and not include_unpublished):
                 continue
 
-            run_id_to_software_name[run.run_id] = docker_software_name
+            measures = dict(entry.measures)
+            ret.append({"vm_id": entry.vm_id,
+                        "run_id": entry.display_run_id,
+                        'input_run_id': entry.input_run_id,
+                        "input_software_name": entry.input_software_name,
+                        'published': entry.published,
+                        'blinded': entry.blinded,
+                        "measures": [round_if_float(measures[k]) if k in measures else "-" for k in keys]})
 
-        runs = modeldb.Run.objects.filter(input_dataset=dataset_id).exclude(input_run__isnull=True).all()
-        evaluations = modeldb.Evaluation.objects.select_related('run', 'run__software__vm').filter(
-            run__input_dataset__dataset_id=dataset_id).all()
-        keys = [k['measure_key'] for k in evaluations.values('measure_key').distinct()]
+        return keys, ret
 
-        exclude = {review.run.run_id for review in modeldb.Review.objects.select_related('run').filter(
-            run__input_dataset__dataset_id=dataset_id, published=False, run__software=None).all()
-                   if not include_unpublished}
-        return keys, list(format_evaluation(runs, keys, run_id_to_software_name))
+    @staticmethod
+    def _exported_evaluations(dataset_ids):
+        return modeldb.LeaderboardEntry.objects.filter(dataset__dataset_id__in=dataset_ids, input_run_id__isnull=False)
+
+    def get_evaluation_measures_for_export(self, dataset_ids):
+        """ The keys of all evaluation measures on the datasets (in the order of first occurrence), mapped to True if
+        all values of the measure are numeric. """
+        ret = {}
+        for measures in self._exported_evaluations(dataset_ids).values_list('measures', flat=True).iterator():
+            for key, value in measures:
+                ret[key] = ret.get(key, True) and _is_numeric(value)
+
+        return ret
+
+    def get_evaluations_for_export(self, dataset_ids, chunk_size=2000):
+        """ Yields all evaluations on the datasets (including unpublished ones) joined with the metadata of the
+        evaluated submissions, ordered by dataset, team, and run. Each evaluation is a dict with {dataset, team, run_id,
+        evaluation_run_id, software, is_upload, is_docker, published, blinded, measures: {measure_key: value}}, the
+        values of the measures are the strings as reported by the evaluator.
+        The evaluations are read in chunks of chunk_size rows, so that exports of many datasets need little memory. """
+        entries = self._exported_evaluations(dataset_ids) \
+            .select_related('dataset', 'run__input_run__software', 'run__input_run__docker_software',
+                            'run__input_run__upload') \
+            .order_by('dataset__dataset_id', 'vm_id', 'input_run_id', 'run__run_id')
+
+        for entry in entries.iterator(chunk_size=chunk_size):
+            input_run = entry.run.input_run
+            software = 'upload' if input_run.upload_id else None
+            if input_run.software:
+                software = input_run.software.software_id
+            elif input_run.docker_software:
+                software = input_run.docker_software.display_name
+
+            yield {"dataset": entry.dataset.dataset_id, "team": entry.vm_id, "run_id": entry.input_run_id,
+                   "evaluation_run_id": entry.run_id, "software": software,
+                   "is_upload": input_run.upload_id is not None,
+                   "is_docker": input_run.docker_software_id is not None,
+                   "published": entry.published, "blinded": entry.blinded,
+                   "measures": dict(entry.measures)}
 
     def get_evaluation(self, run_id):
         try:
@@ -779,14 +838,21 @@ class HybridDatabase(object):
         return {}
 
     def get_software_with_runs(self, task_id, vm_id):
-        def _runs_by_software(software):
-            reviews = modeldb.Review.objects.select_related("run", "run__software", "run__evaluator", "run__input_run",
-                                                            "run__input_dataset").filter(run__software=software).all()
-            return list(self._get_ordered_runs_from_reviews(reviews, vm_id, preloaded=False))
+        softwares = modeldb.Software.objects.select_related('task', 'vm', 'dataset') \
+            .filter(vm__vm_id=vm_id, task__task_id=task_id, deleted=False)
+
+        reviews_by_software = {}
+        for review in modeldb.Review.objects.select_related(*self._review_run_relations) \
+                .filter(run__software__in=softwares):
+            reviews_by_software.setdefault(review.run.software_id, []).append(review)
+
+        evaluation_reviews = self._group_reviews_by_input_run(
+            modeldb.Review.objects.select_related(*self._review_run_relations)
+            .filter(run__input_run__software__in=softwares))
 
         return [{"software": self._software_to_dict(s),
-                 "runs": _runs_by_software(s)
-                 } for s in modeldb.Software.objects.filter(vm__vm_id=vm_id, task__task_id=task_id, deleted=False)]
+                 "runs": list(self._get_ordered_runs_from_reviews(reviews_by_software.get(s.id, []), evaluation_reviews))
+                 } for s in softwares]
 
     @staticmethod
     def _review_as_dict(review):
@@ -801,6 +867,49 @@ class HybridDatabase(object):
         review = modeldb.Review.objects.get(run__run_id=run_id)
         return self._review_as_dict(review)
 
+    @staticmethod
+    def delete_job_configurations_of_docker_software(docker_software_id):
+        """ Remove the stored job configurations of the docker software, e.g., after its metadata changed. """
+        modeldb.JobConfiguration.objects.filter(software_id=f'docker-software-{docker_software_id}').delete()
+
+    @staticmethod
+    def get_run_permission_metadata(run_id: str):
+        """ Returns the dataset_id, the vm_id, the deleted flag, and the visibility of the review (blinded, published)
+        of a run with one query, or None if the run does not exist. """
+        run = modeldb.Run.objects.filter(run_id=run_id).values(
+            'input_dataset_id', 'software__vm_id', 'upload__vm_id', 'docker_software__vm_id', 'deleted',
+            'review__blinded', 'review__published').first()
+        if run is None:
+            return None
+
+        return {'dataset_id': run['input_dataset_id'],
+                'vm_id': run['software__vm_id'] or run['upload__vm_id'] or run['docker_software__vm_id'],
+                'deleted': run['deleted'],
+                'blinded': True if run['review__blinded'] is None else run['review__blinded'],
+                'published': bool(run['review__published'])}
+
+    @staticmethod
+    def get_dataset_permission_metadata(dataset_id: str):
+        """ Returns the task_id, organizer_id, and is_confidential of a dataset with one query, or None if the dataset
+        does not exist. """
+        dataset = modeldb.Dataset.objects.filter(dataset_id=dataset_id).values(
+            'default_task_id', 'default_task__organizer_id', 'is_confidential').first()
+        if dataset is None:
+            return None
+
+        return {'task_id': dataset['default_task_id'], 'organizer_id': dataset['default_task__organizer_id'],
+                'is_confidential': dataset['is_confidential']}
+
+    @staticmethod
+    def get_task_permission_metadata(task_id: str):
+        """ Returns the organizer_id and require_registration of a task with one query, or None if the task does not
+        exist. """
+        return modeldb.Task.objects.filter(task_id=task_id).values('organizer_id', 'require_registration').first()
+
+    @staticmethod
+    def get_dataset_ids_of_task(task_id: str) -> list:
+        return list(modeldb.Dataset.objects.filter(default_task__task_id=task_id).values_list('dataset_id', flat=True))
+
     def get_vm_reviews_by_dataset(self, dataset_id: str, vm_id: str) -> dict:
         return {review.run.run_id: self._review_as_dict(review)
                 for review in modeldb.Review.objects.select_related('run').
@@ -972,7 +1081,7 @@ class HybridDatabase(object):
         for d in new_dirs:
             d.mkdir(parents=True, exist_ok=True)
 
-        return self._dataset_to_dict(ds), [str(nd) for nd in new_dirs]
+        return self._datasets_to_dicts([ds])[0], [str(nd) for nd in new_dirs]
 
     def _fdb_add_evaluator_to_vm(self, vm_id, evaluator_id, command, working_directory, measures):
         """ Add the evaluator the the <vm_id>.prototext file in the Filedatabase
@@ -1147,6 +1256,7 @@ class HybridDatabase(object):
             )
 
             self._save_review(dataset_id, vm_id, run_id, review_proto)
+            dbops.update_leaderboard_entries([run_id])
             return True
 
         except Exception as e:
@@ -1283,6 +1393,9 @@ class HybridDatabase(object):
         software = modeldb.DockerSoftware.objects.update_or_create(docker_software_id = docker_software_id, 
             defaults={"display_name": display_name, "description": description, "paper_link": paper_link,
                       "ir_re_ranker": ir_re_ranker, "ir_re_ranking_input": ir_re_ranking_input})
+        # the leaderboard entries of the evaluations of the runs of the software store its display_name
+        dbops.update_leaderboard_entries(list(modeldb.Run.objects.filter(docker_software__docker_software_id=docker_software_id)
+                                              .values_list('run_id', flat=True)))
 
     
     def update_run(self, dataset_id, vm_id, run_id, deleted: bool = None):
@@ -1424,7 +1537,7 @@ class HybridDatabase(object):
                 f"failed to query 'VirtualMachineHasEvaluator' for evauator {ev_id}. Will not save changes made to the Filestore.",
                 e)
 
-        return self._dataset_to_dict(ds)
+        return self._datasets_to_dicts([ds])[0]
 
     def delete_software(self, task_id, vm_id, software_id):
         """ Delete a software.
@@ -1464,6 +1577,7 @@ class HybridDatabase(object):
         if review and (review.published or review.no_errors):
             return False
 
+        # The leaderboard entries of the deleted runs are removed by the on delete cascade
         modeldb.Run.objects.filter(input_run=run).delete()
         modeldb.Run.objects.filter(run_id=run_id).delete()
         return True
@@ -0,0 +1,348 @@
+"""
+A parallel, bulk-upserting variant of the indexer in tira.data.data.
+
+The protobuf files are parsed in a process pool with the read and mapping functions of tira.data.data (the workers only
+read and normalize files, they never touch the database). The parent resolves foreign keys from in-memory maps and
+writes each model with bulk_create(update_conflicts=True) in batches. Each phase reports its throughput in files/s and
+rows/s.
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from time import perf_counter
+
+from django.db import connection, transaction
+from google.protobuf.text_format import Parse
+
+import tira.model as modeldb
+import tira.data.data as dbops
+from tira.proto import TiraClientWebMessages_pb2 as modelpb
+
+logger = logging.getLogger("tira")
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 64
+
+TASK_FIELDS = ['task_name', 'task_description', 'vm', 'organizer', 'web', 'max_std_out_chars_on_test_data',
+               'max_std_err_chars_on_test_data', 'max_file_list_chars_on_test_data', 'command_placeholder',
+               'command_description', 'dataset_label', 'max_std_out_chars_on_test_data_eval',
+               'max_std_err_chars_on_test_data_eval', 'max_file_list_chars_on_test_data_eval']
+RUN_FIELDS = ['software', 'docker_software', 'evaluator', 'upload', 'input_dataset', 'task', 'downloadable',
+              'deleted', 'access_token']
+REVIEW_FIELDS = ['reviewer_id', 'review_date', 'no_errors', 'missing_output', 'extraneous_output', 'invalid_output',
+                 'has_error_output', 'other_errors', 'comment', 'has_errors', 'has_warnings', 'has_no_errors',
+                 'published', 'blinded']
+
+
+class IndexPhase(object):
+    """ Counts the parsed files and written rows of one phase of the indexer to report its throughput. """
+
+    def __init__(self, name):
+        self.name = name
+        self.files = 0
+        self.rows = 0
+        self.start = perf_counter()
+
+    def report(self):
+        seconds = max(perf_counter() - self.start, 1e-9)
+        ret = {'phase': self.name, 'files': self.files, 'rows': self.rows, 'seconds': round(seconds, 3),
+               'files_per_second': round(self.files / seconds, 1), 'rows_per_second': round(self.rows / seconds, 1)}
+        logger.info(f"Indexed {self.name}: {self.files} files ({ret['files_per_second']} files/s), "
+                    f"{self.rows} rows ({ret['rows_per_second']} rows/s) in {ret['seconds']}s.")
+
+        return ret
+
+
+def upsert(model, objs, unique_fields, update_fields):
+    """ Insert objs or update the update_fields of existing rows with the same unique_fields. Of several objs with the
+    same unique_fields, only the last one is written (one statement can not update the same row twice).
+    :return: the written objs
+    """
+    attnames = [model._meta.get_field(field).attname for field in unique_fields]
+    objs = list({tuple(getattr(obj, attname) for attname in attnames): obj for obj in objs}.values())
+    if not objs:
+        return objs
+    kwargs = {'update_conflicts': True, 'update_fields': update_fields}
+    if connection.features.supports_update_conflicts_with_target:
+        kwargs['unique_fields'] = unique_fields
+
+    model.objects.bulk_create(objs, batch_size=BATCH_SIZE, **kwargs)
+    return objs
+
+
+def _upsert(phase, model, objs, unique_fields, update_fields):
+    phase.rows += len(upsert(model, objs, unique_fields, update_fields))
+
+
+def _ensure_exist(phase, model, pk_name, ids):
+    """ Create bare rows for all ids that do not exist yet (the bulk equivalent of get_or_create). """
+    ids = {i for i in ids if i}
+    missing = ids - set(model.objects.filter(**{f'{pk_name}__in': ids}).values_list(pk_name, flat=True))
+    model.objects.bulk_create([model(**{pk_name: i}) for i in missing], batch_size=BATCH_SIZE, ignore_conflicts=True)
+    phase.rows += len(missing)
+
+
+def _parallel_map(pool, f, items):
+    if pool is None:
+        return [f(i) for i in items]
+
+    return list(pool.map(f, items, chunksize=CHUNK_SIZE))
+
+
+# The workers below are executed in the process pool. They must be picklable module-level functions without database
+# access. They read the files with the functions of tira.data.data and return the fields of the models (or serialized
+# protobuf messages that are mapped in the parent).
+def _read_vm(args):
+    """ :return: the serialized VirtualMachine (protobuf messages can not be pickled) or None if it does not exist. """
+    vm_dir_path, vm_id = args
+    try:
+        return Parse(open(vm_dir_path / f"{vm_id}.prototext").read(), modelpb.VirtualMachine()).SerializeToString()
+    except FileNotFoundError:
+        logger.exception(f"Could not find VM file for vm_id {vm_id}")
+        return None
+
+
+def _read_dataset(dataset_file):
+    dataset = dbops._read_dataset(dataset_file)
+    return dataset.datasetId, dataset.evaluatorId, dbops._dataset_fields(dataset)
+
+
+def _read_task(task_path):
+    task = dbops._read_task(task_path)
+    return task.taskId, task.virtualMachineId, task.hostId, dbops._task_fields(task), list(task.allowedServers), \
+        list(task.trainingDataset), list(task.testDataset)
+
+
+def _read_softwares(user_dir):
+    return [(software.id, user_dir.stem, user_dir.parent.stem, software.dataset, dbops._software_fields(software))
+            for software in dbops._read_softwares(user_dir)]
+
+
+def _read_run(run_dir):
+    """ Read (and normalize, as tira.data.data.parse_run does) the run, review, and evaluation files of a run dir.
+    :return: a tuple (vm_id, run, review, measures) with the serialized run (protobuf messages can not be pickled) or
+        (vm_id, None, None, None) if there is no run file or the files can not be read.
+    """
+    vm_id = run_dir.parent.stem
+    try:
+        run_proto = dbops._read_run(run_dir)
+        if run_proto is None:
+            logger.warning(f'Skip run {run_dir.stem}: No "run.prototext" or "run.bin" exists in {run_dir}')
+            return vm_id, None, None, None
+
+        return vm_id, run_proto.SerializeToString(), dbops._review_fields(dbops._read_review(run_dir)), \
+            dbops._read_measures(run_dir)
+    except Exception:
+        # As parse_runs_for_vm, a corrupt run must not abort the complete index
+        logger.exception(f'Skip run {run_dir.stem}: Could not read the files in {run_dir}')
+        return vm_id, None, None, None
+
+
+def _index_organizers(organizers_file_path):
+    phase = IndexPhase('organizers')
+    organizers = Parse(open(organizers_file_path, "r").read(), modelpb.Hosts())
+    phase.files += 1
+
+    _upsert(phase, modeldb.Organizer,
+            [modeldb.Organizer(organizer_id=org.hostId, **dbops._organizer_fields(org)) for org in organizers.hosts],
+            ['organizer_id'], ['name', 'years', 'web'])
+
+    return phase.report()
+
+
+def _index_vms(pool, users_file_path, vm_dir_path):
+    phase = IndexPhase('virtual machines')
+    users = Parse(open(users_file_path, "r").read(), modelpb.Users())
+    parsed = _parallel_map(pool, _read_vm, [(vm_dir_path, u.userName) for u in users.users])
+    phase.files += 1 + len(parsed)
+
+    vms, vms_without_file, evaluators, vm_has_evaluator = [], [], {}, set()
+    for user, serialized_vm in zip(users.users, parsed):
+        if serialized_vm is None:
+            vms_without_file += [modeldb.VirtualMachine(vm_id=user.userName, **dbops._vm_fields(user))]
+            continue
+        vm = modelpb.VirtualMachine()
+        vm.ParseFromString(serialized_vm)
+        vms += [modeldb.VirtualMachine(vm_id=user.userName, **dbops._vm_fields(user, vm))]
+        for evaluator in vm.evaluators:
+            evaluators[evaluator.evaluatorId] = modeldb.Evaluator(evaluator_id=evaluator.evaluatorId,
+                                                                  **dbops._evaluator_fields(evaluator))
+            vm_has_evaluator.add((user.userName, evaluator.evaluatorId))
+
+    _upsert(phase, modeldb.VirtualMachine, vms, ['vm_id'],
+            ['user_password', 'roles', 'host', 'admin_name', 'admin_pw', 'ip', 'ssh', 'rdp'])
+    _upsert(phase, modeldb.VirtualMachine, vms_without_file, ['vm_id'], ['user_password', 'roles'])
+    _upsert(phase, modeldb.Evaluator, list(evaluators.values()), ['evaluator_id'],
+            ['command', 'working_directory', 'measures', 'is_deprecated'])
+
+    existing = set(modeldb.VirtualMachineHasEvaluator.objects.values_list('vm_id', 'evaluator_id'))
+    missing = [modeldb.VirtualMachineHasEvaluator(vm_id=vm_id, evaluator_id=evaluator_id)
+               for vm_id, evaluator_id in vm_has_evaluator - existing]
+    modeldb.VirtualMachineHasEvaluator.objects.bulk_create(missing, batch_size=BATCH_SIZE)
+    phase.rows += len(missing)
+
+    return phase.report()
+
+
+def _index_datasets(pool, datasets_dir_path):
+    phase = IndexPhase('datasets')
+    datasets = _parallel_map(pool, _read_dataset, list(datasets_dir_path.rglob("*.prototext")))
+    phase.files += len(datasets)
+
+    _ensure_exist(phase, modeldb.Evaluator, 'evaluator_id', [evaluator_id for _, evaluator_id, _ in datasets])
+    _upsert(phase, modeldb.Dataset,
+            [modeldb.Dataset(dataset_id=dataset_id, evaluator_id=evaluator_id, **dataset)
+             for dataset_id, evaluator_id, dataset in datasets], ['dataset_id'],
+            ['display_name', 'evaluator', 'is_confidential', 'is_deprecated', 'data_server', 'released'])
+
+    return phase.report()
+
+
+def _index_tasks(pool, tasks_dir_path):
+    phase = IndexPhase('tasks')
+    parsed = _parallel_map(pool, _read_task, list(tasks_dir_path.glob("*")))
+    phase.files += len(parsed)
+
+    _ensure_exist(phase, modeldb.VirtualMachine, 'vm_id', [vm_id for _, vm_id, _, _, _, _, _ in parsed])
+    _ensure_exist(phase, modeldb.Organizer, 'organizer_id', [org for _, _, org, _, _, _, _ in parsed])
+
+    tasks, allowed_servers, datasets, task_has_dataset = [], set(), {}, {}
+    for task_id, vm_id, organizer_id, task, servers, training_datasets, test_datasets in parsed:
+        tasks += [modeldb.Task(task_id=task_id, vm_id=vm_id or None, organizer_id=organizer_id or None, **task)]
+        allowed_servers.update((task_id, server) for server in servers)
+        for dataset_id, is_test in [(d, False) for d in training_datasets] + [(d, True) for d in test_datasets]:
+            datasets[dataset_id] = task_id
+            task_has_dataset[(task_id, dataset_id)] = is_test
+
+    _upsert(phase, modeldb.Task, tasks, ['task_id'], TASK_FIELDS)
+    _upsert(phase, modeldb.AllowedServer,
+            [modeldb.AllowedServer(task_id=t, server_address=s) for t, s in allowed_servers],
+            ['task', 'server_address'], ['server_address'])
+    _upsert(phase, modeldb.Dataset, [modeldb.Dataset(dataset_id=d, default_task_id=t) for d, t in datasets.items()],
+            ['dataset_id'], ['default_task'])
+    _upsert(phase, modeldb.TaskHasDataset,
+            [modeldb.TaskHasDataset(task_id=t, dataset_id=d, is_test=is_test)
+             for (t, d), is_test in task_has_dataset.items()], ['task', 'dataset'], ['is_test'])
+
+    return phase.report()
+
+
+def _index_softwares(pool, softwares_dir_path):
+    phase = IndexPhase('softwares')
+    parsed = _parallel_map(pool, _read_softwares, [u for t in softwares_dir_path.glob("*") for u in t.glob("*")])
+    phase.files += len(parsed)
+    softwares = [s for user_softwares in parsed for s in user_softwares]
+
+    _ensure_exist(phase, modeldb.VirtualMachine, 'vm_id', [vm_id for _, vm_id, _, _, _ in softwares])
+    _ensure_exist(phase, modeldb.Task, 'task_id', [task_id for _, _, task_id, _, _ in softwares])
+    _ensure_exist(phase, modeldb.Dataset, 'dataset_id', [dataset_id for _, _, _, dataset_id, _ in softwares])
+
+    _upsert(phase, modeldb.Software,
+            [modeldb.Software(software_id=software_id, vm_id=vm_id, task_id=task_id, dataset_id=dataset_id or None,
+                              **software) for software_id, vm_id, task_id, dataset_id, software in softwares],
+            ['software_id', 'vm', 'task'],
+            ['count', 'command', 'working_directory', 'dataset', 'creation_date', 'last_edit_date', 'deleted'])
+
+    return phase.report()
+
+
+def _index_runs(pool, runs_dir_path):
+    phase = IndexPhase('runs')
+    parsed = _parallel_map(pool, _read_run, [r for d in runs_dir_path.glob("*") for v in d.glob("*")
+                                             for r in v.glob("*")])
+    phase.files += len(parsed)
+
+    # The foreign keys of runs are resolved from these maps instead of one lookup per run
+    vms = set(modeldb.VirtualMachine.objects.values_list('vm_id', flat=True))
+    default_tasks = dict(modeldb.Dataset.objects.values_list('dataset_id', 'default_task_id'))
+    tasks = set(modeldb.Task.objects.values_list('task_id', flat=True))
+    evaluators = set(modeldb.Evaluator.objects.values_list('evaluator_id', flat=True))
+    docker_softwares = set(modeldb.DockerSoftware.objects.values_list('docker_software_id', flat=True))
+    softwares = {(s, vm, t): pk for pk, s, vm, t in
+                 modeldb.Software.objects.values_list('id', 'software_id', 'vm_id', 'task_id')}
+
+    resolved = []
+    for vm_id, serialized_run, review, measures in parsed:
+        if serialized_run is None:
+            continue
+        run_proto = modelpb.Run()
+        run_proto.ParseFromString(serialized_run)
+        if vm_id not in vms:
+            logger.warning(f"Skip run {run_proto.runId}: VM {vm_id} does not exist")
+            continue
+        if run_proto.inputDataset not in default_tasks:
+            logger.warning(f"Skip run {run_proto.runId}: Dataset {run_proto.inputDataset} does not exist")
+            continue
+        task_id = dbops._run_task_id(run_proto, default_tasks[run_proto.inputDataset])
+        if task_id not in tasks:
+            logger.warning(f"Skip run {run_proto.runId}: Task {task_id} does not exist")
+            continue
+        resolved += [(vm_id, task_id, run_proto, review, measures)]
+
+    uploads_to_create = {(vm_id, task_id) for vm_id, task_id, run_proto, _, _ in resolved
+                         if 'upload' in run_proto.softwareId}
+    uploads = {(vm, t): pk for pk, vm, t in modeldb.Upload.objects.values_list('id', 'vm_id', 'task_id')}
+    missing = [modeldb.Upload(vm_id=vm, task_id=t) for vm, t in uploads_to_create if (vm, t) not in uploads]
+    modeldb.Upload.objects.bulk_create(missing, batch_size=BATCH_SIZE)
+    phase.rows += len(missing)
+    uploads = {(vm, t): pk for pk, vm, t in modeldb.Upload.objects.values_list('id', 'vm_id', 'task_id')}
+
+    runs, reviews, evaluations = {}, {}, []
+    for vm_id, task_id, run_proto, review, measures in resolved:
+        software_id = run_proto.softwareId
+        run_software = dbops._run_software(
+            run_proto.runId, run_proto, lambda i: i if i in docker_softwares else None,
+            lambda: uploads.get((vm_id, task_id)), lambda: software_id if software_id in evaluators else None,
+            lambda: softwares.get((software_id, vm_id, task_id)))
+
+        # A run_id can occur in several run dirs, the last one wins (as with the sequential parse_run)
+        runs[run_proto.runId] = modeldb.Run(
+            run_id=run_proto.runId, input_dataset_id=run_proto.inputDataset, task_id=task_id,
+            input_run_id=run_proto.inputRun or None, **dbops._run_fields(run_proto),
+            **{f'{k}_id': v for k, v in run_software.items()})
+        reviews[run_proto.runId] = modeldb.Review(run_id=run_proto.runId, **review)
+        evaluations += [(run_proto.runId, key, value) for key, value in measures]
+
+    # input runs may be parsed later or not at all, so we create placeholders for them (as parse_run does)
+    _ensure_exist(phase, modeldb.Run, 'run_id', [r.input_run_id for r in runs.values()])
+    _upsert(phase, modeldb.Run, [r for r in runs.values() if not r.input_run_id], ['run_id'], RUN_FIELDS)
+    _upsert(phase, modeldb.Run, [r for r in runs.values() if r.input_run_id], ['run_id'],
+            RUN_FIELDS + ['input_run'])
+    _upsert(phase, modeldb.Review, list(reviews.values()), ['run'], REVIEW_FIELDS)
+
+    existing = set(modeldb.Evaluation.objects.values_list('run_id', 'measure_key', 'measure_value'))
+    missing = [modeldb.Evaluation(run_id=r, measure_key=k, measure_value=v) for r, k, v in dict.fromkeys(evaluations)
+               if (r, k, v) not in existing]
+    modeldb.Evaluation.objects.bulk_create(missing, batch_size=BATCH_SIZE)
+    phase.rows += len(missing)
+
+    return phase.report()
+
+
+def index(organizers_file_path, users_file_path, vm_dir_path, tasks_dir_path,
+          datasets_dir_path, softwares_dir_path, runs_dir_path, processes=None):
+    """ Index the complete model from the protobuf files into the database.
+
+    @param processes: the number of worker processes that parse files. Defaults to the number of CPUs. With
+        processes=1, all files are parsed in the current process.
+    :return: a list with the throughput statistics of each phase
+    """
+    processes = processes if processes else os.cpu_count()
+    # The workers are forked so that they inherit the configured django environment
+    pool = ProcessPoolExecutor(max_workers=processes, mp_context=get_context('fork')) if processes > 1 else None
+
+    try:
+        ret = []
+        with transaction.atomic():
+            ret += [_index_organizers(organizers_file_path)]
+            ret += [_index_vms(pool, users_file_path, vm_dir_path)]
+            ret += [_index_datasets(pool, datasets_dir_path)]
+            ret += [_index_tasks(pool, tasks_dir_path)]
+            ret += [_index_softwares(pool, softwares_dir_path)]
+            ret += [_index_runs(pool, runs_dir_path)]
+
+        return ret
+    finally:
+        if pool:
+            pool.shutdown()
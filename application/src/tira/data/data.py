@@ -6,6 +6,10 @@ from tira.proto import tira_host_pb2 as model_host
 from google.protobuf.text_format import Parse
 from tira.util import extract_year_from_dataset_id, auto_reviewer
 from pathlib import Path
+import hashlib
+import os
+from django.db import transaction
+from django.db.models import Q
 import tira.model as modeldb
 import logging
 from tqdm import tqdm
@@ -13,42 +17,395 @@ from tqdm import tqdm
 MODEL_ROOT = Path("/mnt/ceph/tira/model")
 TASKS_DIR_PATH = MODEL_ROOT / Path("tasks")
 ORGANIZERS_FILE_PATH = MODEL_ROOT / Path("organizers/organizers.prototext")
+SCOPES_PER_QUERY = 100
+LEADERBOARD_BATCH_SIZE = 500
 
 logger = logging.getLogger("tira")
 
 
 def index(organizers_file_path, users_file_path, vm_dir_path, tasks_dir_path,
-          datasets_dir_path, softwares_dir_path, runs_dir_path):
-    _parse_organizer_list(organizers_file_path)
-    _parse_vm_list(users_file_path, vm_dir_path)
-    _parse_dataset_list(datasets_dir_path)
-    _parse_task_list(tasks_dir_path)
-    _parse_software_list(softwares_dir_path)
-    _parse_runs_evaluations(runs_dir_path)
-    pass
+          datasets_dir_path, softwares_dir_path, runs_dir_path, processes=None):
+    """ Index the complete model with the parallel bulk indexer (see tira.data.bulk_index).
+    :return: a list with the throughput statistics of each phase
+    """
+    from tira.data.bulk_index import index as bulk_index
+    ret = bulk_index(organizers_file_path, users_file_path, vm_dir_path, tasks_dir_path, datasets_dir_path,
+                     softwares_dir_path, runs_dir_path, processes)
+    rebuild_leaderboard()
+    _invalidate_permission_metadata()
+
+    # Record the state of all indexed files so that subsequent reloads only parse changes
+    _record_index_state([organizers_file_path, users_file_path] + _vm_files(vm_dir_path) + _task_files(tasks_dir_path)
+                        + _dataset_files(datasets_dir_path) + _software_files(softwares_dir_path)
+                        + _run_files(runs_dir_path.glob("*/*/*")), with_hash=False)
+
+    return ret
+
+
+def reindex(organizers_file_path, users_file_path, vm_dir_path, tasks_dir_path,
+            datasets_dir_path, softwares_dir_path, runs_dir_path):
+    """ Incrementally re-index the complete model: only new or changed files are parsed (see IndexedFile).
+    :return: a dict with the number of parsed and removed files (or runs) per part of the model
+    """
+    return {'organizers': _sync_files([organizers_file_path], [organizers_file_path.parent],
+                                      lambda _: _parse_organizer_list(organizers_file_path)),
+            'vms': reload_vms(users_file_path, vm_dir_path),
+            'datasets': reload_datasets(datasets_dir_path),
+            'tasks': reload_tasks(tasks_dir_path),
+            'softwares': _sync_files(_software_files(softwares_dir_path), [softwares_dir_path],
+                                     lambda changed: _parse_software_list(softwares_dir_path, changed)),
+            'runs': _sync_runs(runs_dir_path, list(runs_dir_path.glob("*/*/*")), [runs_dir_path])}
 
 
 def reload_vms(users_file_path, vm_dir_path):
-    _parse_vm_list(users_file_path, vm_dir_path)
+    """ Re-parse the users and vms if any of their files changed since they were last indexed. """
+    return _sync_files([users_file_path] + _vm_files(vm_dir_path), [users_file_path.parent, vm_dir_path],
+                       lambda _: _parse_vm_list(users_file_path, vm_dir_path))
 
 
 def reload_datasets(datasets_dir_path):
-    _parse_dataset_list(datasets_dir_path)
+    """ Re-parse the datasets whose files changed since they were last indexed. """
+    return _sync_files(_dataset_files(datasets_dir_path), [datasets_dir_path],
+                       lambda changed: _parse_dataset_list(datasets_dir_path, changed))
 
 
 def reload_tasks(tasks_dir_path):
-    _parse_task_list(tasks_dir_path)
+    """ Re-parse the tasks whose files changed since they were last indexed. """
+    return _sync_files(_task_files(tasks_dir_path), [tasks_dir_path],
+                       lambda changed: _parse_task_list(tasks_dir_path, changed))
 
 
 def reload_runs(runs_dir_path, vm_id):
-    parse_runs_for_vm(runs_dir_path, vm_id)
+    """ Re-parse the runs of the vm that have new or changed files since they were last indexed. Runs whose
+    directories were removed are deleted from the database.
+    """
+    vm_dirs = [dataset_dir / vm_id for dataset_dir in runs_dir_path.glob("*")]
+    return _sync_runs(runs_dir_path, list(runs_dir_path.glob(f"*/{vm_id}/*")), vm_dirs)
 
-    for dataset_dir in runs_dir_path.glob("*"):
-        dataset_id = dataset_dir.stem
-        for vm_dir in dataset_dir.glob("*"):
-            if vm_dir.stem != vm_id:
-                continue
-            parse_runs_for_vm(runs_dir_path, dataset_id, vm_id)
+
+def reload_run_dirs(runs_dir_path, run_dirs):
+    """ Re-parse the passed run directories (runs_dir_path/<dataset_id>/<vm_id>/<run_id>) if their files are new or
+    changed since they were last indexed. Runs of passed run directories that were removed are deleted.
+    """
+    run_dirs = list(dict.fromkeys(run_dirs))
+    return _sync_runs(runs_dir_path, [r for r in run_dirs if r.is_dir()], run_dirs)
+
+
+def _invalidate_permission_metadata(run_ids=None):
+    """ Invalidate the cached permission metadata (see tira.tira_model.get_run_permission_metadata) of the runs, or
+    of all runs, datasets, and tasks if run_ids is None. """
+    from tira.tira_model import invalidate_permission_metadata, invalidate_all_permission_metadata
+    if run_ids is None:
+        invalidate_all_permission_metadata()
+    elif run_ids:
+        invalidate_permission_metadata(run_ids=run_ids)
+
+
+# The files of a run directory whose changes trigger a re-index of the run
+RUN_FILES = ['run.prototext', 'run.bin', 'run-review.bin', 'output/evaluation.prototext', 'output/evaluation.bin']
+
+
+def _vm_files(vm_dir_path):
+    return list(vm_dir_path.glob("*.prototext"))
+
+
+def _task_files(tasks_dir_path):
+    return [f for f in tasks_dir_path.glob("*") if f.is_file()]
+
+
+def _dataset_files(datasets_dir_path):
+    return list(datasets_dir_path.rglob("*.prototext"))
+
+
+def _software_files(softwares_dir_path):
+    return list(softwares_dir_path.glob("*/*/softwares.prototext"))
+
+
+def _run_files(run_dirs):
+    return [run_dir / f for run_dir in run_dirs for f in RUN_FILES if (run_dir / f).exists()]
+
+
+def _file_hash(path):
+    ret = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            ret.update(chunk)
+
+    return ret.hexdigest()
+
+
+def _recorded_index_state(scopes):
+    """ :return: a dict {path: modeldb.IndexedFile} of all non-deleted files recorded below the scope directories """
+    scopes, ret = list(scopes), {}
+    # The scopes are queried in batches to keep the number of conditions per query bounded
+    for i in range(0, len(scopes), SCOPES_PER_QUERY):
+        query = Q()
+        for scope in scopes[i:i + SCOPES_PER_QUERY]:
+            query |= Q(path__startswith=str(scope) + os.sep)
+        ret.update({r.path: r for r in modeldb.IndexedFile.objects.filter(query, deleted=False)})
+
+    return ret
+
+
+def _record_index_state(files, with_hash=True):
+    """ Record the current mtime, size, and (optionally) content hash of the files as indexed. """
+    states = []
+    for path in files:
+        if not path.exists():
+            continue
+        stat = path.stat()
+        states += [modeldb.IndexedFile(path=str(path), mtime=stat.st_mtime, size=stat.st_size,
+                                       sha1=_file_hash(path) if with_hash else '', deleted=False)]
+
+    from tira.data.bulk_index import upsert
+    upsert(modeldb.IndexedFile, states, ['path'], ['mtime', 'size', 'sha1', 'deleted', 'last_indexed'])
+
+
+def _changed_files(files, recorded):
+    """ Return the new files and the files whose content changed since they were recorded. The content hash is only
+    computed if the mtime or size changed. Files that were only touched are re-recorded but not returned.
+    """
+    changed, touched = [], []
+    for path in files:
+        record = recorded.get(str(path))
+        stat = path.stat()
+        if record and record.mtime == stat.st_mtime and record.size == stat.st_size:
+            continue
+        if record and record.sha1 and record.size == stat.st_size and record.sha1 == _file_hash(path):
+            touched += [path]
+        else:
+            changed += [path]
+
+    _record_index_state(touched)
+    return changed
+
+
+def _tombstone(recorded, files):
+    """ Mark all recorded files that do not exist anymore as deleted and return their paths. """
+    removed = recorded.keys() - {str(f) for f in files}
+    modeldb.IndexedFile.objects.filter(path__in=removed).update(deleted=True)
+
+    return [Path(p) for p in removed]
+
+
+def _sync_files(files, scopes, parse):
+    """ Parse the new or changed files and tombstone the removed files within the scope directories.
+
+    @param files: all existing files within the scopes
+    @param parse: a function that is called with the list of changed files if there are any
+    :return: a dict with the number of parsed and removed files
+    """
+    files = [f for f in files if f.exists()]
+    recorded = _recorded_index_state(scopes)
+    changed = _changed_files(files, recorded)
+    if changed:
+        parse(changed)
+        _record_index_state(changed)
+        _invalidate_permission_metadata()
+
+    return {'parsed': len(changed), 'removed': len(_tombstone(recorded, files))}
+
+
+def _sync_runs(runs_dir_path, run_dirs, scopes):
+    """ Re-parse the run directories with new or changed files, and delete the runs whose run files were removed.
+    Runs live in runs_dir_path/<dataset_id>/<vm_id>/<run_id>.
+
+    @param run_dirs: all existing run directories in the scope
+    @param scopes: the directories (e.g., run directories or vm directories) below which the runs are synced. Only the
+        recorded files below the scopes are loaded from the database.
+    :return: a dict with the number of parsed and removed runs
+    """
+    def run_dir_of(path):
+        return runs_dir_path.joinpath(*Path(path).relative_to(runs_dir_path).parts[:3])
+
+    files = _run_files(run_dirs)
+    recorded = _recorded_index_state(scopes)
+
+    changed_run_dirs = list(dict.fromkeys(run_dir_of(p) for p in _changed_files(files, recorded)))
+    for run_dir in changed_run_dirs:
+        try:
+            parse_run(runs_dir_path, run_dir.parent.parent.name, run_dir.parent.name, run_dir.name)
+        except Exception as e:
+            logger.exception(f"Could not re-index run {run_dir}: {e}")
+            continue
+        _record_index_state(_run_files([run_dir]))
+
+    removed_run_dirs = []
+    for run_dir in dict.fromkeys(run_dir_of(p) for p in _tombstone(recorded, files)):
+        if not (run_dir / "run.bin").exists() and not (run_dir / "run.prototext").exists():
+            modeldb.Run.objects.filter(run_id=run_dir.name).delete()
+            removed_run_dirs += [run_dir]
+        elif not (run_dir / "output/evaluation.bin").exists() \
+                and not (run_dir / "output/evaluation.prototext").exists():
+            modeldb.Evaluation.objects.filter(run__run_id=run_dir.name).delete()
+            update_leaderboard_entries([run_dir.name])
+
+    _invalidate_permission_metadata([run_dir.name for run_dir in changed_run_dirs + removed_run_dirs])
+    return {'parsed': len(changed_run_dirs), 'removed': len(removed_run_dirs)}
+
+
+# The following functions map the protobuf messages to the fields of the models (without the foreign keys). They are
+# shared by the parse functions below and the bulk indexer in tira.data.bulk_index.
+def _organizer_fields(org):
+    return {'name': org.name, 'years': org.years, 'web': org.web}
+
+
+def _vm_fields(user, vm=None):
+    ret = {'user_password': user.userPw, 'roles': user.roles}
+    if vm is not None:
+        ret.update({'host': vm.host, 'admin_name': vm.adminName, 'admin_pw': vm.adminPw, 'ip': vm.ip,
+                    'ssh': vm.portSsh, 'rdp': vm.portRdp})
+
+    return ret
+
+
+def _evaluator_fields(evaluator):
+    return {'command': evaluator.command, 'working_directory': evaluator.workingDirectory,
+            'measures': evaluator.measures, 'is_deprecated': evaluator.isDeprecated}
+
+
+def _task_fields(task):
+    return {'task_name': task.taskName,
+            'task_description': task.taskDescription,
+            'web': task.web,
+            'max_std_out_chars_on_test_data': task.maxStdOutCharsOnTestData,
+            'max_std_err_chars_on_test_data': task.maxStdErrCharsOnTestData,
+            'max_file_list_chars_on_test_data': task.maxFileListCharsOnTestData,
+            'command_placeholder': task.commandPlaceholder,
+            'command_description': task.commandDescription,
+            'dataset_label': task.datasetLabel,
+            'max_std_out_chars_on_test_data_eval': task.maxStdOutCharsOnTestDataEval,
+            'max_std_err_chars_on_test_data_eval': task.maxStdErrCharsOnTestDataEval,
+            'max_file_list_chars_on_test_data_eval': task.maxFileListCharsOnTestDataEval}
+
+
+def _dataset_fields(dataset):
+    return {'display_name': dataset.displayName,
+            'is_confidential': dataset.isConfidential,
+            'is_deprecated': dataset.isDeprecated,
+            'data_server': dataset.dataServer,
+            'released': extract_year_from_dataset_id(dataset.datasetId)}
+
+
+def _software_fields(software):
+    return {'count': software.count,
+            'command': software.command,
+            'working_directory': software.workingDirectory,
+            'creation_date': software.creationDate,
+            'last_edit_date': software.lastEditDate,
+            'deleted': software.deleted}
+
+
+def _run_fields(run_proto):
+    return {'downloadable': run_proto.downloadable, 'deleted': run_proto.deleted,
+            'access_token': run_proto.accessToken}
+
+
+def _review_fields(review):
+    return {'reviewer_id': review.reviewerId,
+            'review_date': review.reviewDate,
+            'no_errors': review.noErrors,
+            'missing_output': review.missingOutput,
+            'extraneous_output': review.extraneousOutput,
+            'invalid_output': review.invalidOutput,
+            'has_error_output': review.hasErrorOutput,
+            'other_errors': review.otherErrors,
+            'comment': review.comment,
+            'has_errors': review.hasErrors,
+            'has_warnings': review.hasWarnings,
+            'has_no_errors': review.hasNoErrors,
+            'published': review.published,
+            'blinded': review.blinded}
+
+
+def _read_task(task_path):
+    return Parse(open(task_path, "r").read(), modelpb.Tasks.Task())
+
+
+def _read_dataset(dataset_file):
+    return Parse(open(dataset_file, "r").read(), modelpb.Dataset())
+
+
+def _read_softwares(user_dir):
+    return Parse(open(user_dir / "softwares.prototext", "r").read(), modelpb.Softwares()).softwares
+
+
+def _read_run(run_dir):
+    """ Read the run of the run_dir (and normalize the run.prototext to a run.bin).
+    :return: the run protobuf or None if there is no run file
+    """
+    if (run_dir / "run.prototext").exists():
+        run_proto = Parse(open(run_dir / "run.prototext", "r").read(), modelpb.Run())
+        open(run_dir / "run.bin", 'wb').write(run_proto.SerializeToString())
+    elif (run_dir / "run.bin").exists():
+        run_proto = modelpb.Run()
+        run_proto.ParseFromString(open(run_dir / "run.bin", "rb").read())
+    else:
+        return None
+
+    return run_proto
+
+
+def _read_review(run_dir):
+    """ Read the review of the run_dir. Runs without review are reviewed by the auto reviewer. """
+    review_file = run_dir / "run-review.bin"
+
+    # AutoReviewer action here
+    if not review_file.exists():
+        review = auto_reviewer(run_dir, run_dir.stem)
+        open(run_dir / "run-review.prototext", 'w').write(str(review))
+        open(run_dir / "run-review.bin", 'wb').write(review.SerializeToString())
+    else:
+        review = modelpb.RunReview()
+        review.ParseFromString(open(review_file, "rb").read())
+
+    return review
+
+
+def _read_measures(run_dir):
+    """ Read the evaluation of the run_dir (and normalize the evaluation.prototext to an evaluation.bin).
+    :return: a list of (measure_key, measure_value) tuples
+    """
+    if (run_dir / "output/evaluation.prototext").exists() and not (run_dir / "output/evaluation.bin").exists():
+        evaluation = Parse(open(run_dir / "output/evaluation.prototext", "r").read(), modelpb.Evaluation())
+        open(run_dir / "output" / "evaluation.bin", 'wb').write(evaluation.SerializeToString())
+
+    if not (run_dir / "output/evaluation.bin").exists():
+        return []
+
+    evaluation = modelpb.Evaluation()
+    evaluation.ParseFromString(open(run_dir / "output/evaluation.bin", "rb").read())
+    return [(measure.key, measure.value) for measure in evaluation.measure]
+
+
+def _run_task_id(run_proto, default_task_id):
+    """ Runs without task_id (it is optional) belong to the default task of their dataset. """
+    return run_proto.taskId if run_proto.taskId and run_proto.taskId != "None" else default_task_id
+
+
+def _run_software(run_id, run_proto, get_docker_software, get_upload, get_evaluator, get_software):
+    """ Resolve what produced the run: a docker software, an upload, an evaluator, or a software (in this order).
+    get_docker_software is called with the docker_software_id, the other getters without arguments. All getters return
+    None if the referenced object does not exist.
+    :return: a dict with the keys software, docker_software, evaluator, and upload
+    """
+    software_id = run_proto.softwareId
+    docker_software_id = None
+    if 'docker-software-' in software_id:
+        try:
+            docker_software_id = int(software_id.split('docker-software-')[-1])
+        except ValueError:
+            pass
+
+    docker_software = get_docker_software(docker_software_id) if docker_software_id is not None else None
+    upload = get_upload() if not docker_software and 'upload' in software_id else None
+    evaluator = get_evaluator() if not docker_software and not upload and 'eval' in software_id else None
+    software = get_software() if not docker_software and not upload and not evaluator else None
+
+    if not docker_software and not upload and not evaluator and not software:
+        logger.warning(f"Run {run_id} is dangling: {run_proto}")
+
+    return {'software': software, 'docker_software': docker_software, 'evaluator': evaluator, 'upload': upload}
 
 
 def _parse_organizer_list(organizers_file_path):
@@ -58,11 +415,7 @@ def _parse_organizer_list(organizers_file_path):
     organizers = modelpb.Hosts()
     Parse(open(organizers_file_path, "r").read(), organizers)
     for org in organizers.hosts:
-        _, _ = modeldb.Organizer.objects.update_or_create(organizer_id=org.hostId, defaults={
-            'name': org.name,
-            'years': org.years,
-            'web': org.web
-        })
+        _, _ = modeldb.Organizer.objects.update_or_create(organizer_id=org.hostId, defaults=_organizer_fields(org))
 
 
 def _parse_vm_list(users_file_path, vm_dir_path):
@@ -71,59 +424,32 @@ def _parse_vm_list(users_file_path, vm_dir_path):
     for user in users.users:
         try:
             vm = Parse(open(vm_dir_path / f"{user.userName}.prototext").read(), modelpb.VirtualMachine())
-            vm2, _ = modeldb.VirtualMachine.objects.update_or_create(vm_id=user.userName, defaults={
-                'user_password': user.userPw,
-                'roles': user.roles,
-                'host': vm.host,
-                'admin_name': vm.adminName,
-                'admin_pw': vm.adminPw,
-                'ip': vm.ip,
-                'ssh': vm.portSsh,
-                'rdp': vm.portRdp})
+            vm2, _ = modeldb.VirtualMachine.objects.update_or_create(vm_id=user.userName,
+                                                                     defaults=_vm_fields(user, vm))
 
             for evaluator in vm.evaluators:
-                ev, _ = modeldb.Evaluator.objects.update_or_create(
-                    evaluator_id=evaluator.evaluatorId, defaults={
-                        'command': evaluator.command,
-                        'working_directory': evaluator.workingDirectory,
-                        'measures': evaluator.measures,
-                        'is_deprecated': evaluator.isDeprecated
-                    })
+                ev, _ = modeldb.Evaluator.objects.update_or_create(evaluator_id=evaluator.evaluatorId,
+                                                                   defaults=_evaluator_fields(evaluator))
                 modeldb.VirtualMachineHasEvaluator.objects.update_or_create(evaluator=ev, vm=vm2)
 
         except FileNotFoundError as e:
             logger.exception(f"Could not find VM file for vm_id {user.userName}")
-            _, _ = modeldb.VirtualMachine.objects.update_or_create(vm_id=user.userName, defaults={
-                'user_password': user.userPw,
-                'roles': user.roles})
+            _, _ = modeldb.VirtualMachine.objects.update_or_create(vm_id=user.userName, defaults=_vm_fields(user))
 
 
-def _parse_task_list(tasks_dir_path):
-    """ Parse the PB Database and extract all tasks.
+def _parse_task_list(tasks_dir_path, task_paths=None):
+    """ Parse the PB Database and extract all tasks (or only the tasks in task_paths).
     :return:
     1. a dict with the tasks {"taskId": {"name", "description", "dataset_count", "organizer", "year", "web"}}
     2. a dict with default tasks of datasets {"dataset_id": "task_id"}
     """
     logger.info('loading tasks')
-    for task_path in tasks_dir_path.glob("*"):
-        task = Parse(open(task_path, "r").read(), modelpb.Tasks.Task())
+    for task_path in (task_paths if task_paths is not None else tasks_dir_path.glob("*")):
+        task = _read_task(task_path)
         vm, _ = modeldb.VirtualMachine.objects.get_or_create(vm_id=task.virtualMachineId)
         organizer, _ = modeldb.Organizer.objects.get_or_create(organizer_id=task.hostId)
         t, _ = modeldb.Task.objects.update_or_create(task_id=task.taskId, defaults={
-            'task_name': task.taskName,
-            'task_description': task.taskDescription,
-            'vm': vm,
-            'organizer': organizer,
-            'web': task.web,
-            'max_std_out_chars_on_test_data': task.maxStdOutCharsOnTestData,
-            'max_std_err_chars_on_test_data': task.maxStdErrCharsOnTestData,
-            'max_file_list_chars_on_test_data': task.maxFileListCharsOnTestData,
-            'command_placeholder': task.commandPlaceholder,
-            'command_description': task.commandDescription,
-            'dataset_label': task.datasetLabel,
-            'max_std_out_chars_on_test_data_eval': task.maxStdOutCharsOnTestDataEval,
-            'max_std_err_chars_on_test_data_eval': task.maxStdErrCharsOnTestDataEval,
-            'max_file_list_chars_on_test_data_eval': task.maxFileListCharsOnTestDataEval})
+            **_task_fields(task), 'vm': vm, 'organizer': organizer})
 
         # allowed_servers
         for allowed_server in task.allowedServers:
@@ -146,49 +472,39 @@ def _parse_task_list(tasks_dir_path):
             modeldb.TaskHasDataset.objects.update_or_create(task=t, dataset=dataset, defaults={'is_test': True})
 
 
-def _parse_dataset_list(datasets_dir_path):
-    """ Load all the datasets from the Filedatabase.
+def _parse_dataset_list(datasets_dir_path, dataset_files=None):
+    """ Load all the datasets (or only the datasets in dataset_files) from the Filedatabase.
     :return: a dict {dataset_id: dataset protobuf object}
     """
     logger.info('loading datasets')
-    for dataset_file in datasets_dir_path.rglob("*.prototext"):
+    for dataset_file in (dataset_files if dataset_files is not None else datasets_dir_path.rglob("*.prototext")):
         logger.info('Process dataset: ' + str(dataset_file))
-        dataset = Parse(open(dataset_file, "r").read(), modelpb.Dataset())
+        dataset = _read_dataset(dataset_file)
         evaluator, _ = modeldb.Evaluator.objects.get_or_create(evaluator_id=dataset.evaluatorId)
         modeldb.Dataset.objects.update_or_create(dataset_id=dataset.datasetId, defaults={
-            'display_name': dataset.displayName,
-            'evaluator': evaluator,
-            'is_confidential': dataset.isConfidential,
-            'is_deprecated': dataset.isDeprecated,
-            'data_server': dataset.dataServer,
-            'released': extract_year_from_dataset_id(dataset.datasetId)})
+            **_dataset_fields(dataset), 'evaluator': evaluator})
 
 
-def _parse_software_list(softwares_dir_path):
-    """ extract the software files. We invent a new id for the lookup since software has none:
+def _parse_software_list(softwares_dir_path, software_files=None):
+    """ extract the software files (or only the softwares.prototext files in software_files). We invent a new id for
+    the lookup since software has none:
       - <task_name>$<user_name>
     Afterwards sets self.software: a dict with the new key and a list of software objects as value
     """
     # software = {}
     logger.info('loading softwares')
-    for task_dir in softwares_dir_path.glob("*"):
-        for user_dir in task_dir.glob("*"):
-            s = Parse(open(user_dir / "softwares.prototext", "r").read(), modelpb.Softwares())
-            for software in s.softwares:
-                vm, _ = modeldb.VirtualMachine.objects.get_or_create(vm_id=user_dir.stem)
-                task, _ = modeldb.Task.objects.get_or_create(task_id=task_dir.stem)
-                dataset, _ = modeldb.Dataset.objects.get_or_create(dataset_id=software.dataset)
-                modeldb.Software.objects.update_or_create(software_id=software.id, vm=vm, task=task, defaults={
-                    'count': software.count,
-                    'command': software.command,
-                    'working_directory': software.workingDirectory,
-                    'dataset': dataset,
-                    'creation_date': software.creationDate,
-                    'last_edit_date': software.lastEditDate,
-                    'deleted': software.deleted
-                })
-            # software_list = [user_software for user_software in s.softwares if not user_software.deleted]
-            # software[f"{task_dir.stem}${user_dir.stem}"] = software_list
+    user_dirs = [f.parent for f in software_files] if software_files is not None \
+        else [user_dir for task_dir in softwares_dir_path.glob("*") for user_dir in task_dir.glob("*")]
+    for user_dir in user_dirs:
+        task_dir = user_dir.parent
+        for software in _read_softwares(user_dir):
+            vm, _ = modeldb.VirtualMachine.objects.get_or_create(vm_id=user_dir.stem)
+            task, _ = modeldb.Task.objects.get_or_create(task_id=task_dir.stem)
+            dataset, _ = modeldb.Dataset.objects.get_or_create(dataset_id=software.dataset)
+            modeldb.Software.objects.update_or_create(software_id=software.id, vm=vm, task=task, defaults={
+                **_software_fields(software), 'dataset': dataset})
+        # software_list = [user_software for user_software in s.softwares if not user_software.deleted]
+        # software[f"{task_dir.stem}${user_dir.stem}"] = software_list
 
 
 def _parse_runs_evaluations(runs_dir_path):
@@ -196,23 +512,18 @@ def _parse_runs_evaluations(runs_dir_path):
         dataset_id = dataset_dir.stem
         for vm_dir in tqdm(dataset_dir.glob("*"), desc=f'{dataset_id}'):
             vm_id = vm_dir.stem
-            parse_runs_for_vm(runs_dir_path, dataset_id, vm_id)
+            parse_runs_for_vm(runs_dir_path, dataset_id, vm_id, refresh_leaderboard=False)
 
 
 def _parse_run(run_id, task_id, run_proto, vm, dataset):
-    def __get_docker_software():
-        if 'docker-software-' not in run_proto.softwareId:
-            return None
+    def __get_docker_software(docker_software_id):
         try:
-            docker_software_id = str(int(run_proto.softwareId.split('docker-software-')[-1]))
             return modeldb.DockerSoftware.objects.get(docker_software_id=docker_software_id)
         except modeldb.DockerSoftware.DoesNotExist:
             logger.exception(f"Run {run_id} lists a docker-software {run_proto.softwareId}, but None exists.")
         return None
 
     def __get_upload():
-        if 'upload' not in run_proto.softwareId:
-            return None
         try:
             upload, _ = modeldb.Upload.objects.get_or_create(vm=vm, task=modeldb.Task.objects.get(task_id=task_id))
             return upload
@@ -222,8 +533,6 @@ def _parse_run(run_id, task_id, run_proto, vm, dataset):
         return None
 
     def __get_evaluator():
-        if 'eval' not in run_proto.softwareId:
-            return None
         try:
             return modeldb.Evaluator.objects.get(evaluator_id=run_proto.softwareId)
         except modeldb.Evaluator.DoesNotExist as e2:
@@ -239,97 +548,44 @@ def _parse_run(run_id, task_id, run_proto, vm, dataset):
 
         return None
 
-    docker_software = __get_docker_software()
-    upload = __get_upload() if not docker_software else None
-    evaluator = __get_evaluator() if not docker_software and not upload else None
-    software = __get_software() if not docker_software and not upload and not evaluator else None
-
-    if not docker_software and not upload and not evaluator and not software:
-        logger.exception(f"Run {run_id} is dangling:"
-                         f"{run_proto}")
-
     r, _ = modeldb.Run.objects.update_or_create(run_id=run_proto.runId, defaults={
-        'software': software,
-        'docker_software': docker_software,
-        'evaluator': evaluator,
-        'upload': upload,
+        **_run_software(run_id, run_proto, __get_docker_software, __get_upload, __get_evaluator, __get_software),
+        **_run_fields(run_proto),
         'input_dataset': dataset,
-        'task': modeldb.Task.objects.get(task_id=task_id),
-        'downloadable': run_proto.downloadable,
-        'deleted': run_proto.deleted,
-        'access_token': run_proto.accessToken
+        'task': modeldb.Task.objects.get(task_id=task_id)
     })
 
     return r
 
 
 def _parse_review(run_dir, run):
-    review_file = run_dir / "run-review.bin"
-
-    # AutoReviewer action here
-    if not review_file.exists():
-        review = auto_reviewer(run_dir, run_dir.stem)
-        open(run_dir / "run-review.prototext", 'w').write(str(review))
-        open(run_dir / "run-review.bin", 'wb').write(review.SerializeToString())
-    else:
-        review = modelpb.RunReview()
-        review.ParseFromString(open(review_file, "rb").read())
-
-    modeldb.Review.objects.update_or_create(run=run, defaults={
-        'reviewer_id': review.reviewerId,
-        'review_date': review.reviewDate,
-        'no_errors': review.noErrors,
-        'missing_output': review.missingOutput,
-        'extraneous_output': review.extraneousOutput,
-        'invalid_output': review.invalidOutput,
-        'has_error_output': review.hasErrorOutput,
-        'other_errors': review.otherErrors,
-        'comment': review.comment,
-        'has_errors': review.hasErrors,
-        'has_warnings': review.hasWarnings,
-        'has_no_errors': review.hasNoErrors,
-        'published': review.published,
-        'blinded': review.blinded
-    })
+    modeldb.Review.objects.update_or_create(run=run, defaults=_review_fields(_read_review(run_dir)))
 
 
 def _parse_evalutions(run_dir, run):
-    if (run_dir / "output/evaluation.prototext").exists() and not (run_dir / "output/evaluation.bin").exists():
-        evaluation = Parse(open(run_dir / "output/evaluation.prototext", "r").read(), modelpb.Evaluation())
-        open(run_dir / "output" / "evaluation.bin", 'wb').write(evaluation.SerializeToString())
+    for measure_key, measure_value in _read_measures(run_dir):
+        modeldb.Evaluation.objects.update_or_create(measure_key=measure_key, run=run, measure_value=measure_value)
 
-    # parse the runs
-    if (run_dir / "output/evaluation.bin").exists():
-        evaluation = modelpb.Evaluation()
-        evaluation.ParseFromString(open(run_dir / "output/evaluation.bin", "rb").read())
-        for measure in evaluation.measure:
-            modeldb.Evaluation.objects.update_or_create(measure_key=measure.key, run=run, measure_value=measure.value)
 
-
-def parse_runs_for_vm(runs_dir_path, dataset_id, vm_id, verbose=False):
+def parse_runs_for_vm(runs_dir_path, dataset_id, vm_id, verbose=False, refresh_leaderboard=True):
     vm_dir = runs_dir_path / dataset_id / vm_id
     for run_dir in tqdm(vm_dir.glob('*'), desc=f'{vm_id}'):
         try:
-            result = parse_run(runs_dir_path, dataset_id, vm_id, run_dir.stem)
+            result = parse_run(runs_dir_path, dataset_id, vm_id, run_dir.stem, refresh_leaderboard)
             if verbose:
                 print(result)
         except Exception as e:
             logger.exception(e)
 
 
-def parse_run(runs_dir_path, dataset_id, vm_id, run_id):
+def parse_run(runs_dir_path, dataset_id, vm_id, run_id, refresh_leaderboard=True):
     run_dir = runs_dir_path / dataset_id / vm_id / run_id
     return_message = ''
 
     # Error correction: normalize the proto files that are parsed
     # Skip this run if there is no run file
-    if (run_dir / "run.prototext").exists():
-        run_proto = Parse(open(run_dir / "run.prototext", "r").read(), modelpb.Run())
-        open(run_dir / "run.bin", 'wb').write(run_proto.SerializeToString())
-    elif (run_dir / "run.bin").exists():
-        run_proto = modelpb.Run()
-        run_proto.ParseFromString(open(run_dir / "run.bin", "rb").read())
-    else:
+    run_proto = _read_run(run_dir)
+    if run_proto is None:
         msg = f'Skip run {run_id}: No "run.prototext" or "run.bin" exists in {run_dir}'
         logger.exception(msg)
         return msg
@@ -353,9 +609,7 @@ def parse_run(runs_dir_path, dataset_id, vm_id, run_id):
         return msg
 
     # Error Correction. If run files dont add a task_id (which is optional), we use the default task of the dataset
-    task_id = run_proto.taskId
-    if not task_id or task_id == "None":
-        task_id = dataset.default_task.task_id
+    task_id = _run_task_id(run_proto, dataset.default_task.task_id if dataset.default_task else None)
 
     # here we create the run
     run = None
@@ -383,6 +637,122 @@ def parse_run(runs_dir_path, dataset_id, vm_id, run_id):
 
     _parse_evalutions(run_dir, run)
 
+    if refresh_leaderboard:
+        update_leaderboard_entries([run.run_id])
+
     return return_message
 
 
+def _input_run_owner(run):
+    """ Return the tuple (vm_id, software_name) of the software that produced the input run of an evaluation run. """
+    try:
+        input_run = run.input_run
+        if input_run.software:
+            return input_run.software.vm.vm_id, ''
+        elif input_run.docker_software:
+            return input_run.docker_software.vm.vm_id, input_run.docker_software.display_name
+        elif input_run.upload:
+            return input_run.upload.vm.vm_id, 'Run Upload'
+
+        logger.error(f"The input run {run.run_id} has no vm assigned. Assigning None instead")
+    except AttributeError as e:
+        logger.error(f"The vm or software of run {run.run_id} does not exist. Maybe either was deleted?", e)
+
+    return "None", ''
+
+
+def _build_leaderboard_entries(runs):
+    """ Build (unsaved) leaderboard entries for all runs of the queryset that have evaluations.
+    Uses a constant number of queries per LEADERBOARD_BATCH_SIZE runs, so that the queries stay bounded.
+    """
+    runs = list(runs.filter(input_dataset__isnull=False)
+                .select_related('input_run__software__vm', 'input_run__docker_software__vm', 'input_run__upload__vm'))
+
+    ret = []
+    for i in range(0, len(runs), LEADERBOARD_BATCH_SIZE):
+        ret += _build_leaderboard_entries_of_batch(runs[i:i + LEADERBOARD_BATCH_SIZE])
+
+    return ret
+
+
+def _build_leaderboard_entries_of_batch(runs):
+    run_ids = [run.run_id for run in runs]
+
+    measures = {}
+    for run_id, key, value in modeldb.Evaluation.objects.filter(run__run_id__in=run_ids).order_by('id') \
+            .values_list('run_id', 'measure_key', 'measure_value'):
+        measures.setdefault(run_id, {}).setdefault(key, value)
+
+    reviews = {r['run_id']: r for r in modeldb.Review.objects.filter(run__run_id__in=run_ids)
+               .values('run_id', 'published', 'blinded')}
+
+    ret = []
+    for run in runs:
+        if run.run_id not in measures:
+            continue
+
+        vm_id, software_name = _input_run_owner(run) if run.input_run_id else ("None", '')
+        review = reviews.get(run.run_id)
+        ret += [modeldb.LeaderboardEntry(
+            run=run, dataset_id=run.input_dataset_id, vm_id=vm_id,
+            display_run_id=run.run_id if '-evaluated-run-' not in run.run_id else run.run_id.split('-evaluated-run-')[1],
+            input_run_id=run.input_run_id, input_software_name=software_name,
+            published=review['published'] if review else False, blinded=review['blinded'] if review else False,
+            hidden=review is not None and not review['published'] and run.software_id is None,
+            measures=[[k, v] for k, v in measures[run.run_id].items()]
+        )]
+
+    return ret
+
+
+def update_leaderboard_entries(run_ids):
+    """ Recompute the leaderboard entries of the passed runs and of all runs that evaluate them.
+    Entries of deleted runs are removed by the database (on delete cascade).
+    """
+    run_ids = list(dict.fromkeys(run_ids))
+    _invalidate_permission_metadata(run_ids)
+
+    with transaction.atomic():
+        for i in range(0, len(run_ids), LEADERBOARD_BATCH_SIZE):
+            batch = run_ids[i:i + LEADERBOARD_BATCH_SIZE]
+            runs = modeldb.Run.objects.filter(Q(run_id__in=batch) | Q(input_run__run_id__in=batch))
+            entries = _build_leaderboard_entries(runs)
+            modeldb.LeaderboardEntry.objects.filter(run__in=runs).delete()
+            modeldb.LeaderboardEntry.objects.bulk_create(entries, batch_size=LEADERBOARD_BATCH_SIZE)
+
+
+def rebuild_leaderboard():
+    """ Drop and rebuild all leaderboard entries from the runs, evaluations, and reviews in the database.
+    :return: the number of entries
+    """
+    with transaction.atomic():
+        entries = _build_leaderboard_entries(modeldb.Run.objects.filter(evaluation__isnull=False).distinct())
+        modeldb.LeaderboardEntry.objects.all().delete()
+        modeldb.LeaderboardEntry.objects.bulk_create(entries, batch_size=LEADERBOARD_BATCH_SIZE)
+
+    return len(entries)
+
+
+def leaderboard_inconsistencies():
+    """ Compare the materialized leaderboard entries against entries freshly built from the database.
+    :return: a list of messages, one per inconsistent run. Empty if the leaderboard is consistent.
+    """
+    fields = ['dataset_id', 'vm_id', 'display_run_id', 'input_run_id', 'input_software_name', 'published',
+              'blinded', 'hidden', 'measures']
+
+    expected = {e.run_id: e for e in
+                _build_leaderboard_entries(modeldb.Run.objects.filter(evaluation__isnull=False).distinct())}
+    actual = {e.run_id: e for e in modeldb.LeaderboardEntry.objects.all()}
+
+    ret = [f'Run {run_id}: leaderboard entry is missing.' for run_id in expected.keys() - actual.keys()]
+    ret += [f'Run {run_id}: leaderboard entry is outdated (run has no evaluations).'
+            for run_id in actual.keys() - expected.keys()]
+
+    for run_id in expected.keys() & actual.keys():
+        diff = [f for f in fields if getattr(expected[run_id], f) != getattr(actual[run_id], f)]
+        if diff:
+            ret += [f'Run {run_id}: leaderboard entry differs in {diff}.']
+
+    return sorted(ret)
+
+
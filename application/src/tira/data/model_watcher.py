@@ -0,0 +1,83 @@
+"""
+Watch the protobuf model and the run directories and feed changed files into the incremental indexer.
+
+File system events are debounced: a changed run directory (or part of the model) is only re-indexed after no further
+events arrived for it during the debounce interval, so that runs that are written file by file are indexed once.
+"""
+import logging
+import time
+from pathlib import Path
+from threading import Lock
+
+logger = logging.getLogger("tira")
+
+# The directories below TIRA_ROOT/model and the reload method of the model that indexes them
+MODEL_DIR_TO_RELOAD = {
+    'tasks': 'reload_tasks',
+    'datasets': 'reload_datasets',
+    'users': 'reload_vms',
+    'virtual-machines': 'reload_vms',
+}
+
+
+class ChangeDebouncer(object):
+    """ Collects changed targets and releases them once they were quiet for debounce_seconds. Thread-safe. """
+
+    def __init__(self, debounce_seconds=2.0):
+        self.debounce_seconds = debounce_seconds
+        self.last_change = {}
+        self.lock = Lock()
+
+    def add(self, target, now=None):
+        with self.lock:
+            self.last_change[target] = time.monotonic() if now is None else now
+
+    def pop_ready(self, now=None):
+        """ Return (and forget) all targets without changes in the last debounce_seconds. """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            ret = [t for t, last in self.last_change.items() if now - last >= self.debounce_seconds]
+            for t in ret:
+                del self.last_change[t]
+
+        return ret
+
+
+def target_of_path(path, runs_dir_path, model_dir_path):
+    """ Map a changed path to the target that must be re-indexed:
+        - ('run', run_dir) for files within runs_dir_path/<dataset_id>/<vm_id>/<run_id>
+        - ('model', reload_method) for files within model_dir_path
+        - None for paths that are not indexed
+    """
+    path = Path(path)
+    try:
+        parts = path.relative_to(runs_dir_path).parts
+        return ('run', runs_dir_path.joinpath(*parts[:3])) if len(parts) >= 3 else None
+    except ValueError:
+        pass
+
+    try:
+        parts = path.relative_to(model_dir_path).parts
+        return ('model', MODEL_DIR_TO_RELOAD.get(parts[0], 'build_model')) if len(parts) >= 2 else None
+    except ValueError:
+        return None
+
+
+def index_changes(model, targets):
+    """ Re-index the passed targets (as returned by target_of_path) with the incremental indexer of the model.
+    :return: a dict with the number of parsed and removed runs, and the reloaded parts of the model
+    """
+    run_dirs = [t for kind, t in targets if kind == 'run']
+    ret = {'parsed': 0, 'removed': 0, 'reloaded': []}
+
+    for reload_method in dict.fromkeys(t for kind, t in targets if kind == 'model'):
+        try:
+            getattr(model, reload_method)()
+            ret['reloaded'] += [reload_method]
+        except Exception as e:
+            logger.exception(f"Could not re-index the model with {reload_method}: {e}")
+
+    if run_dirs:
+        ret.update(model.reload_run_dirs(run_dirs))
+
+    return ret
@@ -0,0 +1,236 @@
+"""
+Compact filters for the document ids of corpora that are too large to keep all ids in memory (e.g., the ClueWebs).
+
+Ids are stored as sorted id files (one UTF-8 encoded id per line, sorted by their bytes) that are memory-mapped and
+searched with a binary search, so allowlists need no memory proportional to their size. The DuplicateIdFilter keeps a
+Bloom filter of the seen ids in memory that answers most lookups (every id that was not seen before); only ids that
+the Bloom filter reports as seen are confirmed against the exact ids, which are spilled to sorted id files on disk.
+"""
+from pathlib import Path
+import hashlib
+import heapq
+from itertools import groupby
+import math
+import mmap
+import tempfile
+
+import numpy as np
+
+SORT_BUFFER_IDS = 1000000
+DEFAULT_EXPECTED_IDS = 10000000
+MERGE_RUNS = 8
+
+
+def _lines(path):
+    with open(path, 'rb') as f:
+        for line in f:
+            line = line.rstrip(b'\r\n')
+            if line:
+                yield line
+
+
+def _write_ids(ids, path):
+    """ Write the sorted ids to the path, each id only once. Returns the path. """
+    with open(path, 'wb') as f:
+        f.writelines(i + b'\n' for i, _ in groupby(ids))
+
+    return path
+
+
+def _merge(paths, path):
+    ret = _write_ids(heapq.merge(*[_lines(i) for i in paths]), path)
+    for i in paths:
+        Path(i).unlink()
+
+    return ret
+
+
+def is_sorted_id_file(path):
+    previous = None
+    for i in _lines(path):
+        if previous is not None and i < previous:
+            return False
+        previous = i
+
+    return True
+
+
+def sort_id_file(path, output_path, buffer_ids=SORT_BUFFER_IDS):
+    """ Sort the ids in path into output_path (an external merge sort with sorted runs of at most buffer_ids ids). """
+    with tempfile.TemporaryDirectory(dir=Path(output_path).parent) as tmp_dir:
+        runs, buffer = [], []
+        for i in _lines(path):
+            buffer += [i]
+            if len(buffer) >= buffer_ids:
+                runs += [_write_ids(sorted(buffer), Path(tmp_dir) / f'{len(runs)}.ids')]
+                buffer = []
+
+        if buffer or not runs:
+            runs += [_write_ids(sorted(buffer), Path(tmp_dir) / f'{len(runs)}.ids')]
+
+        return _merge(runs, output_path)
+
+
+class SortedIdFile(object):
+    """ Membership tests for the ids of a sorted id file via binary search on the memory-mapped file. """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.file = open(self.path, 'rb')
+        self.size = self.path.stat().st_size
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+
+    def __contains__(self, doc_id):
+        key = doc_id if isinstance(doc_id, bytes) else str(doc_id).encode('utf-8')
+        mm, lo, hi = self.mm, 0, self.size
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = mm.rfind(b'\n', 0, mid) + 1
+            end = mm.find(b'\n', mid)
+            end = self.size if end < 0 else end
+            line = mm[start:end].rstrip(b'\r')
+            if line == key:
+                return True
+            elif line < key:
+                lo = end + 1
+            else:
+                hi = start
+
+        return False
+
+    def __iter__(self):
+        return _lines(self.path)
+
+    def close(self):
+        if self.size:
+            self.mm.close()
+        self.file.close()
+
+
+def open_allowlist(path, tmp_dir):
+    """ The allowlist of ids in path as SortedIdFile. Unsorted allowlists are sorted into tmp_dir first. """
+    if not is_sorted_id_file(path):
+        path = sort_id_file(path, Path(tmp_dir) / 'allowlist.ids')
+
+    return SortedIdFile(path)
+
+
+class BloomFilter(object):
+    """ A Bloom filter in a numpy bit array, sized for the expected number of ids and the false positive rate. Keys are
+    hashed with the (per process salted) hash of python, so the filter must not be persisted or shared. """
+
+    def __init__(self, expected_ids, false_positive_rate=0.01):
+        expected_ids = max(expected_ids, 1)
+        self.bits = max(int(-expected_ids * math.log(false_positive_rate) / math.log(2) ** 2), 64)
+        self.hashes = max(round(self.bits / expected_ids * math.log(2)), 1)
+        self.array = np.zeros((self.bits + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, keys):
+        """ The byte offsets and bit masks of the keys in the array, with double hashing (one row per key). """
+        h1 = np.fromiter((hash(i) for i in keys), dtype=np.int64, count=len(keys)).view(np.uint64)
+        h2 = (h1 >> np.uint64(32)) | np.uint64(1)
+        positions = (h1[:, None] + np.arange(self.hashes, dtype=np.uint64)[None, :] * h2[:, None]) % \
+            np.uint64(self.bits)
+
+        return positions >> np.uint64(3), (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8))
+
+    def contains_many(self, keys):
+        offsets, masks = self._positions(keys)
+        return np.all(self.array[offsets] & masks, axis=1)
+
+    def __contains__(self, key):
+        return bool(self.contains_many([key])[0])
+
+    def add_many(self, keys):
+        """ Add the keys. Returns for each key whether it was possibly added before this call. """
+        offsets, masks = self._positions(keys)
+        ret = np.all(self.array[offsets] & masks, axis=1)
+        np.bitwise_or.at(self.array, offsets.ravel(), masks.ravel())
+
+        return ret
+
+
+class SpilledIdSet(object):
+    """ An exact set of (string) ids that keeps at most buffer_ids ids in memory and spills the others to sorted id
+    files in directory. Every merge_runs runs of the same size are merged into one run, so each id is rewritten
+    about log(ids / buffer_ids) / log(merge_runs) times and there are at most merge_runs - 1 runs per size. """
+
+    def __init__(self, directory, buffer_ids=SORT_BUFFER_IDS, merge_runs=MERGE_RUNS):
+        self.directory = Path(directory)
+        self.buffer_ids = buffer_ids
+        self.merge_runs = merge_runs
+        self.buffer = set()
+        self.runs = []  # (level, SortedIdFile) with decreasing levels
+        self.spilled = 0
+
+    def __contains__(self, key):
+        return key in self.buffer or any(key in run for _, run in self.runs)
+
+    def update(self, keys):
+        self.buffer.update(keys)
+        if len(self.buffer) >= self.buffer_ids:
+            self._spill()
+
+    def add(self, key):
+        self.update([key])
+
+    def _spill(self):
+        path = self._next_path()
+        path.write_bytes(''.join(i + '\n' for i in sorted(self.buffer)).encode('utf-8'))
+        self.buffer = set()
+        self.runs += [(0, SortedIdFile(path))]
+
+        level = 0
+        while len(self.runs) >= self.merge_runs and all(i[0] == level for i in self.runs[-self.merge_runs:]):
+            runs, self.runs = self.runs[-self.merge_runs:], self.runs[:-self.merge_runs]
+            for _, run in runs:
+                run.close()
+            level += 1
+            self.runs += [(level, SortedIdFile(_merge([run.path for _, run in runs], self._next_path())))]
+
+    def _next_path(self):
+        self.spilled += 1
+        return self.directory / f'seen-{self.spilled}.ids'
+
+    def close(self):
+        for _, run in self.runs:
+            run.close()
+        self.runs = []
+
+
+class DuplicateIdFilter(object):
+    """ Detects ids that were seen before with a Bloom filter in memory and an exact SpilledIdSet as fallback for the
+    ids that the Bloom filter reports as seen (duplicates and false positives). The result is exact, a Bloom filter
+    that receives more ids than expected only makes the exact lookups more frequent. """
+
+    def __init__(self, directory, expected_ids=None, false_positive_rate=0.01, buffer_ids=SORT_BUFFER_IDS):
+        self.bloom_filter = BloomFilter(expected_ids or DEFAULT_EXPECTED_IDS, false_positive_rate)
+        self.ids = SpilledIdSet(directory, buffer_ids)
+        self.exact_lookups = 0
+
+    def seen_before_many(self, doc_ids):
+        """ Whether each doc_id was seen before (also earlier in doc_ids). Marks the doc_ids as seen. """
+        keys = [str(i) for i in doc_ids]
+        ret, new_keys = [], set()
+        for key, possibly_seen in zip(keys, self.bloom_filter.add_many(keys)):
+            if key in new_keys:
+                ret += [True]
+            elif possibly_seen:
+                self.exact_lookups += 1
+                ret += [key in self.ids]
+                if not ret[-1]:
+                    new_keys.add(key)
+            else:
+                ret += [False]
+                new_keys.add(key)
+
+        self.ids.update(new_keys)
+        return ret
+
+    def seen_before(self, doc_id):
+        """ Whether the doc_id was seen before. Marks the doc_id as seen. """
+        return self.seen_before_many([doc_id])[0]
+
+    def close(self):
+        self.ids.close()
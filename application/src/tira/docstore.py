@@ -0,0 +1,246 @@
+"""
+A compact binary store of the documents of a dataset for random access by docno (documents.docstore).
+
+The documents (the lines of documents.jsonl) are stored in zstd compressed blocks of about DOCSTORE_BLOCK_BYTES, and an
+index maps the docnos to their block, so looking up a document decompresses one block instead of scanning the corpus.
+The store is a single file that is memory-mapped by readers:
+
+    header        struct HEADER: magic, version, number of documents, blocks, and buckets, positions of the sections
+    blocks        zstd frames, each with the utf-8 encoded lines of consecutive documents
+    block offsets uint64[blocks + 1]: the position of each block in the file
+    buckets       uint64[buckets + 1]: the first record of each bucket (a docno is in bucket hash(docno) % buckets)
+    records       struct RECORD per document, sorted by bucket: hash, block, offset and length in the block,
+                  length and position of the docno in the docnos section
+    docnos        the utf-8 encoded docnos
+
+hash(docno) is the little-endian blake2b-64 of the utf-8 encoded docno. All integers are little-endian. A reader is in
+the python client (tira.third_party_integrations.TiraDocstore).
+"""
+from pathlib import Path
+import hashlib
+import json
+import mmap
+import shutil
+import struct
+import tempfile
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:  # documents.docstore can not be written or read, documents.jsonl still works
+    zstandard = None
+
+DOCSTORE_MAGIC = b'TIRADOCS'
+DOCSTORE_VERSION = 1
+DOCSTORE_BLOCK_BYTES = 64 * 1024
+DOCSTORE_COMPRESSION_LEVEL = 3
+DOCSTORE_INDEX_CHUNK = 1024 * 1024
+
+HEADER = struct.Struct('<8sIIQQQQQQQ')
+RECORD = np.dtype([('hash', '<u8'), ('block', '<u4'), ('offset', '<u4'), ('length', '<u4'), ('docno_length', '<u4'),
+                   ('docno_offset', '<u8')])
+
+
+def docno_hash(docno):
+    """ The hash of the utf-8 encoded docno. """
+    return int.from_bytes(hashlib.blake2b(docno, digest_size=8).digest(), 'little')
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise ValueError('The docstore requires the zstandard package (pip install zstandard).')
+
+
+class DocstoreWriter(object):
+    """ Writes documents.docstore while the documents are added one by one. The records, docnos, and block offsets of
+    the added documents are kept in temporary files next to the store, and the index is built on disk in close (a
+    counting sort into memory-mapped sections of the store), so the memory does not grow with the number of documents.
+    """
+
+    def __init__(self, path, block_bytes=DOCSTORE_BLOCK_BYTES, level=DOCSTORE_COMPRESSION_LEVEL,
+                 index_chunk=DOCSTORE_INDEX_CHUNK):
+        _require_zstandard()
+        self.path = Path(path)
+        if self.path.exists():
+            raise RuntimeError(f"File already exists: {self.path}")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.file = self.path.open('wb')
+        self.file.write(b'\0' * HEADER.size)
+        self.tmp_dir = tempfile.TemporaryDirectory(dir=self.path.parent)
+        self.records = open(self._tmp('records'), 'wb')
+        self.docnos = open(self._tmp('docnos'), 'wb')
+        self.block_offsets = open(self._tmp('block-offsets'), 'wb')
+        self.block_offsets.write(struct.pack('<Q', HEADER.size))
+        self.compressor = zstandard.ZstdCompressor(level=level)
+        self.block_bytes = block_bytes
+        self.index_chunk = index_chunk
+        self.block, self.block_size, self.pending = [], 0, []
+        self.num_blocks, self.docnos_size, self.count = 0, 0, 0
+
+    def _tmp(self, name):
+        return Path(self.tmp_dir.name) / name
+
+    def add(self, docno, line):
+        """ Add the document with the docno and its line of documents.jsonl (without the newline). """
+        data, docno = (line + '\n').encode('utf-8'), str(docno).encode('utf-8')
+        self.pending += [(docno_hash(docno), self.num_blocks, self.block_size, len(data), len(docno), self.docnos_size)]
+        self.docnos.write(docno)
+        self.docnos_size += len(docno)
+        self.block += [data]
+        self.block_size += len(data)
+        self.count += 1
+
+        if self.block_size >= self.block_bytes:
+            self._flush_block()
+
+    def _flush_block(self):
+        if not self.block:
+            return
+
+        self.file.write(self.compressor.compress(b''.join(self.block)))
+        self.block_offsets.write(struct.pack('<Q', self.file.tell()))
+        self.num_blocks += 1
+        self.block, self.block_size = [], 0
+
+        records = np.zeros(len(self.pending), dtype=RECORD)
+        for i, field in enumerate(RECORD.names):
+            records[field] = [p[i] for p in self.pending]
+        self.records.write(records.tobytes())
+        self.pending = []
+
+    def _copy(self, name):
+        with open(self._tmp(name), 'rb') as f:
+            shutil.copyfileobj(f, self.file, 1024 * 1024)
+
+    def close(self):
+        """ Write the index and the header. """
+        self._flush_block()
+        for f in (self.records, self.docnos, self.block_offsets):
+            f.close()
+
+        num_buckets = max(self.count, 1)
+        block_offsets_position = self.file.tell()
+        self._copy('block-offsets')
+        buckets_position = self.file.tell()
+        records_position = buckets_position + 8 * (num_buckets + 1)
+        docnos_position = records_position + RECORD.itemsize * self.count
+        self.file.seek(docnos_position)
+        self._copy('docnos')
+        self.file.flush()
+
+        self._write_index(buckets_position, num_buckets, records_position)
+
+        self.file.seek(0)
+        self.file.write(HEADER.pack(DOCSTORE_MAGIC, DOCSTORE_VERSION, 0, self.count, self.num_blocks, num_buckets,
+                                    block_offsets_position, buckets_position, records_position, docnos_position))
+        self.file.close()
+        self.tmp_dir.cleanup()
+
+    def _write_index(self, buckets_position, num_buckets, records_position):
+        """ Sort the records by bucket into the store with a counting sort over chunks of index_chunk records: the
+        first pass counts the records per bucket, the second pass scatters each record to the next free position of
+        its bucket. The buckets, the positions, and the records are memory-mapped files. """
+        buckets = np.memmap(self.path, dtype='<u8', mode='r+', offset=buckets_position, shape=(num_buckets + 1,))
+        buckets[:] = 0
+        if not self.count:
+            buckets.flush()
+            return
+
+        records = np.memmap(self._tmp('records'), dtype=RECORD, mode='r')
+        chunks = [records[i:i + self.index_chunk] for i in range(0, self.count, self.index_chunk)]
+
+        for chunk in chunks:
+            bucket_ids, counts = np.unique(chunk['hash'] % np.uint64(num_buckets), return_counts=True)
+            buckets[bucket_ids + 1] += counts.astype('<u8')
+        np.cumsum(buckets, out=buckets)
+
+        positions = np.memmap(self._tmp('positions'), dtype='<u8', mode='w+', shape=(num_buckets,))
+        positions[:] = buckets[:-1]
+        sorted_records = np.memmap(self.path, dtype=RECORD, mode='r+', offset=records_position, shape=(self.count,))
+
+        for chunk in chunks:
+            chunk_buckets = chunk['hash'] % np.uint64(num_buckets)
+            order = np.argsort(chunk_buckets, kind='stable')
+            chunk_buckets = chunk_buckets[order]
+            bucket_ids, first, counts = np.unique(chunk_buckets, return_index=True, return_counts=True)
+            rank = np.arange(len(chunk_buckets), dtype='<u8') - np.repeat(first, counts).astype('<u8')
+            sorted_records[positions[chunk_buckets] + rank] = chunk[order]
+            positions[bucket_ids] += counts.astype('<u8')
+
+        buckets.flush()
+        sorted_records.flush()
+        del buckets, positions, sorted_records, records, chunks
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            for f in (self.file, self.records, self.docnos, self.block_offsets):
+                f.close()
+            self.tmp_dir.cleanup()
+            self.path.unlink(missing_ok=True)
+
+
+class Docstore(object):
+    """ Random access to the documents in documents.docstore by docno. """
+
+    def __init__(self, path):
+        _require_zstandard()
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, self.count, self.num_blocks, self.num_buckets, self.block_offsets, self.buckets, \
+            self.records, self.docnos = HEADER.unpack_from(self.mm, 0)
+        if magic != DOCSTORE_MAGIC or version != DOCSTORE_VERSION:
+            raise ValueError(f'The file {path} is not a docstore of version {DOCSTORE_VERSION}.')
+        self.decompressor = zstandard.ZstdDecompressor()
+        self.cached_block = (None, None)
+
+    def __len__(self):
+        return self.count
+
+    def _block(self, block):
+        if self.cached_block[0] != block:
+            start, end = struct.unpack_from('<QQ', self.mm, self.block_offsets + 8 * block)
+            self.cached_block = (block, self.decompressor.decompress(self.mm[start:end]))
+
+        return self.cached_block[1]
+
+    def _locate(self, docno):
+        """ The (block, offset, length) of the docno or None if the docno is not in the store. """
+        docno = str(docno).encode('utf-8')
+        h = docno_hash(docno)
+        start, end = struct.unpack_from('<QQ', self.mm, self.buckets + 8 * (h % self.num_buckets))
+
+        for i in range(start, end):
+            record_hash, block, offset, length, docno_length, docno_offset = \
+                struct.unpack_from('<QIIIIQ', self.mm, self.records + RECORD.itemsize * i)
+            if record_hash == h and self.mm[self.docnos + docno_offset:self.docnos + docno_offset + docno_length] == docno:
+                return block, offset, length
+
+        return None
+
+    def get_line(self, docno):
+        """ The line of documents.jsonl of the docno or None if the docno is not in the store. """
+        location = self._locate(docno)
+        if location is None:
+            return None
+
+        block, offset, length = location
+        return self._block(block)[offset:offset + length].decode('utf-8').rstrip('\n')
+
+    def get(self, docno):
+        """ The document (the parsed line of documents.jsonl) of the docno or None if the docno is not in the store. """
+        line = self.get_line(docno)
+        return json.loads(line) if line is not None else None
+
+    def __contains__(self, docno):
+        return self._locate(docno) is not None
+
+    def close(self):
+        self.mm.close()
@@ -69,6 +69,13 @@ def admin_reload_tasks():
     return "Task data was reloaded successfully"
 
 
+@check_permissions
+@handle_get_model_exceptions
+def admin_git_client_metrics():
+    from tira.git_clients import metrics
+    return metrics.snapshot()
+
+
 @check_conditional_permissions(restricted=True)
 @handle_get_model_exceptions
 def admin_reload_runs(vm_id):
@@ -2,14 +2,18 @@ import logging
 import json
 from tira.forms import *
 import tira.tira_model as model
+from tira import gitlab_webhooks
 from tira.checks import check_permissions, check_resources_exist, check_conditional_permissions
-from tira.tira_data import get_run_runtime, get_run_file_list, get_stderr, get_stdout, get_tira_log
+from tira.tira_data import get_run_runtime, get_run_file_list, get_stderr, get_stdout, get_tira_log, \
+    get_run_log_path, read_log_range, RUN_LOGS, LOG_PAGE_BYTES
 from tira.views import add_context, _add_user_vms_to_context
 from tira.authentication import auth
+from tira.evaluation_export import EXPORT_FORMATS, export_chunks, format_is_available
 
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, HttpResponseNotAllowed
 from django.conf import settings
 from django.core.cache import cache
+from django.utils import timezone
 from django.core.serializers.json import DjangoJSONEncoder
 from http import HTTPStatus
 import datetime
@@ -67,6 +71,42 @@ def get_evaluations_by_dataset(request, context, task_id, dataset_id):
     return JsonResponse({'status': 1, "context": context})
 
 
+@check_permissions
+@check_resources_exist("json")
+@add_context
+def export_evaluations(request, context, task_id):
+    """ Export all evaluations of the task with the metadata of the evaluated submissions in one streamed response,
+    one row per evaluation with the measures as columns. Only admins and organizers of the task can export.
+
+    GET parameters:
+    - datasets: comma separated ids of datasets of the task (default: all datasets of the task)
+    - format: ndjson (default), arrow (Apache Arrow IPC stream), or parquet
+    """
+    task = model.get_task_permission_metadata(task_id) or {}
+    if context['role'] != auth.ROLE_ADMIN and task.get('organizer_id') not in auth.get_organizer_ids(request):
+        return HttpResponseNotAllowed("Access forbidden.")
+
+    export_format = request.GET.get('format', 'ndjson')
+    if not format_is_available(export_format):
+        return JsonResponse({'status': 1, 'message': f'The format {export_format} is not available.'},
+                            status=HTTPStatus.BAD_REQUEST)
+
+    task_datasets = [i['dataset_id'] for i in model.get_datasets_by_task(task_id, include_deprecated=True)]
+    dataset_ids = [i for i in request.GET.get('datasets', '').split(',') if i] or task_datasets
+    unknown_datasets = [i for i in dataset_ids if i not in task_datasets]
+    if unknown_datasets:
+        return JsonResponse({'status': 1, 'message': f'The task {task_id} has no datasets {unknown_datasets}.'},
+                            status=HTTPStatus.NOT_FOUND)
+
+    measures = model.get_evaluation_measures_for_export(dataset_ids)
+    content_type, extension = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(export_chunks(task_id, model.get_evaluations_for_export(dataset_ids), measures,
+                                                   export_format), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{task_id}-evaluations.{extension}"'
+
+    return response
+
+
 @check_permissions
 @add_context
 def get_evaluation(request, context, run_id, vm_id):
@@ -77,7 +117,7 @@ def get_evaluation(request, context, run_id, vm_id):
         # We need the vm_id to get the check working, otherwise we have no direct link to the vm.
         return JsonResponse({'status': 1, "message": f"Run {run_id} is not an evaluation run."})
 
-    dataset = model.get_dataset(run['dataset'])
+    dataset = model.get_dataset(run['dataset'], include_stats=False)
     
     if context['role'] != 'admin' and review["blinded"] and dataset['is_confidential']:
         return JsonResponse({'status': 1, "message": f"Run {run_id} is not unblinded."})
@@ -213,6 +253,9 @@ def get_running_software(request, context, task_id, user_id, force_cache_refresh
     for git_repository_id in sorted(list(repositories)):
         context['running_software'] += list(git_runner.yield_all_running_pipelines(int(git_repository_id), user_id, cache, force_cache_refresh=eval(force_cache_refresh)))
         context['running_software_last_refresh'] = model.load_refresh_timestamp_for_cache_key(cache, 'all-running-pipelines-repo-' + str(git_repository_id))
+        if context['running_software_last_refresh'] is None:
+            # Repositories that report their pipelines via webhooks are not polled, i.e., have no cached pipelines
+            context['running_software_last_refresh'] = gitlab_webhooks.last_event(git_repository_id) or timezone.now()
         context['running_software_next_refresh'] = str(context['running_software_last_refresh'] + datetime.timedelta(seconds=15))
         context['running_software_last_refresh'] = str(context['running_software_last_refresh'])
 
@@ -252,6 +295,51 @@ def get_review(request, context, dataset_id, vm_id, run_id):
     return JsonResponse({'status': 0, "context": context})
 
 
+# The maximal number of bytes of a log that can be requested at once via api/run-log
+MAX_LOG_PAGE_BYTES = 16 * 1024 * 1024
+
+
+@check_permissions
+@check_resources_exist("json")
+@add_context
+def get_run_log(request, context, dataset_id, vm_id, run_id, log):
+    """ Stream a range of the stdout or stderr of a run as plain text. The range is passed via the GET parameters
+    offset (in bytes, negative offsets count from the end of the log) and length (in bytes).
+    The headers X-Tira-Log-Size, X-Tira-Log-Offset, and X-Tira-Log-Next-Offset allow to page through the log. """
+    if log not in RUN_LOGS:
+        return JsonResponse({'status': 1, 'message': f'Unknown log {log}. Use one of {list(RUN_LOGS)}.'},
+                            status=HTTPStatus.NOT_FOUND)
+
+    dataset = model.get_dataset(dataset_id)
+    review = model.get_run_review(dataset_id, vm_id, run_id)
+    if context['role'] != 'admin' and not (context['role'] == auth.ROLE_PARTICIPANT and (
+            not dataset.get('is_confidential', True) or not review['blinded'])):
+        return JsonResponse({'status': 1, 'message': f'The {log} of the run is hidden.'}, status=HTTPStatus.FORBIDDEN)
+
+    path = get_run_log_path(dataset_id, vm_id, run_id, log)
+    if not path.exists():
+        return JsonResponse({'status': 1, 'message': f'No {log} recorded.'}, status=HTTPStatus.NOT_FOUND)
+
+    try:
+        offset = int(request.GET.get('offset', 0))
+        length = min(int(request.GET.get('length', LOG_PAGE_BYTES)), MAX_LOG_PAGE_BYTES)
+    except ValueError:
+        return JsonResponse({'status': 1, 'message': 'offset and length must be integers.'},
+                            status=HTTPStatus.BAD_REQUEST)
+
+    size = path.stat().st_size
+    offset = min(max(size + offset if offset < 0 else offset, 0), size)
+    end = min(offset + max(length, 0), size)
+
+    response = StreamingHttpResponse(read_log_range(path, offset, end - offset),
+                                     content_type='text/plain; charset=utf-8')
+    response['X-Tira-Log-Size'] = str(size)
+    response['X-Tira-Log-Offset'] = str(offset)
+    response['X-Tira-Log-Next-Offset'] = str(end) if end < size else ''
+
+    return response
+
+
 @add_context
 def add_registration(request, context, task_id, vm_id):
     """ get the registration of a user on a task. If there is none """
@@ -1,43 +1,197 @@
 #!/usr/bin/env python3
+"""
+Render the ANSI escape codes (SGR colors and styles) in the stdout/stderr of runs as HTML.
+
+The markup is identical to the markup of aha (the Ansi HTML Adapter, version 0.5.1) that was used before: the text is
+tokenized with one compiled regex, only the escape sequences are processed in python, and each change of the style
+closes the previous span and opens a new one.
+"""
+from html import escape
 import re
-from subprocess import run, PIPE
-from bs4 import BeautifulSoup
-import os
 import logging
 
-ansi_color_code_regex = re.compile("\[(\\d)+(;)*(\\d)*m")
-aha_exec = os.path.abspath(__file__).replace('stdout_beautifier.py', 'aha')
-
 logger = logging.getLogger('tira')
 
-def is_start_of_ansi_code(txt, pos):
-    if txt[pos] != '[':
-        return False
-    
-    matches = ansi_color_code_regex.search(txt[pos: pos+8])
-    
-    return matches and matches.span()[0] == 0
+# Logs are often shown without the escape character, e.g., "[92mo[0m", so it is restored before codes like this
+ansi_color_code_regex = re.compile('(?<!\x1b)\\[\\d+;*\\d*m')
+
+# One token per escape sequence (CSI parameters until a letter or '>', OSC until BEL or ESC + one character,
+# character set designations, other escapes with one character) or backspace. Unterminated sequences run to the end.
+ansi_token_regex = re.compile(
+    '\x1b(?:\\[([^A-Za-z>]*)([A-Za-z>])?|\\][^\x07\x1b]*(?:\x07|\x1b[\\s\\S]?)?|\\([\\s\\S]?|[\\s\\S]?)|\x08'
+)
+
+HIGHLIGHTED = 'filter: contrast(70%) brightness(190%);'
+FOREGROUND_COLORS = ['dimgray', 'red', 'green', 'olive', 'blue', 'purple', 'teal', 'gray', 'white', 'black']
+BACKGROUND_COLORS = ['black', 'red', 'green', 'olive', 'blue', 'purple', 'teal', 'gray', 'white', 'black']
+
+# The style: (underline, bold, italic, blink, crossed_out, highlighted, foreground, background). Colors are -1 for the
+# default, 0-9 for the named colors, (5, n) for 8-bit colors, or (2, rgb) for 24-bit colors. As in aha, colors with
+# different modes are different styles, even if they are rendered the same (e.g., 31 and 38;5;1).
+DEFAULT_STYLE = (0, 0, 0, 0, 0, 0, -1, -1)
+UNDERLINE, BOLD, ITALIC, BLINK, CROSSED_OUT, HIGHLIGHTED_COLOR, FOREGROUND, BACKGROUND = range(8)
+
+
+def _parameters(parameters):
+    """ The parameters of the SGR sequence as in aha: the digits (at most 8, every character counts as digit) and the
+    value of each parameter. Empty parameters are 0. """
+    ret = []
+    for parameter in re.split('[;:]', parameters.replace('[', '')):
+        digits = [ord(i) - 48 for i in parameter[:8]] or [0]
+        value = 0
+        for digit in digits:
+            value = value * 10 + digit
+        ret += [(digits, value)]
+
+    return ret
+
+
+def _rgb(color):
+    """ The hex code of an 8-bit color between 16 and 255. """
+    if color >= 232:
+        return '#' + ('%02x' % ((color - 232) * 256 // 24)) * 3
+
+    color -= 16
+    return '#' + ''.join('%02x' % (55 + i * 40 if i > 0 else 0) for i in [color // 36, (color % 36) // 6, color % 6])
+
+
+def _extended_color(parameters, pos):
+    """ The extended color (38;5;n or 38;2;r;g;b) that starts after pos as (color, highlighted, consumed parameters)
+    or None if the parameters do not describe an extended color. """
+    if pos + 2 < len(parameters) and parameters[pos + 1][1] == 5:
+        color = parameters[pos + 2][1]
+        if color < 256:
+            return (5, color), int(8 <= color < 16), 2
+        return -1, 0, 2
+
+    if pos + 4 < len(parameters) and parameters[pos + 1][1] == 2:
+        return (2, '#' + ''.join('%02x' % (parameters[pos + i][1] & 0xff) for i in [2, 3, 4])), 0, 4
+
+    return None
+
+
+def _swap_colors(style):
+    style[FOREGROUND], style[BACKGROUND] = (8 if style[BACKGROUND] == -1 else style[BACKGROUND],
+                                            9 if style[FOREGROUND] == -1 else style[FOREGROUND])
+
+
+def apply_sgr(style, negative, parameters):
+    """ Apply the parameters of an SGR sequence (the parameters of ESC[...m) to the style.
+    Returns the new style and whether the colors are inverted (negative). """
+    style, parameters, pos = list(style), _parameters(parameters), 0
+
+    while pos < len(parameters):
+        digits, _ = parameters[pos]
+        digits = digits[next((i for i, d in enumerate(digits) if d != 0), len(digits)):]
+
+        if not digits:
+            style, negative = list(DEFAULT_STYLE), False
+        elif len(digits) == 1:
+            if digits[0] in (1, 3, 4, 5, 9):
+                style[{1: BOLD, 3: ITALIC, 4: UNDERLINE, 5: BLINK, 9: CROSSED_OUT}[digits[0]]] = 1
+            elif digits[0] == 7:
+                _swap_colors(style)
+                negative = not negative
+        elif len(digits) == 2 and digits[0] == 2:
+            if digits[1] in (1, 2, 3, 4, 5, 9):
+                style[{1: BOLD, 2: BOLD, 3: ITALIC, 4: UNDERLINE, 5: BLINK, 9: CROSSED_OUT}[digits[1]]] = 0
+            elif digits[1] == 7 and negative:
+                _swap_colors(style)
+                negative = False
+        elif len(digits) == 2 and digits[0] in (3, 4):
+            foreground = digits[0] == 3
+            if digits[1] == 9:
+                style[FOREGROUND if foreground else BACKGROUND] = -1
+                style[HIGHLIGHTED_COLOR] = 0
+            elif digits[1] == 8:
+                extended = _extended_color(parameters, pos)
+                color, highlighted, consumed = extended if extended else (8, 0, 0)
+                style[FOREGROUND if foreground != negative else BACKGROUND] = color
+                style[HIGHLIGHTED_COLOR] = highlighted
+                pos += consumed
+            elif digits[1] < 8:
+                style[FOREGROUND if foreground != negative else BACKGROUND] = digits[1]
+                style[HIGHLIGHTED_COLOR] = 0
+        elif (len(digits) == 2 and digits[0] == 9 and digits[1] < 8) or \
+                (len(digits) == 3 and digits[:2] == [1, 0] and digits[2] < 8):
+            foreground = len(digits) == 2
+            style[FOREGROUND if foreground != negative else BACKGROUND] = digits[-1]
+            style[HIGHLIGHTED_COLOR] = 1
+
+        pos += 1
+
+    return tuple(style), negative
+
+
+def _color(color, names):
+    if not isinstance(color, tuple):
+        return names[color]
+    mode, color = color
+    if mode == 2:
+        return color
+
+    return names[color % 8] if color < 16 else _rgb(color)
+
+
+def style_as_css(style):
+    return ''.join([
+        'text-decoration:underline;' if style[UNDERLINE] else '',
+        'font-weight:bold;' if style[BOLD] else '',
+        'font-style:italic;' if style[ITALIC] else '',
+        'text-decoration:blink;' if style[BLINK] else '',
+        'text-decoration:line-through;' if style[CROSSED_OUT] else '',
+        HIGHLIGHTED if style[HIGHLIGHTED_COLOR] else '',
+        f'color:{_color(style[FOREGROUND], FOREGROUND_COLORS)};' if style[FOREGROUND] != -1 else '',
+        f'background-color:{_color(style[BACKGROUND], BACKGROUND_COLORS)};' if style[BACKGROUND] != -1 else '',
+    ])
+
+
+def _is_styled(style):
+    return style[:HIGHLIGHTED_COLOR] != DEFAULT_STYLE[:HIGHLIGHTED_COLOR] or style[FOREGROUND] != -1 or \
+        style[BACKGROUND] != -1
+
+
+def _transition(style, negative, parameters):
+    """ The new style, whether the colors are inverted, and the markup that switches to the new style. """
+    new_style, negative = apply_sgr(style, negative, parameters)
+    if new_style == style:
+        return style, negative, ''
+
+    return new_style, negative, ('</span>' if _is_styled(style) else '') + \
+        (f'<span style="{style_as_css(new_style)}">' if _is_styled(new_style) else '')
+
+
+def ansi_to_html(txt):
+    """ Convert the text with ANSI escape codes to HTML (without the surrounding pre element).
+    Logs repeat the same few escape sequences, so the transitions between styles are computed once per log. """
+    ret, pos, style, negative, transitions = [], 0, DEFAULT_STYLE, False, {}
+
+    for token in ansi_token_regex.finditer(txt):
+        start = token.start()
+        if start > pos:
+            ret += [escape(txt[pos:start], quote=False)]
+        pos = token.end()
+
+        if token.group(2) != 'm':
+            continue
+
+        key = (style, negative, token.group(1))
+        if key not in transitions:
+            transitions[key] = _transition(*key)
+        style, negative, markup = transitions[key]
+        if markup:
+            ret += [markup]
+
+    ret += [escape(txt[pos:], quote=False), '</span>' if _is_styled(style) else '']
+
+    return ''.join(ret).replace('\r\n', '\n').replace('\r', '\n')
+
 
 def beautify_ansi_text(txt):
-#    try:
-        ret = ''
-        for i in range(len(txt)):
-            if is_start_of_ansi_code(txt, i):
-                ret += '\033['
-            else:
-                ret += txt[i]
-        p = run([aha_exec], stdout=PIPE, input=ret, encoding='utf8')
-        ret = p.stdout
-        if p.returncode != 0:
-            raise ValueError(f'Returncode invalid: {p.returncode}. Got {ret}.')
-
-        ret = BeautifulSoup(ret, 'html.parser')
-        return '\n\n'.join([str(i) for i in ret.select('pre')])
-#    except Exception as e:
-#        print(f'Failed to beautify with {e}. Return original text')
-#        logger.warn(f'Failed to beautify with {e}. Return original text', e)
-#        
-#        return txt
+    txt = ansi_color_code_regex.sub(lambda i: '\x1b' + i.group(0) if len(i.group(0)) <= 8 else i.group(0), txt)
+
+    return '<pre>\n' + ansi_to_html(txt) + '</pre>'
+
 
 if __name__ == '__main__':
     print(beautify_ansi_text('''  [[92mo[0m] The file local-copy-of-input-run/run.jsonl is in JSONL format.
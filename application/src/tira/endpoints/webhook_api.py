@@ -0,0 +1,34 @@
+import hmac
+import json
+import logging
+from http import HTTPStatus
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from tira.gitlab_webhooks import ingest_event
+
+logger = logging.getLogger("tira")
+
+
+@csrf_exempt
+def gitlab_webhook(request):
+    """ Receives the pipeline, job, and push events of GitLab. The events must carry the shared secret
+    settings.GITLAB_WEBHOOK_SECRET in the X-Gitlab-Token header. """
+    if request.method != 'POST':
+        return JsonResponse({'status': 1, 'message': 'Only POST is allowed here'}, status=HTTPStatus.METHOD_NOT_ALLOWED)
+
+    secret = settings.GITLAB_WEBHOOK_SECRET
+    token = request.headers.get('X-Gitlab-Token', None)
+    if not secret or not token or not hmac.compare_digest(str(secret), str(token)):
+        return JsonResponse({'status': 1, 'message': 'Access forbidden.'}, status=HTTPStatus.FORBIDDEN)
+
+    try:
+        event = json.loads(request.body)
+        changed = ingest_event(event)
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning(f'Could not ingest the GitLab webhook event: {e}')
+        return JsonResponse({'status': 1, 'message': f'Invalid event: {e}'}, status=HTTPStatus.BAD_REQUEST)
+
+    return JsonResponse({'status': 0, 'changed': changed})
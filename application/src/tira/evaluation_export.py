@@ -0,0 +1,119 @@
+"""
+Streamed bulk exports of the evaluations of a task with the metadata of the evaluated submissions.
+
+The evaluations are flattened into one row per evaluation (the measures become columns) and serialized batch by batch
+as NDJSON, as Apache Arrow IPC stream, or as Parquet (one row group per batch), so that the export of many datasets
+is streamed to the client with bounded memory.
+"""
+import json
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Arrow and Parquet exports are unavailable, NDJSON still works
+    pyarrow = None
+
+EXPORT_BATCH_ROWS = 10000
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+COLUMNS = ['task', 'dataset', 'team', 'run_id', 'evaluation_run_id', 'software', 'is_upload', 'is_docker',
+           'published', 'blinded']
+
+
+class _ExportBuffer(object):
+    """ A write-only file for the arrow writers that collects the written bytes until they are taken. """
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self.chunks += [bytes(data)]
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        ret, self.chunks = b''.join(self.chunks), []
+        return ret
+
+
+def format_is_available(export_format):
+    return export_format == 'ndjson' or (export_format in EXPORT_FORMATS and pyarrow is not None)
+
+
+def flatten(task_id, evaluation, measures):
+    """ The evaluation as row with the measures as columns. measures maps the measure keys to True if all values are
+    numeric, the values of other measures are strings. Measures named like the metadata columns are dropped. """
+    ret = {'task': task_id, **{k: evaluation[k] for k in COLUMNS[1:]}}
+    for measure, numeric in measures.items():
+        if measure not in ret:
+            value = evaluation['measures'].get(measure)
+            ret[measure] = float(value) if numeric and value is not None else value
+
+    return ret
+
+
+def _batches(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch += [row]
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def ndjson_chunks(rows, batch_size=EXPORT_BATCH_ROWS):
+    """ Yields the rows as newline delimited JSON, one chunk per batch of rows. """
+    for batch in _batches(rows, batch_size):
+        yield ''.join(json.dumps(row) + '\n' for row in batch).encode('utf-8')
+
+
+def arrow_schema(measures):
+    """ The arrow schema of the rows, measures maps the measure keys to True if all values are numeric. """
+    return pyarrow.schema(
+        [(column, pyarrow.bool_() if column.startswith('is_') or column in ('published', 'blinded')
+          else pyarrow.string()) for column in COLUMNS] +
+        [(measure, pyarrow.float64() if numeric else pyarrow.string()) for measure, numeric in measures.items()
+         if measure not in COLUMNS]
+    )
+
+
+def arrow_chunks(rows, measures, export_format='arrow', batch_size=EXPORT_BATCH_ROWS):
+    """ Yields the rows as Arrow IPC stream or as Parquet file, one chunk per batch of rows. """
+    schema, buffer = arrow_schema(measures), _ExportBuffer()
+    if export_format == 'parquet':
+        writer = pyarrow.parquet.ParquetWriter(buffer, schema)
+        write = lambda batch: writer.write_table(pyarrow.Table.from_pylist(batch, schema=schema))
+    else:
+        writer = pyarrow.ipc.new_stream(buffer, schema)
+        write = lambda batch: writer.write_batch(pyarrow.RecordBatch.from_pylist(batch, schema=schema))
+
+    for batch in _batches(rows, batch_size):
+        write(batch)
+        yield buffer.take()
+
+    writer.close()
+    yield buffer.take()
+
+
+def export_chunks(task_id, evaluations, measures, export_format, batch_size=EXPORT_BATCH_ROWS):
+    """ Yields the export of the evaluations (see tira_model.get_evaluations_for_export) in the format.
+    measures maps the measure keys to True if all values are numeric. """
+    rows = (flatten(task_id, evaluation, measures) for evaluation in evaluations)
+    if export_format == 'ndjson':
+        return ndjson_chunks(rows, batch_size)
+
+    return arrow_chunks(rows, measures, export_format, batch_size)
@@ -0,0 +1,224 @@
+"""
+Shared clients for the git hosters (GitLab, GitHub) and the docker registry.
+
+Each git integration gets one pooled requests.Session (and one API client on top of it) per process that is reused by
+all runners. Requests are rate limited per host (see tira.git_refresher) and retried with jittered exponential backoff
+on 429 and 5xx responses (settings.GIT_RETRIES, settings.GIT_RETRY_BACKOFF).
+
+All requests of the pooled sessions are measured: GitClientMetrics counts the calls, errors, and retries and keeps a
+latency histogram per endpoint, and the GitClientMetricsMiddleware attributes the number of calls to the TIRA pages
+(i.e., the url routes) that triggered them.
+"""
+from contextvars import ContextVar
+from threading import Lock, RLock
+from urllib.parse import urlparse
+import re
+import time
+
+from django.conf import settings
+import gitlab
+from github import Github
+import requests
+from urllib3.util.retry import Retry
+
+from tira.git_refresher import RateLimitedAdapter, rate_limiter
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+UNRESOLVED_ROUTE = '<unresolved>'
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+# Path segments that follow these segments are names (e.g., of branches) that are not part of the endpoint
+_NAMED_SEGMENTS = {'branches', 'commits', 'files', 'tags', 'refs', 'users', 'repos'}
+_ID_SEGMENT = re.compile(r'^(\d+|[0-9a-f]{40}|sha256:[0-9a-f]+|.*%2F.*)$', re.IGNORECASE)
+_REGISTRY_PATH = re.compile(r'^/v2/.+/(manifests|blobs)/[^/]+$')
+
+
+def endpoint_of_url(url):
+    """ The endpoint of the url without the query and with placeholders for ids and names, e.g.,
+    /api/v4/projects/:id/pipelines for https://git.webis.de/api/v4/projects/1234/pipelines?status=running. """
+    path = urlparse(url).path
+    registry_path = _REGISTRY_PATH.match(path)
+    if registry_path:
+        return f'/v2/:repository/{registry_path.group(1)}/:reference'
+
+    ret, parts = [], path.split('/')
+    for i, part in enumerate(parts):
+        if i > 0 and parts[i - 1] in _NAMED_SEGMENTS and part:
+            ret += [':name']
+        else:
+            ret += [':id' if _ID_SEGMENT.match(part) else part]
+
+    return '/'.join(ret)
+
+
+class PageCalls(object):
+    """ Counts the calls to git hosters that one request to TIRA triggered (also from worker threads). """
+
+    def __init__(self):
+        self.count = 0
+        self.lock = Lock()
+
+    def increment(self):
+        with self.lock:
+            self.count += 1
+
+
+_page_calls = ContextVar('tira_git_page_calls', default=None)
+
+
+def current_page_calls():
+    return _page_calls.get()
+
+
+def set_page_calls(page_calls):
+    """ Attribute the calls of the current context (e.g., a worker thread) to page_calls. Returns the reset token. """
+    return _page_calls.set(page_calls)
+
+
+class GitClientMetrics(object):
+    """ Thread-safe counters and latency histograms of the requests to the git hosters, per endpoint and per page. """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.endpoints = {}
+        self.pages = {}
+
+    def record(self, host, method, endpoint, status_code, seconds, retries=0):
+        with self.lock:
+            entry = self.endpoints.setdefault((host, method, endpoint), {
+                'calls': 0, 'errors': 0, 'retries': 0, 'latency_seconds_sum': 0.0,
+                'latency_histogram': [0] * len(LATENCY_BUCKETS)
+            })
+            entry['calls'] += 1
+            entry['errors'] += 1 if status_code is None or status_code >= 400 else 0
+            entry['retries'] += retries
+            entry['latency_seconds_sum'] += seconds
+            entry['latency_histogram'][next(i for i, le in enumerate(LATENCY_BUCKETS) if seconds <= le)] += 1
+
+        page_calls = current_page_calls()
+        if page_calls is not None:
+            page_calls.increment()
+
+    def record_page(self, page, git_calls):
+        with self.lock:
+            entry = self.pages.setdefault(page, {'requests': 0, 'git_calls': 0, 'max_git_calls': 0})
+            entry['requests'] += 1
+            entry['git_calls'] += git_calls
+            entry['max_git_calls'] = max(entry['max_git_calls'], git_calls)
+
+    def snapshot(self):
+        """ The metrics as dict: the endpoints with their calls and latency histograms (the number of calls per upper
+        bound 'le' in seconds) and the pages with the number of requests and triggered calls to git hosters. """
+        with self.lock:
+            endpoints = [{'host': host, 'method': method, 'endpoint': endpoint, 'calls': i['calls'],
+                          'errors': i['errors'], 'retries': i['retries'],
+                          'latency_seconds_sum': round(i['latency_seconds_sum'], 6),
+                          'latency_histogram': [{'le': str(le), 'count': count}
+                                                for le, count in zip(LATENCY_BUCKETS, i['latency_histogram'])]}
+                         for (host, method, endpoint), i in self.endpoints.items()]
+            pages = [{'page': page, **i} for page, i in self.pages.items()]
+
+        return {'endpoints': sorted(endpoints, key=lambda i: -i['calls']),
+                'pages': sorted(pages, key=lambda i: -i['git_calls'])}
+
+    def reset(self):
+        with self.lock:
+            self.endpoints = {}
+            self.pages = {}
+
+
+metrics = GitClientMetrics()
+
+
+class MeasuredAdapter(RateLimitedAdapter):
+    """ A rate limited and retrying adapter that records all requests in the metrics. """
+
+    def __init__(self, limiter, metrics, **kwargs):
+        super().__init__(limiter, **kwargs)
+        self.metrics = metrics
+
+    def send(self, request, **kwargs):
+        start, status_code, retries = time.monotonic(), None, 0
+        try:
+            response = super().send(request, **kwargs)
+            status_code = response.status_code
+            retries = len(getattr(getattr(response.raw, 'retries', None), 'history', None) or [])
+            return response
+        finally:
+            self.metrics.record(urlparse(request.url).hostname, request.method, endpoint_of_url(request.url),
+                                status_code, time.monotonic() - start, retries)
+
+
+def retry_policy():
+    """ Retry requests that failed with 429 or 5xx (respecting Retry-After) with jittered exponential backoff.
+    The last response is returned to the caller if all retries fail. """
+    return Retry(total=settings.GIT_RETRIES, connect=settings.GIT_RETRIES, read=settings.GIT_RETRIES,
+                 status=settings.GIT_RETRIES, status_forcelist=RETRY_STATUS_CODES,
+                 backoff_factor=settings.GIT_RETRY_BACKOFF, backoff_jitter=settings.GIT_RETRY_BACKOFF,
+                 raise_on_status=False)
+
+
+def pooled_session():
+    """ A new requests.Session with a connection pool sized for the refresh threads, rate limits, retries, and metrics.
+    Prefer git_session to reuse the session of a git integration. """
+    session = requests.Session()
+    adapter = MeasuredAdapter(rate_limiter, metrics, max_retries=retry_policy(), pool_connections=4,
+                              pool_maxsize=settings.GIT_REFRESH_THREADS)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    return session
+
+
+_clients = {}
+_clients_lock = RLock()
+
+
+def _shared(key, create):
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = create()
+        return _clients[key]
+
+
+def git_session(host, private_token):
+    """ The pooled session of the git integration on the host with the private_token (shared within the process). """
+    return _shared(('session', host, private_token), pooled_session)
+
+
+def gitlab_client(host, private_token):
+    """ The gitlab.Gitlab client of the git integration, it uses the pooled session of the integration. """
+    return _shared(('gitlab', host, private_token), lambda: gitlab.Gitlab(
+        'https://' + host, private_token=private_token, session=git_session(host, private_token)))
+
+
+def github_client(github_token):
+    """ The Github client of the git integration. PyGithub manages its own session, so it is pooled and retried via
+    the options of PyGithub (requests of this client are not rate limited by TIRA and not recorded in the metrics). """
+    return _shared(('github', github_token), lambda: Github(
+        github_token, retry=retry_policy(), pool_size=settings.GIT_REFRESH_THREADS))
+
+
+class GitClientMetricsMiddleware(object):
+    """ Attributes the calls to git hosters to the url route of the request. With settings.DEBUG, the responses have
+    the header X-Tira-Git-Calls with the number of calls to git hosters that the request triggered. """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        page_calls = PageCalls()
+        token = set_page_calls(page_calls)
+        try:
+            response = self.get_response(request)
+        finally:
+            _page_calls.reset(token)
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        # Requests without route (e.g., 404s of scanners) share one label, so that the paths do not grow the metrics
+        metrics.record_page(resolver_match.route if resolver_match else UNRESOLVED_ROUTE, page_calls.count)
+
+        if settings.DEBUG:
+            response['X-Tira-Git-Calls'] = str(page_calls.count)
+
+        return response
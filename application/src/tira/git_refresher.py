@@ -0,0 +1,122 @@
+"""
+Concurrent refreshes of the data that TIRA caches from the git hosters (running pipelines and docker images).
+
+All requests to a host are rate limited (settings.GIT_REQUESTS_PER_SECOND_PER_HOST) so that the bounded thread pools
+(settings.GIT_REFRESH_THREADS) can fan out the calls without overloading the host.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from urllib.parse import urlparse
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger('tira')
+
+
+class HostRateLimiter(object):
+    """ Spaces out the requests to each host, so that at most requests_per_second requests start per second. """
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0
+        self.next_slot = {}
+        self.lock = Lock()
+
+    def acquire(self, host):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+
+rate_limiter = HostRateLimiter(settings.GIT_REQUESTS_PER_SECOND_PER_HOST)
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    def __init__(self, limiter, **kwargs):
+        super().__init__(**kwargs)
+        self.limiter = limiter
+
+    def send(self, request, **kwargs):
+        self.limiter.acquire(urlparse(request.url).netloc)
+        return super().send(request, **kwargs)
+
+
+def map_concurrently(func, items, max_workers=None):
+    """ Like map(func, items) on a bounded thread pool, returns a list in the order of the items.
+    Exceptions of func are raised. The calls to git hosters in the threads are attributed to the calling page. """
+    from tira.git_clients import current_page_calls, set_page_calls
+    items = list(items)
+    if len(items) <= 1:
+        return [func(i) for i in items]
+
+    page_calls = current_page_calls()
+
+    def func_in_thread(item):
+        set_page_calls(page_calls)
+        try:
+            return func(item)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=min(len(items), max_workers or settings.GIT_REFRESH_THREADS)) as executor:
+        return list(executor.map(func_in_thread, items))
+
+
+def _refresh_or_log(name, refresh):
+    try:
+        return name, refresh(), None
+    except Exception as e:
+        logger.warning(f'Exception during refreshing {name}: {e}')
+        return name, None, e
+
+
+def repositories_with_running_pipelines(cache):
+    """ Returns the pairs (task_id, git_repository_id) of all repositories of tasks with git pipelines. """
+    import tira.tira_model as model
+    ret = {}
+
+    for task in model.get_tasks():
+        if task is None or not model.git_pipeline_is_enabled_for_task(task['task_id'], cache):
+            continue
+
+        for evaluator in model.get_evaluators_for_task(task['task_id'], cache):
+            if evaluator['is_git_runner'] and evaluator['git_repository_id']:
+                ret[str(evaluator['git_repository_id'])] = task['task_id']
+
+    return [(task_id, git_repository_id) for git_repository_id, task_id in ret.items()]
+
+
+def refresh_running_pipelines(cache, max_workers=None):
+    """ Refresh the running pipelines of all task repositories concurrently. Each repository is published to the cache
+    at once when it is complete. Repositories that report their pipelines via webhooks are skipped.
+    Returns a list of (repository, number of running pipelines or None, exception). """
+    from tira.tira_model import get_git_integration
+    from tira.gitlab_webhooks import has_pipeline_states
+
+    def refresh(task_and_repository):
+        task_id, git_repository_id = task_and_repository
+        refresh = lambda: len(get_git_integration(task_id=task_id)
+                              .all_running_pipelines_for_repository(git_repository_id, cache, force_cache_refresh=True))
+
+        return _refresh_or_log(f'repository {git_repository_id} of task {task_id}', refresh)
+
+    repositories = [i for i in repositories_with_running_pipelines(cache) if not has_pipeline_states(i[1])]
+    return map_concurrently(refresh, repositories, max_workers)
+
+
+def refresh_user_images(git_runner, cache, max_workers=None):
+    """ Refresh the docker images of all user repositories of the git runner concurrently.
+    Returns a list of (user, number of images or None, exception). """
+    def refresh(user):
+        user = user.split('tira-user-')[-1]
+        return _refresh_or_log(f'user {user}', lambda: len(git_runner.docker_images_in_user_repository(
+            user, cache, force_cache_refresh=True)))
+
+    return map_concurrently(refresh, git_runner.all_user_repositories(), max_workers)
@@ -0,0 +1,140 @@
+"""
+Ingest GitLab webhook events (pipeline events, job events, and push events that delete branches) into the
+PipelineState table, from which the running pipelines are read without polling GitLab. Events are delivered without
+guarantees on their order, so events that are older than the state of their pipeline (by the timestamps that GitLab
+reports) are ignored. The table is only trusted while the repository receives events (i.e., its last event is more recent
+than PIPELINE_STATES_MAX_AGE), otherwise the pipelines are polled, and the states of finished pipelines are pruned after
+PIPELINE_STATES_MAX_AGE.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+import logging
+
+from django.db.models import Max
+from django.utils import timezone
+
+from tira.model import PipelineState
+
+logger = logging.getLogger('tira')
+
+USER_SOFTWARE_JOB = 'run-user-software'
+RUNNING_STATUSES = {'scheduled', 'running', 'pending', 'created', 'waiting_for_resource', 'preparing'}
+FAILED_STATUSES = {'failed', 'canceled', 'skipped', 'manual'}
+DELETED_COMMIT_SHA = '0' * 40
+PIPELINE_STATES_MAX_AGE = timedelta(minutes=30)
+
+
+def ingest_event(event):
+    """ Update the pipeline states with a webhook event. Returns the number of changed pipeline states. """
+    kind = event.get('object_kind')
+    if kind == 'pipeline':
+        ret = _ingest_pipeline_event(event)
+    elif kind == 'build':
+        ret = _ingest_job_event(event)
+    elif kind == 'push' and event.get('after') == DELETED_COMMIT_SHA:
+        branch = event['ref'].split('refs/heads/')[-1]
+        ret = PipelineState.objects.filter(git_repository_id=str(event['project']['id']), ref=branch) \
+            .update(status='deleted', last_event=timezone.now())
+    else:
+        return 0
+
+    prune_pipeline_states()
+    return ret
+
+
+def _parse_time(value):
+    """ The datetime of a timestamp of GitLab (e.g., "2016-08-12 15:23:28 UTC" or ISO 8601) or None. """
+    try:
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S UTC').replace(tzinfo=dt_timezone.utc)
+    except (TypeError, ValueError):
+        pass
+
+    try:
+        ret = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return ret if ret.tzinfo else ret.replace(tzinfo=dt_timezone.utc)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _event_time(attributes, *keys):
+    """ The latest of the timestamps of the keys in the attributes of an event or None if there is none. """
+    return max([i for i in (_parse_time(attributes.get(k)) for k in keys) if i is not None], default=None)
+
+
+def _is_outdated(state, event_at, status=None):
+    """ Whether the event (with the time event_at and the pipeline status) is older than the state of the pipeline,
+    e.g., a pending event that arrives after the success event. """
+    if event_at and state.event_at and event_at < state.event_at:
+        return True
+
+    newer = event_at and state.event_at and event_at > state.event_at
+    return status in RUNNING_STATUSES and state.status not in RUNNING_STATUSES and not newer
+
+
+def _update_event_at(state, event_at):
+    if event_at and (not state.event_at or event_at > state.event_at):
+        state.event_at = event_at
+
+
+def _ingest_pipeline_event(event):
+    pipeline = event['object_attributes']
+    event_at = _event_time(pipeline, 'updated_at', 'finished_at', 'created_at')
+    state, created = PipelineState.objects.get_or_create(
+        git_repository_id=str(event['project']['id']), pipeline_id=pipeline['id'],
+        defaults={'ref': pipeline['ref'], 'status': pipeline['status']})
+    if not created and _is_outdated(state, event_at, pipeline['status']):
+        return 0
+
+    state.ref, state.commit_sha, state.status = pipeline['ref'], pipeline.get('sha', ''), pipeline['status']
+    for job in event.get('builds', []):
+        if job.get('name') == USER_SOFTWARE_JOB:
+            state.user_software_job_id, state.user_software_job_status = job['id'], job['status']
+    _update_event_at(state, event_at)
+    state.save()
+
+    return 1
+
+
+def _ingest_job_event(event):
+    if event.get('build_name') != USER_SOFTWARE_JOB:
+        return 0
+
+    event_at = _event_time(event, 'build_finished_at', 'build_started_at', 'build_created_at')
+    state, created = PipelineState.objects.get_or_create(
+        git_repository_id=str(event['project_id']), pipeline_id=event['pipeline_id'],
+        defaults={'ref': event['ref'], 'commit_sha': event.get('sha', ''), 'status': 'running'})
+    if not created and _is_outdated(state, event_at):
+        return 0
+
+    state.user_software_job_id = event['build_id']
+    state.user_software_job_status = event['build_status']
+    _update_event_at(state, event_at)
+    state.save()
+
+    return 1
+
+
+def prune_pipeline_states():
+    """ Delete the states of finished pipelines (successful or of deleted branches) without events within
+    PIPELINE_STATES_MAX_AGE. They are never reported as running, and are not needed to decide if a repository
+    receives events. """
+    return PipelineState.objects.filter(last_event__lt=timezone.now() - PIPELINE_STATES_MAX_AGE) \
+        .exclude(status__in=RUNNING_STATUSES | FAILED_STATUSES).delete()[0]
+
+
+def has_pipeline_states(git_repository_id):
+    """ True if the repository received webhook events within PIPELINE_STATES_MAX_AGE, i.e., its pipelines do not need
+    to be polled. Repositories without recent events (e.g., when the deliveries stopped) are polled. """
+    return PipelineState.objects.filter(git_repository_id=str(git_repository_id),
+                                        last_event__gte=timezone.now() - PIPELINE_STATES_MAX_AGE).exists()
+
+
+def last_event(git_repository_id):
+    """ The time of the last webhook event of the repository or None if it received no events. """
+    return PipelineState.objects.filter(git_repository_id=str(git_repository_id)) \
+        .aggregate(last_event=Max('last_event'))['last_event']
+
+
+def pipeline_states(git_repository_id):
+    """ The states of all pipelines of the repository that are running or failed. """
+    return PipelineState.objects.filter(git_repository_id=str(git_repository_id),
+                                        status__in=RUNNING_STATUSES | FAILED_STATUSES).order_by('pipeline_id')
@@ -0,0 +1,92 @@
+"""
+Conditional and partial responses for downloads (RFC 9110).
+
+download_response sends a strong ETag, Content-Length, and Accept-Ranges, answers If-None-Match with 304 Not Modified,
+and answers a single byte range (Range, optionally guarded by If-Range) with 206 Partial Content, so that clients can
+cache downloads and resume interrupted downloads instead of fetching the whole file again.
+"""
+from http import HTTPStatus
+import re
+
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+
+FILE_CHUNK_BYTES = 1024 * 1024
+
+_BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def etag_matches(if_none_match, etag):
+    """ Whether the If-None-Match header matches the etag (with the weak comparison that If-None-Match uses). """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+
+    return etag.removeprefix('W/') in [i.strip().removeprefix('W/') for i in if_none_match.split(',')]
+
+
+def byte_range(range_header, size):
+    """ The range (start, end) with exclusive end that the Range header requests from a representation of size bytes.
+    Returns None if the whole representation is sent, i.e., without header or for headers that are not a single
+    byte range. Raises ValueError if the range is not satisfiable. """
+    match = _BYTE_RANGE.match(range_header.strip()) if range_header else None
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+
+    first, last = match.group(1), match.group(2)
+    if first == '':
+        if int(last) == 0:
+            raise ValueError(f'The range {range_header} is not satisfiable.')
+        return max(size - int(last), 0), size
+
+    if last and int(last) < int(first):
+        return None
+    if int(first) >= size:
+        raise ValueError(f'The range {range_header} is not satisfiable for {size} bytes.')
+
+    return int(first), min(int(last) + 1, size) if last else size
+
+
+def read_file_range(path, start, end, chunk_size=FILE_CHUNK_BYTES):
+    """ Yields the bytes start to end (exclusive) of the file in chunks of at most chunk_size bytes. """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+
+def download_response(request, etag, size, read_range, content_type, filename=None):
+    """ The response to download a representation with the (quoted, strong) etag and size in bytes.
+    read_range(start, end) yields the bytes start to end (exclusive) of the representation. """
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    requested_range = None
+    if_range = request.headers.get('If-Range')
+    if not if_range or if_range.strip() == etag:
+        try:
+            requested_range = byte_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = HttpResponse(status=HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    start, end = requested_range or (0, size)
+    response = StreamingHttpResponse(read_range(start, end), content_type=content_type,
+                                     status=HTTPStatus.PARTIAL_CONTENT if requested_range else HTTPStatus.OK)
+    response['ETag'] = etag
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Length'] = str(end - start)
+    if requested_range:
+        response['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+    if filename:
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+
+    return response
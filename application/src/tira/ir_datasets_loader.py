@@ -1,5 +1,6 @@
 import sys
 import json
+import logging
 import copy
 from pathlib import Path
 from typing import Iterable
@@ -8,15 +9,109 @@ from tqdm import tqdm
 import pandas as pd
 import os
 import gzip
+import math
 from base64 import b64encode
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+import shutil
+import tempfile
+import time
+
+from tira.doc_id_filters import DuplicateIdFilter, SortedIdFile, open_allowlist
+from tira.docstore import DocstoreWriter
+
+DOCS_BATCH_SIZE = 10000
+DOCS_SHARD_SIZE = 100000
+RERANK_DOCS_BATCH_SIZE = 50000
+GZIP_CHUNK_SIZE = 1024 * 1024
+GZIP_THREADS = min(os.cpu_count() or 1, 8)
+GZIP_COMPRESSLEVEL = 6
+
+logger = logging.getLogger('tira')
+
+
+def _gzip_chunks(lines: Iterable[str], chunk_size: int):
+    chunk, size = [], 0
+    for line in lines:
+        chunk += [line]
+        size += len(line)
+        if size >= chunk_size:
+            yield ('\n'.join(chunk) + '\n').encode('utf-8')
+            chunk, size = [], 0
+
+    if chunk:
+        yield ('\n'.join(chunk) + '\n').encode('utf-8')
+
+
+def write_gzip_members(lines: Iterable[str], file, threads=GZIP_THREADS, chunk_size=GZIP_CHUNK_SIZE, compresslevel=GZIP_COMPRESSLEVEL) -> None:
+    """ Writes the lines gzip compressed to the binary file with multiple threads (zlib releases the GIL): chunks of
+    about chunk_size characters are compressed in parallel to gzip members that are written in order. Readers of
+    gzip (e.g., the gzip module, zcat, or pandas) decompress files with multiple members as one stream. """
+    with ThreadPoolExecutor(threads) as pool:
+        pending, written = deque(), False
+        for chunk in _gzip_chunks(lines, chunk_size):
+            pending.append(pool.submit(gzip.compress, chunk, compresslevel, mtime=0))
+            if len(pending) > 2 * threads:
+                file.write(pending.popleft().result())
+                written = True
+
+        while pending:
+            file.write(pending.popleft().result())
+            written = True
+
+    if not written:
+        file.write(gzip.compress(b'', compresslevel, mtime=0))
+
+
+def export_doc_shard(loader, ir_datasets_id: str, start: int, end: int, include_original: bool, allowlist_path: Path, shard: Path, compresslevel: int) -> int:
+    """ Writes the documents start to end (exclusive) of the dataset that are in the (sorted) allowlist to the gzip
+    compressed shard and their ids (one per line) to the file <shard>.ids. Runs in the worker processes of
+    IrDatasetsLoader.write_docs_sharded. Returns the number of written documents. """
+    allowed_ids = SortedIdFile(allowlist_path) if allowlist_path else None
+    ret = 0
+    try:
+        with gzip.open(shard, 'wt', encoding='utf-8', compresslevel=compresslevel) as docs, open(f'{shard}.ids', 'wt', encoding='utf-8', newline='') as ids:
+            for doc in loader.load_irds(ir_datasets_id).docs_iter()[start:end]:
+                if allowed_ids is not None and str(doc.doc_id) not in allowed_ids:
+                    continue
+                docs.write(loader.map_doc(doc, include_original) + '\n')
+                ids.write(f'{doc.doc_id}\n')
+                ret += 1
+    finally:
+        if allowed_ids is not None:
+            allowed_ids.close()
+
+    return ret
+
+
+def read_shard_ids(shard: Path) -> list:
+    """ Reads (and removes) the ids written by export_doc_shard. The ids are split only at the newlines that separate
+    them, as ids may contain other line boundaries (e.g., \\r or \\u2028) that str.splitlines would split at. """
+    ids_file = Path(f'{shard}.ids')
+    with open(ids_file, 'r', encoding='utf-8', newline='') as ids:
+        ret = ids.read()
+    ids_file.unlink()
+
+    return ret[:-1].split('\n') if ret else []
 
 
 def run_irds_command(task_id, dataset_id, image, command, output_dir):
+    """ Runs the irds_cli.sh command in the image to export a dataset to output_dir. Exports that were already made
+    (with the same ir_datasets_id, image, and flags) are linked from the cache of exports (see tira.irds_export_cache).
+    """
     from tira.tira_model import model
+    from tira.irds_export_cache import IrdsExportCache, export_key
     from subprocess import run
     irds_root = model.custom_irds_datasets_path / task_id / dataset_id
-    command = command.replace('$outputDir', '/output-tira-tmp/')
+    cache, (key, fields) = IrdsExportCache.default(), export_key(image, command)
     Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+    if cache and cache.link_into(key, output_dir):
+        return json.dumps({'args': command, 'returncode': 0, 'stdout': f'Linked the cached export {key}.', 'stderr': ''})
+
+    command = command.replace('$outputDir', '/output-tira-tmp/')
     Path(irds_root).mkdir(parents=True, exist_ok=True)
 
     ret = run(['sudo', 'podman', '--storage-opt', 'mount_program=/usr/bin/fuse-overlayfs', 'run',
@@ -28,6 +123,12 @@ def run_irds_command(task_id, dataset_id, image, command, output_dir):
     if ret.returncode != 0:
         raise ValueError(f'Process failed: {ret_str}')
 
+    if cache:
+        try:
+            cache.add(key, fields, output_dir)
+        except Exception as e:
+            logger.warning(f'Could not add the ir_datasets export {key} to the cache: {e}')
+
     return ret_str
 
 
@@ -42,30 +143,56 @@ class IrDatasetsLoader(object):
             raise ValueError(f'Could not load the dataset {ir_datasets_id}. Does it exist?')
 
 
-    def yield_docs(self, dataset, include_original, skip_duplicate_ids, allowlist_path_ids):
-        already_covered_ids = set()
-        allowed_ids = set()
-        if allowlist_path_ids:
-            with open(allowlist_path_ids, 'r') as inp_file:
-                for i in inp_file:
-                    allowed_ids.add(i.strip())
-            print('I use a allow list of size ', len(allowed_ids))
-
-        for doc in tqdm(dataset.docs_iter(), 'Load Documents'):
-            if skip_duplicate_ids and doc.doc_id in already_covered_ids:
-                continue
-            if allowlist_path_ids and str(doc.doc_id) not in allowed_ids:
-                continue
-
-            yield self.map_doc(doc, include_original)
-            if skip_duplicate_ids:
-                already_covered_ids.add(doc.doc_id)
-                
-        
+    def yield_docs(self, dataset, include_original, skip_duplicate_ids, allowlist_path_ids, tmp_dir=None, docstore=None):
+        """ Yields the mapped documents of the dataset in constant memory: duplicate ids are detected with a
+        DuplicateIdFilter and the allowlist is searched in a memory-mapped sorted id file (see tira.doc_id_filters).
+
+        @param tmp_dir: the directory for the spilled ids and the sorted allowlist (a new temporary directory if None)
+        @param docstore: a DocstoreWriter that receives the yielded documents, too (see tira.docstore)
+        """
+        with tempfile.TemporaryDirectory(dir=tmp_dir) as tmp_dir:
+            duplicates = DuplicateIdFilter(tmp_dir, self.docs_count(dataset)) if skip_duplicate_ids else None
+            allowed_ids = open_allowlist(allowlist_path_ids, tmp_dir) if allowlist_path_ids else None
+            exported, skipped, start = 0, 0, time.monotonic()
+
+            try:
+                docs = iter(tqdm(dataset.docs_iter(), 'Load Documents', unit='docs'))
+                while batch := list(islice(docs, DOCS_BATCH_SIZE)):
+                    allowed = [i for i in batch if allowed_ids is None or str(i.doc_id) in allowed_ids]
+                    seen_before = duplicates.seen_before_many([i.doc_id for i in allowed]) if duplicates is not None else None
+                    skipped += len(batch) - len(allowed)
+
+                    for i, doc in enumerate(allowed):
+                        if seen_before and seen_before[i]:
+                            skipped += 1
+                            continue
+
+                        exported += 1
+                        line = self.map_doc(doc, include_original)
+                        if docstore is not None:
+                            docstore.add(doc.doc_id, line)
+                        yield line
+            finally:
+                seconds = time.monotonic() - start
+                print(f'Exported {exported} documents in {seconds:.1f} seconds ({exported / max(seconds, 1e-9):.1f} '
+                      f'docs/s), skipped {skipped} documents that were duplicates or not in the allowlist.')
+                if duplicates is not None:
+                    duplicates.close()
+                if allowed_ids is not None:
+                    allowed_ids.close()
+
+
+    def docs_count(self, dataset):
+        try:
+            return dataset.docs_count()
+        except:
+            return None
 
-    def load_dataset_for_fullrank(self, ir_datasets_id: str, output_dataset_path: Path, output_dataset_truth_path: Path,  include_original=True, skip_documents=False, skip_qrels=False, skip_duplicate_ids=True, allowlist_path_ids: Path = None) -> None:
+
+    def load_dataset_for_fullrank(self, ir_datasets_id: str, output_dataset_path: Path, output_dataset_truth_path: Path,  include_original=True, skip_documents=False, skip_qrels=False, skip_duplicate_ids=True, allowlist_path_ids: Path = None, tmp_dir: Path = None, workers=1, shard_size=DOCS_SHARD_SIZE, shard_output='merge', docstore=False) -> None:
         """ Loads a dataset through the ir_datasets package by the given ir_datasets ID.
         Maps documents, queries, qrels to a standardized format in preparation for full-rank operations with PyTerrier.
+        All files are written while the dataset is iterated, so the memory does not grow with the size of the corpus.
         
         @param ir_datasets_id: the dataset ID as of ir_datasets
         @param output_dataset_path: the path to the directory where the output files will be stored
@@ -73,27 +200,156 @@ class IrDatasetsLoader(object):
         @param include_original {False}: flag which signals if the original data of documents and queries should be included 
         @param skip_duplicate_ids: Should this pipeline skip duplicate ids?
         @param allowlist_path_ids: skip ids not in the allowlist (e.g., for filtering the subcategories of the ClueWebs)
+        @param tmp_dir: the directory for temporary files of the duplicate filter and the allowlist
+        @param workers: the number of processes that export the documents (see write_docs_sharded)
+        @param shard_size: the number of documents per shard if workers > 1
+        @param shard_output: 'merge' to merge the shards into documents.jsonl, 'manifest' to keep the shards
+        @param docstore: write the documents also to documents.docstore for random access by docno (see tira.docstore)
         """
         dataset = self.load_irds(ir_datasets_id)
 
         if not skip_documents and output_dataset_path:
-            self.write_lines_to_file(self.yield_docs(dataset, include_original, skip_duplicate_ids, allowlist_path_ids), output_dataset_path/"documents.jsonl")
-        
-        queries_mapped_jsonl = [self.map_query_as_jsonl(query, include_original) for query in dataset.queries_iter()]
-        queries_mapped_xml = [self.map_query_as_xml(query, include_original) for query in dataset.queries_iter()]
+            with DocstoreWriter(output_dataset_path/"documents.docstore") if docstore else nullcontext() as docstore:
+                if workers > 1:
+                    self.write_docs_sharded(ir_datasets_id, dataset, output_dataset_path, include_original, skip_duplicate_ids, allowlist_path_ids, tmp_dir, workers, shard_size, shard_output, docstore)
+                else:
+                    self.write_lines_to_file(self.yield_docs(dataset, include_original, skip_duplicate_ids, allowlist_path_ids, tmp_dir, docstore), output_dataset_path/"documents.jsonl")
         
         if not skip_qrels:
-            qrels_mapped = [self.map_qrel(qrel) for qrel in dataset.qrels_iter()]
+            qrels_mapped = (self.map_qrel(qrel) for qrel in dataset.qrels_iter())
             self.write_lines_to_file(qrels_mapped, output_dataset_truth_path/"qrels.txt")
 
         if output_dataset_path:
-            self.write_lines_to_file(queries_mapped_jsonl, output_dataset_path/"queries.jsonl")
             self.write_lines_to_file([json.dumps({"ir_datasets_id": ir_datasets_id})], output_dataset_path/"metadata.json")
-            self.write_lines_to_xml_file(ir_datasets_id, queries_mapped_xml, output_dataset_path/"queries.xml")
 
-        if output_dataset_truth_path:
-            self.write_lines_to_file(queries_mapped_jsonl, output_dataset_truth_path/"queries.jsonl")
-            self.write_lines_to_xml_file(ir_datasets_id, queries_mapped_xml, output_dataset_truth_path/"queries.xml")
+        self.write_queries(ir_datasets_id, dataset.queries_iter(), include_original, [i for i in [output_dataset_path, output_dataset_truth_path] if i])
+
+
+    def write_docs_sharded(self, ir_datasets_id: str, dataset, output_dataset_path: Path, include_original: bool, skip_duplicate_ids: bool, allowlist_path_ids: Path, tmp_dir: Path, workers: int, shard_size=DOCS_SHARD_SIZE, shard_output='merge', docstore=None) -> None:
+        """ Exports the documents with multiple processes: each worker maps the documents of a range of docs_iter()
+        (see export_doc_shard) to a compressed shard, and the shards are processed in order, so that duplicate ids are
+        skipped exactly as by yield_docs. With shard_output 'merge', the shards are concatenated into documents.jsonl,
+        with 'manifest', the shards are kept as documents-<shard>.jsonl.gz and listed in documents-shards.json.
+        Datasets without docs_count or without slicing of docs_iter are exported by a single process. The exported
+        documents are added to the DocstoreWriter docstore (if not None) in the order of documents.jsonl.
+        """
+        if shard_output not in ('merge', 'manifest'):
+            raise ValueError(f'Unknown shard output {shard_output}. Expected "merge" or "manifest".')
+
+        docs_count = self.docs_count(dataset)
+        if not docs_count or not hasattr(dataset.docs_iter(), '__getitem__'):
+            print('The documents can not be sliced, I export them with a single process.')
+            self.write_lines_to_file(self.yield_docs(dataset, include_original, skip_duplicate_ids, allowlist_path_ids, tmp_dir, docstore), output_dataset_path/"documents.jsonl")
+            return
+
+        target = output_dataset_path/("documents.jsonl" if shard_output == 'merge' else "documents-shards.json")
+        if(target.exists()):
+            raise RuntimeError(f"File already exists: {target}")
+        output_dataset_path.mkdir(parents=True, exist_ok=True)
+
+        with tempfile.TemporaryDirectory(dir=tmp_dir) as tmp_dir, ProcessPoolExecutor(workers) as pool:
+            tmp_dir, allowlist = Path(tmp_dir), None
+            if allowlist_path_ids:
+                allowed_ids = open_allowlist(allowlist_path_ids, tmp_dir)
+                allowlist = allowed_ids.path
+                allowed_ids.close()
+
+            duplicates = DuplicateIdFilter(tmp_dir, docs_count) if skip_duplicate_ids else None
+            shard_dir, compresslevel = (tmp_dir, 1) if shard_output == 'merge' else (output_dataset_path, 6)
+            shards = [shard_dir/f"documents-{i:05d}.jsonl.gz" for i in range(0, (docs_count + shard_size - 1) // shard_size)]
+            submit = lambda i: pool.submit(export_doc_shard, self, ir_datasets_id, i * shard_size, min((i + 1) * shard_size, docs_count), include_original, allowlist, shards[i], compresslevel)
+            # At most 2 * workers shards are exported ahead of the merge, so that the temporary shards stay small on disk
+            in_flight = 2 * workers
+            futures = deque(submit(i) for i in range(min(in_flight, len(shards))))
+            exported, start, manifest = 0, time.monotonic(), []
+
+            try:
+                with target.open('wb') if shard_output == 'merge' else nullcontext() as merged:
+                    for i, shard in enumerate(tqdm(shards, 'Merge Shards', unit='shards')):
+                        future = futures.popleft()
+                        if i + in_flight < len(shards):
+                            futures.append(submit(i + in_flight))
+                        future.result()
+                        doc_ids = read_shard_ids(shard)
+                        seen_before = duplicates.seen_before_many(doc_ids) if duplicates is not None else [False] * len(doc_ids)
+                        exported += len(doc_ids) - sum(seen_before)
+                        if docstore is not None:
+                            self.add_shard_to_docstore(shard, doc_ids, seen_before, docstore)
+
+                        if merged is not None:
+                            self.copy_shard(shard, merged, seen_before)
+                            shard.unlink()
+                            continue
+
+                        if any(seen_before):
+                            with tempfile.NamedTemporaryFile(dir=shard_dir, suffix='.tmp', delete=False) as tmp:
+                                with gzip.open(tmp, 'wb', compresslevel=compresslevel) as out:
+                                    self.copy_shard(shard, out, seen_before)
+                            os.replace(tmp.name, shard)
+                        manifest += [{'file': shard.name, 'documents': len(doc_ids) - sum(seen_before)}]
+            except:
+                pool.shutdown(cancel_futures=True)
+                raise
+            finally:
+                if duplicates is not None:
+                    duplicates.close()
+
+            if shard_output == 'manifest':
+                target.write_text(json.dumps({'ir_datasets_id': ir_datasets_id, 'documents': exported, 'shards': manifest}))
+
+        seconds = time.monotonic() - start
+        print(f'Exported {exported} documents with {workers} processes in {seconds:.1f} seconds ({exported / max(seconds, 1e-9):.1f} docs/s).')
+
+
+    def copy_shard(self, shard: Path, out, seen_before: list) -> None:
+        """ Appends the documents of the shard that were not seen before to the binary file out. """
+        with gzip.open(shard, 'rb') as src:
+            if not any(seen_before):
+                shutil.copyfileobj(src, out)
+                return
+
+            for line, skip in zip(src, seen_before):
+                if not skip:
+                    out.write(line)
+
+
+    def add_shard_to_docstore(self, shard: Path, doc_ids: list, seen_before: list, docstore) -> None:
+        """ Adds the documents of the shard that were not seen before to the DocstoreWriter docstore. """
+        with gzip.open(shard, 'rt', encoding='utf-8', newline='\n') as src:
+            for line, doc_id, skip in zip(src, doc_ids, seen_before):
+                if not skip:
+                    docstore.add(doc_id, line.rstrip('\n'))
+
+
+    def write_queries(self, ir_datasets_id: str, queries: Iterable[tuple], include_original: bool, directories: list) -> None:
+        """ Writes the queries as queries.jsonl and queries.xml to all directories in one pass over the queries. """
+        if not directories:
+            return
+
+        for directory in directories:
+            for file_name in ["queries.jsonl", "queries.xml"]:
+                if (directory/file_name).exists():
+                    raise RuntimeError(f"File already exists: {directory/file_name}")
+            directory.mkdir(parents=True, exist_ok=True)
+
+        soup = BeautifulSoup()
+        soup.append(soup.new_tag('topics', attrs={ 'ir-datasets-id': ir_datasets_id }))
+        root = soup.find('topics')
+        jsonl_files = [(directory/"queries.jsonl").open('wt') for directory in directories]
+        try:
+            for query in queries:
+                line = self.map_query_as_jsonl(query, include_original) + '\n'
+                for file in jsonl_files:
+                    file.write(line)
+                root.append(self.map_query_as_xml(query, include_original).topic)
+        finally:
+            for file in jsonl_files:
+                file.close()
+
+        xml = soup.prettify()
+        for directory in directories:
+            with (directory/"queries.xml").open('wt') as file:
+                file.write(xml)
 
 
     def load_dataset_for_rerank(self, ir_datasets_id: str, output_dataset_path: Path, output_dataset_truth_path: Path, include_original: bool, run_file: Path) -> None:
@@ -109,12 +365,9 @@ class IrDatasetsLoader(object):
         dataset = self.load_irds(ir_datasets_id)
         queries = {str(i.query_id):i for i in dataset.queries_iter()}
         
-        run = self.load_run_file(run_file)
-        print('Get Documents')
-        docs = self.get_docs_by_ids(dataset, list(set([str(i['docno']) for i in run])))
-        print('Produce rerank data.')
-        rerank = tqdm((self.construct_rerank_row(docs, queries, i, include_original) for i in run), 'Produce Rerank File.')
+        run = self.load_run(run_file)
         print('Write rerank data.')
+        rerank = tqdm(self.yield_rerank_lines(dataset, queries, run, include_original), 'Produce Rerank File.', total=len(run))
         self.write_lines_to_file(rerank, output_dataset_path/"rerank.jsonl.gz")
         print('Done rerank data was written.')
         if output_dataset_truth_path:
@@ -169,19 +422,22 @@ class IrDatasetsLoader(object):
         return f"{qrel.query_id} {qrel.iteration} {qrel.doc_id} {qrel.relevance}"
 
 
-    def load_run_file(self, run_file: Path) -> list:
+    def load_run(self, run_file: Path) -> pd.DataFrame:
+        """ The top 1000 documents per query of the run as data frame, sorted by qid and score, with ranks from 1. """
         if not os.path.abspath(run_file).endswith('run.txt'):
             run_file = run_file / 'run.txt'
 
         run = pd.read_csv(os.path.abspath(run_file), sep='\\s+', names=["qid", "Q0", "docno", "rank", "score", "system"])
-        run = run.copy().sort_values(["qid", "score", "docno"], ascending=[True, False, False]).reset_index()
-        run = run.groupby("qid")[["qid", "Q0", "docno", "rank", "score", "system"]].head(1000)
+        run = run.sort_values(["qid", "score", "docno"], ascending=[True, False, False]).groupby("qid").head(1000)
 
         # Make sure that rank position starts by 1
-        run["rank"] = 1
-        run["rank"] = run.groupby("qid")["rank"].cumsum()
-        
-        return [i.to_dict() for _, i in run[['qid', 'Q0', 'docno', 'rank', 'score', 'system']].iterrows()]
+        run["rank"] = run.groupby("qid").cumcount() + 1
+
+        return run[['qid', 'Q0', 'docno', 'rank', 'score', 'system']].reset_index(drop=True)
+
+
+    def load_run_file(self, run_file: Path) -> list:
+        return self.load_run(run_file).to_dict('records')
         
 
     def get_docs_by_ids(self, dataset, doc_ids: list) -> dict:
@@ -224,17 +480,59 @@ class IrDatasetsLoader(object):
         return json.dumps(ret)
 
 
+    def yield_rerank_lines(self, dataset, queries: dict, run: pd.DataFrame, include_original: bool, batch_size=RERANK_DOCS_BATCH_SIZE) -> Iterable[str]:
+        """ Yields the rows of the rerank file for the run (see load_run), identical to construct_rerank_row.
+        The documents are fetched from the docs_store in batches of batch_size rows, and the query and the document
+        parts of the rows are serialized once per query and once per document of a batch.
+        """
+        qids, docnos, ranks, scores = (run[i].tolist() for i in ['qid', 'docno', 'rank', 'score'])
+        scores = [repr(i) if math.isfinite(i) else json.dumps(i) for i in scores]
+        docs_store, query_prefixes = dataset.docs_store(), {}
+
+        for start in range(0, len(qids), batch_size):
+            end = min(start + batch_size, len(qids))
+            batch_docnos = {str(i): i for i in docnos[start:end]}
+            docs = {doc.doc_id: f'"docno": {json.dumps(batch_docnos[doc.doc_id])}, {self.doc_fragment(doc, include_original)}'
+                    for doc in docs_store.get_many_iter(batch_docnos.keys())}
+
+            for i in range(start, end):
+                doc = docs.get(str(docnos[i]))
+                if doc is None:
+                    continue
+
+                qid = str(qids[i])
+                if qid not in query_prefixes:
+                    query_prefixes[qid] = self.query_fragment(queries[qid])
+
+                yield f'{query_prefixes[qid]}, {doc}, "rank": {ranks[i]}, "score": {scores[i]}}}'
+
+
+    def query_fragment(self, query: tuple) -> str:
+        """ The start of the rerank rows of the query: the serialized query without the closing brace. """
+        return json.dumps({
+            "qid": query.query_id,
+            "query": query.default_text(),
+            "original_query": self.make_serializable(query._asdict())
+        })[:-1]
+
+
+    def doc_fragment(self, doc: tuple, include_original: bool) -> str:
+        """ The serialized text and original_document of the doc in rerank rows, without the surrounding braces. """
+        return json.dumps({
+            "text": doc.default_text(),
+            # a list, like the rows of construct_rerank_row
+            "original_document": [self.make_serializable(doc._asdict())] if include_original else {}
+        })[1:-1]
+
+
     def write_lines_to_file(self, lines: Iterable[str], path: Path) -> None:
         if(path.exists()):
             raise RuntimeError(f"File already exists: {path}")
         path.parent.mkdir(parents=True, exist_ok=True)
         
         if os.path.abspath(path).endswith('.gz'):
-            with gzip.open(os.path.abspath(path), 'wb') as file:
-                for line in lines:
-                    if not line:
-                        continue
-                    file.write((line + '\n').encode('utf-8'))
+            with path.open('wb') as file:
+                write_gzip_members((line for line in lines if line), file)
         else:
             with path.open('wt') as file:
                 file.writelines('%s\n' % line for line in lines if line)
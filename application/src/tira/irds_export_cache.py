@@ -0,0 +1,221 @@
+"""
+A content-addressed cache of the exports of ir_datasets (documents.jsonl, queries, qrels, ...) shared across tasks.
+
+Imports of the same ir_datasets_id with the same loader (the docker image of the import), the same flags (e.g.,
+--include_original), and the same allowlist produce the same files, so run_irds_command links the files of a previous
+export into the new dataset instead of running the export again. The files are stored once per content (blobs/<sha256>)
+as reflinks or copies of the exported files (never as hard links, so that the blobs do not share the inodes of the
+exported dataset) and linked into the datasets with hard links (or reflinks or copies on other file systems), so the
+cached blobs and the linked files of datasets are read-only: files of datasets are replaced, never modified in place.
+The index has one entry per export (entries/<key>.json) with the files of the export, the modification time of an entry
+is the time of its last use, so that evict removes the least recently used exports.
+"""
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+import shlex
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger('tira')
+
+# The ioctl to clone a file (reflink) on btrfs, xfs, and other file systems with copy on write
+_FICLONE = 0x40049409
+
+
+def _sha256(path):
+    ret = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            ret.update(chunk)
+
+    return ret.hexdigest()
+
+
+def command_arguments(command):
+    """ The arguments (--name value) of the irds_cli.sh command as dict. """
+    ret, args = {}, shlex.split(command)
+    for i, arg in enumerate(args):
+        if arg.startswith('--'):
+            ret[arg[2:]] = args[i + 1] if i + 1 < len(args) and not args[i + 1].startswith('--') else 'true'
+
+    return ret
+
+
+def export_key(image, command):
+    """ The key of the export of the irds_cli.sh command with the image (the version of the loader) as (key, fields).
+    The key covers the ir_datasets_id, the loader, include_original, the content of the allowlist (if the allowlist is
+    available outside of the container, otherwise its path), and the other arguments of the command. """
+    arguments = command_arguments(command)
+    allowlist = arguments.get('allowlist_path_ids')
+    if allowlist and Path(allowlist).is_file():
+        allowlist = 'sha256:' + _sha256(allowlist)
+
+    fields = {
+        'ir_datasets_id': arguments.get('ir_datasets_id'),
+        'loader_version': image,
+        'include_original': str(arguments.get('include_original', 'true')).lower(),
+        'allowlist': allowlist,
+        'arguments': sorted([k, v] for k, v in arguments.items()
+                            if k not in ('ir_datasets_id', 'include_original', 'allowlist_path_ids')),
+    }
+
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest(), fields
+
+
+def link_file(source, target):
+    """ Link the source to the target with a hard link, a reflink, or a copy (whichever works first). """
+    try:
+        os.link(source, target)
+        return 'hardlink'
+    except OSError:
+        pass
+
+    return copy_file(source, target)
+
+
+def copy_file(source, target):
+    """ Copy the source to the target with a reflink or a copy (whichever works first), the target has its own inode. """
+    try:
+        import fcntl
+        with open(source, 'rb') as src, open(target, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        return 'reflink'
+    except (OSError, ImportError):
+        Path(target).unlink(missing_ok=True)
+
+    shutil.copyfile(source, target)
+    return 'copy'
+
+
+def _blob_has_size(blob, size):
+    try:
+        return blob.stat().st_size == size
+    except FileNotFoundError:
+        return False
+
+
+def _size_of(entries):
+    """ The size of the blobs of the entries (each blob counts once). """
+    return sum({sha256: size for entry in entries for _, sha256, size in entry['files']}.values())
+
+
+class IrdsExportCache(object):
+    """ The cache in directory with the blobs in blobs/ and the index in entries/. """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.blobs = self.directory / 'blobs'
+        self.entries = self.directory / 'entries'
+
+    @staticmethod
+    def default():
+        """ The cache in settings.IRDS_EXPORT_CACHE_DIR or None if the cache is disabled. """
+        return IrdsExportCache(settings.IRDS_EXPORT_CACHE_DIR) if settings.IRDS_EXPORT_CACHE_DIR else None
+
+    def entry(self, key):
+        try:
+            return json.loads((self.entries / f'{key}.json').read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def link_into(self, key, output_dir):
+        """ Link the files of the cached export with the key into output_dir. Returns the entry or None on a miss.
+        Errors while linking (e.g., an existing file in output_dir or a blob that was evicted meanwhile) are misses, too:
+        the files linked so far are removed, so that the export can run instead. The linked files are read-only (hard
+        links share the inode of the blob) and must be replaced, not modified in place. """
+        entry = self.entry(key)
+        if not entry or not all(_blob_has_size(self.blobs / sha256, size) for _, sha256, size in entry['files']):
+            return None
+
+        output_dir, linked = Path(output_dir), []
+        try:
+            for name, sha256, _ in entry['files']:
+                target = output_dir / name
+                target.parent.mkdir(parents=True, exist_ok=True)
+                if target.exists():
+                    raise FileExistsError(f'The file {target} already exists.')
+                link_file(self.blobs / sha256, target)
+                linked += [target]
+        except OSError as e:
+            logger.warning(f'Could not link the cached ir_datasets export {key} into {output_dir}: {e}')
+            for target in linked:
+                target.unlink(missing_ok=True)
+            return None
+
+        os.utime(self.entries / f'{key}.json')
+        logger.info(f'Linked the cached ir_datasets export {key} into {output_dir}.')
+
+        return entry
+
+    def add(self, key, fields, output_dir):
+        """ Add the files in output_dir as the export with the key (and the fields of export_key) to the cache. """
+        self.blobs.mkdir(parents=True, exist_ok=True)
+        self.entries.mkdir(parents=True, exist_ok=True)
+        output_dir, files = Path(output_dir), []
+
+        for f in sorted(i for i in output_dir.rglob('*') if i.is_file()):
+            sha256 = _sha256(f)
+            blob = self.blobs / sha256
+            if not blob.exists():
+                tmp = self.blobs / f'{sha256}.{os.getpid()}.tmp'
+                tmp.unlink(missing_ok=True)
+                copy_file(f, tmp)
+                tmp.chmod(0o444)
+                os.replace(tmp, blob)
+            files += [[str(f.relative_to(output_dir)), sha256, f.stat().st_size]]
+
+        entry = {**fields, 'key': key, 'created': int(time.time()), 'files': files}
+        with tempfile.NamedTemporaryFile('w', dir=self.entries, suffix='.tmp', delete=False) as tmp:
+            json.dump(entry, tmp)
+        os.replace(tmp.name, self.entries / f'{key}.json')
+
+        return entry
+
+    def index(self):
+        """ The entries of the cache, the most recently used first, with their last use as 'last_used'. """
+        ret = []
+        for f in self.entries.glob('*.json') if self.entries.is_dir() else []:
+            try:
+                ret += [{**json.loads(f.read_text()), 'last_used': f.stat().st_mtime}]
+            except (FileNotFoundError, json.JSONDecodeError):
+                pass
+
+        return sorted(ret, key=lambda i: -i['last_used'])
+
+    def size(self):
+        return sum(f.stat().st_size for f in self.blobs.glob('*') if f.is_file()) if self.blobs.is_dir() else 0
+
+    def remove(self, key):
+        (self.entries / f'{key}.json').unlink(missing_ok=True)
+
+    def evict(self, max_bytes=None, max_age_seconds=None):
+        """ Remove the least recently used exports until the cache holds at most max_bytes and remove the exports that
+        were not used within max_age_seconds (no limits if None). Blobs that no export uses anymore are deleted,
+        datasets that link to them keep their files. Returns the keys of the removed exports. """
+        index, ret = self.index(), []
+        if max_age_seconds is not None:
+            ret += [i['key'] for i in index if i['last_used'] < time.time() - max_age_seconds]
+
+        if max_bytes is not None:
+            remaining = [i for i in index if i['key'] not in ret]
+            while remaining and _size_of(remaining) > max_bytes:
+                ret += [remaining.pop()['key']]
+
+        for key in ret:
+            logger.info(f'Evict the ir_datasets export {key} from the cache.')
+            self.remove(key)
+        self.delete_unused_blobs()
+
+        return ret
+
+    def delete_unused_blobs(self):
+        used = {sha256 for i in self.index() for _, sha256, _ in i['files']}
+        for blob in self.blobs.glob('*') if self.blobs.is_dir() else []:
+            if blob.name not in used and not blob.name.endswith('.tmp'):
+                blob.unlink(missing_ok=True)
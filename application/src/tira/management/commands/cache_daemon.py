@@ -3,55 +3,42 @@ from django.core.cache import cache
 import logging
 from django.core.management.base import BaseCommand, CommandError
 from django.core.management import call_command
-import tira.tira_model as model
 
 import time
 import datetime
 
 logger = logging.getLogger("cache_daemon")
-from tira.tira_model import get_git_integration, get_all_reranking_datasets
+from tira.tira_model import get_all_reranking_datasets
+from tira.git_refresher import refresh_running_pipelines, refresh_user_images
 from tira.git_runner import all_git_runners
 
 
 class Command(BaseCommand):
     help = 'cache daemon'
 
+    def print_refresh_results(self, results, unit, start):
+        for name, count, exception in results:
+            if exception is None:
+                print(f'Refreshed Cache: {name} has {count} {unit}.')
+            else:
+                print(f'Exception during refreshing {name}: {exception}')
+
+        print(f'Refreshed {len(results)} in {time.monotonic() - start:.1f}s.')
+
     def keep_running_softwares_fresh(self, sleep_time):
         while True:
             time.sleep(int(sleep_time))
             print(str(datetime.datetime.now()) + ': Start loop to keep the running softwares fresh (sleeped ' + str(int(sleep_time)) + ' seconds) ...')
-            for task in model.get_tasks():
-                if task is None:
-                    continue
-                if model.git_pipeline_is_enabled_for_task(task['task_id'], cache):
-                    evaluators_for_task = model.get_evaluators_for_task(task['task_id'], cache)
-                    repositories = set([i['git_repository_id'] for i in evaluators_for_task if i['is_git_runner'] and i['git_repository_id']])
-                
-                    for git_repository_id in repositories:
-                        try:
-                            print(task['task_id'] + '--->' + str(git_repository_id))
-                            git_integration = get_git_integration(task_id=task['task_id'])
-                            running_pipelines = git_integration.all_running_pipelines_for_repository(git_repository_id, cache, force_cache_refresh=True)
-                            print('Refreshed Cache: ' + task['task_id'] + ' on repo ' + str(git_repository_id) + ' has ' + str(len(running_pipelines)) + ' jobs.')
-                        except Exception as e:
-                            print(f'Exception during refreshing the repository {git_repository_id}: e')
-                            logger.warn(f'Exception during refreshing the repository {git_repository_id}', e)
-                            continue
-
-                time.sleep(0.1)
+            start = time.monotonic()
+            try:
+                self.print_refresh_results(refresh_running_pipelines(cache, self.threads), 'jobs', start)
+            except Exception as e:
+                print(f'Exception in keep_running_softwares_fresh: {e}')
 
     def refresh_user_images_in_repo(self, git_runner, sleep_time):
         print(str(datetime.datetime.now()) + ': Start loop to keep the user images fresh (sleeped ' + str(int(sleep_time)) + ' seconds) ...')
-        for user in git_runner.all_user_repositories():
-            user = user.split('tira-user-')[-1]
-            print(user)
-            try:
-                images = git_runner.docker_images_in_user_repository(user, cache, force_cache_refresh=True)
-                print('Refreshed Cache: ' + user + ' has ' + str(len(images)) + ' images.')
-            except Exception as e:
-                print('Exception during refreshing image repository {user}: {e}')
-                continue
-            time.sleep(0.1)
+        start = time.monotonic()
+        self.print_refresh_results(refresh_user_images(git_runner, cache, self.threads), 'images', start)
 
     def keep_user_images_fresh(self, sleep_time):
         while True:
@@ -75,6 +62,7 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         call_command('createcachetable')
+        self.threads = options['threads']
         
         if 'keep_running_softwares_fresh' in options and options['keep_running_softwares_fresh']:
             self.keep_running_softwares_fresh(options['keep_running_softwares_fresh'])
@@ -89,4 +77,6 @@ class Command(BaseCommand):
         parser.add_argument('--keep_running_softwares_fresh', default=None, type=str)
         parser.add_argument('--keep_reranking_datasets_fresh', default=None, type=str)
         parser.add_argument('--keep_user_images_fresh', default=None, type=str)
+        parser.add_argument('--threads', default=None, type=int,
+                            help='The number of concurrent refreshes. Defaults to settings.GIT_REFRESH_THREADS.')
 
@@ -13,8 +13,21 @@ logger = logging.getLogger("grpc_server")
 class Command(BaseCommand):
     help = 'api server'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--from_files', action='store_true', default=False,
+                            help='Index the existing model from the protobuf files instead of creating a new one.')
+        parser.add_argument('--processes', default=None, type=int,
+                            help='The number of processes that parse the protobuf files. Defaults to the CPU count.')
+
     def handle(self, *args, **options):
         call_command('makemigrations')
         call_command('makemigrations', 'tira')
         call_command('migrate')
-        HybridDatabase().create_model()
+
+        if not options['from_files']:
+            HybridDatabase().create_model()
+            return
+
+        for phase in HybridDatabase().index_model_from_files(options['processes']):
+            print(f"{phase['phase']}: {phase['files']} files ({phase['files_per_second']} files/s), "
+                  f"{phase['rows']} rows ({phase['rows_per_second']} rows/s) in {phase['seconds']}s.")
@@ -25,14 +25,20 @@ class Command(BaseCommand):
        @param --output_dataset_path: optional, string: the path to the directory where the output will be stored
        @param --output_dataset_truth_path: optional, string: the path to the directory where the output will be stored
        @param --include_original {True}: optional, boolean: flag to signal, if the original data should be included
+       @param --allowlist_path_ids: optional, string: the path to a file with the ids of the documents to include (one per line)
+       @param --tmp_dir: optional, string: the directory for temporary files (the spilled ids of the duplicate filter)
+       @param --workers {1}: optional, int: the number of processes that export the documents in shards
+       @param --shard_size {100000}: optional, int: the number of documents per shard if there are multiple workers
+       @param --shard_output {merge}: optional, string: 'merge' the shards into documents.jsonl or keep them with a 'manifest'
+       @param --docstore {False}: optional, boolean: write the documents also to documents.docstore for random access by docno
        @param --rerank: optional, string: if used, mapping will be in preparation for re-ranking operations and a path to file 
                         with TREC-run formatted data is required
     """
 
-    def import_dataset_for_fullrank(self, ir_datasets_id: str, output_dataset_path: Path, output_dataset_truth_path: Path, include_original: bool, skip_documents: bool, skip_qrels: bool, skip_duplicate_ids: bool, allowlist_path_ids: bool):
+    def import_dataset_for_fullrank(self, ir_datasets_id: str, output_dataset_path: Path, output_dataset_truth_path: Path, include_original: bool, skip_documents: bool, skip_qrels: bool, skip_duplicate_ids: bool, allowlist_path_ids: bool, tmp_dir: Path = None, workers: int = 1, shard_size: int = 100000, shard_output: str = 'merge', docstore: bool = False):
         print(f'Task: Full-Rank -> create files: \n documents.jsonl \n queries.jsonl \n qrels.txt \n at {output_dataset_path}/')
         datasets_loader = IrDatasetsLoader()
-        datasets_loader.load_dataset_for_fullrank(ir_datasets_id, output_dataset_path, output_dataset_truth_path, include_original, skip_documents = skip_documents, skip_qrels = skip_qrels, skip_duplicate_ids = skip_duplicate_ids, allowlist_path_ids = allowlist_path_ids)
+        datasets_loader.load_dataset_for_fullrank(ir_datasets_id, output_dataset_path, output_dataset_truth_path, include_original, skip_documents = skip_documents, skip_qrels = skip_qrels, skip_duplicate_ids = skip_duplicate_ids, allowlist_path_ids = allowlist_path_ids, tmp_dir = tmp_dir, workers = workers, shard_size = shard_size, shard_output = shard_output, docstore = docstore)
 
 
     def import_dataset_for_rerank(self, ir_datasets_id: str, output_dataset_path: Path, output_dataset_truth_path: Path, include_original: bool, run_file: Path, skip_qrels: bool):
@@ -77,7 +83,12 @@ class Command(BaseCommand):
                 skip_documents = options['skip_documents'],
                 skip_qrels = skip_qrels,
                 skip_duplicate_ids = options['skip_duplicate_ids'],
-                allowlist_path_ids = options['allowlist_path_ids']
+                allowlist_path_ids = options['allowlist_path_ids'],
+                tmp_dir = options['tmp_dir'],
+                workers = options['workers'],
+                shard_size = options['shard_size'],
+                shard_output = options['shard_output'],
+                docstore = options['docstore'].lower() == 'true'
             )
 
     def add_arguments(self, parser):
@@ -91,4 +102,9 @@ class Command(BaseCommand):
         parser.add_argument('--skip_duplicate_ids', default=True, type=bool)
         parser.add_argument('--rerank', default=None, type=Path)
         parser.add_argument('--allowlist_path_ids', default=None, type=Path, required=False)
+        parser.add_argument('--tmp_dir', default=None, type=Path, required=False)
+        parser.add_argument('--workers', default=1, type=int)
+        parser.add_argument('--shard_size', default=100000, type=int)
+        parser.add_argument('--shard_output', default='merge', choices=['merge', 'manifest'])
+        parser.add_argument('--docstore', default='False', type=str)
 
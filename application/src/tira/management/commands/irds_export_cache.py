@@ -0,0 +1,43 @@
+from datetime import datetime
+import logging
+from django.core.management.base import BaseCommand, CommandError
+
+from tira.irds_export_cache import IrdsExportCache
+
+logger = logging.getLogger("tira")
+
+
+class Command(BaseCommand):
+    """List the cached exports of ir_datasets (settings.IRDS_EXPORT_CACHE_DIR) and evict them.
+       Use --max_bytes and --max_age_days to evict the least recently used exports and --remove to remove an export.
+       Datasets that were linked from evicted exports keep their files.
+    """
+    help = 'list and evict the cached exports of ir_datasets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max_bytes', default=None, type=int)
+        parser.add_argument('--max_age_days', default=None, type=float)
+        parser.add_argument('--remove', default=None, type=str)
+
+    def handle(self, *args, **options):
+        cache = IrdsExportCache.default()
+        if not cache:
+            raise CommandError('The cache of ir_datasets exports is disabled (settings.IRDS_EXPORT_CACHE_DIR).')
+
+        if options['remove']:
+            if not cache.entry(options['remove']):
+                raise CommandError(f'The export {options["remove"]} is not cached.')
+            cache.remove(options['remove'])
+            cache.delete_unused_blobs()
+
+        if options['max_bytes'] is not None or options['max_age_days'] is not None:
+            max_age_seconds = options['max_age_days'] * 24 * 60 * 60 if options['max_age_days'] is not None else None
+            for key in cache.evict(options['max_bytes'], max_age_seconds):
+                print(f'Evicted {key}.')
+
+        for entry in cache.index():
+            print(f"{entry['key']}\t{entry['ir_datasets_id']}\t{entry['loader_version']}\t"
+                  f"include_original={entry['include_original']}\tfiles={len(entry['files'])}\t"
+                  f"bytes={sum(i[2] for i in entry['files'])}\tlast_used={datetime.fromtimestamp(entry['last_used'])}")
+
+        print(f'The cache holds {cache.size()} bytes in {cache.directory}.')
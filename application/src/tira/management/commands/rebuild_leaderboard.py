@@ -0,0 +1,31 @@
+import logging
+from django.core.management.base import BaseCommand, CommandError
+
+import tira.data.data as dbops
+
+logger = logging.getLogger("tira")
+
+
+class Command(BaseCommand):
+    """Rebuild the materialized leaderboard entries from scratch and verify that they are consistent with the runs,
+       evaluations, and reviews in the database. Use --verify_only to check the consistency without a rebuild.
+    """
+    help = 'rebuild and verify the materialized leaderboard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify_only', action='store_true', default=False)
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            entries = dbops.rebuild_leaderboard()
+            print(f'Rebuilt the leaderboard with {entries} entries.')
+
+        inconsistencies = dbops.leaderboard_inconsistencies()
+        for inconsistency in inconsistencies:
+            logger.warning(inconsistency)
+            print(inconsistency)
+
+        if inconsistencies:
+            raise CommandError(f'The leaderboard has {len(inconsistencies)} inconsistent entries.')
+
+        print('The leaderboard is consistent.')
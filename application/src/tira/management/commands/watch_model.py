@@ -0,0 +1,69 @@
+import logging
+import time
+from django.core.management.base import BaseCommand
+
+from tira.data.HybridDatabase import HybridDatabase
+from tira.data.model_watcher import ChangeDebouncer, target_of_path, index_changes
+
+logger = logging.getLogger("tira")
+
+
+class Command(BaseCommand):
+    help = 'Watch data/runs and model/ and index changed files incrementally into the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--polling', action='store_true', default=False,
+                            help='Poll the file system instead of using inotify (e.g., for network file systems).')
+        parser.add_argument('--polling_interval', default=5.0, type=float,
+                            help='Seconds between two scans of the file system when polling.')
+        parser.add_argument('--debounce_seconds', default=5.0, type=float,
+                            help='Index a changed run directory only after it had no changes for this many seconds.')
+
+    def observer(self, polling, polling_interval):
+        from watchdog.observers.polling import PollingObserver
+        if polling:
+            return PollingObserver(timeout=polling_interval)
+
+        try:
+            from watchdog.observers.inotify import InotifyObserver
+            return InotifyObserver()
+        except Exception as e:
+            logger.warning(f'inotify is not available ({e}), fall back to polling the file system.')
+            return PollingObserver(timeout=polling_interval)
+
+    def handle(self, *args, **options):
+        from watchdog.events import FileSystemEventHandler
+
+        model = HybridDatabase()
+        model_dir_path = model.tira_root / 'model'
+        debouncer = ChangeDebouncer(options['debounce_seconds'])
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                for path in [event.src_path, getattr(event, 'dest_path', None)]:
+                    target = target_of_path(path, model.runs_dir_path, model_dir_path) if path else None
+                    if target:
+                        debouncer.add(target)
+
+        # Index everything that changed while no watcher was running
+        model.build_model()
+
+        observer = self.observer(options['polling'], options['polling_interval'])
+        for directory in [model.runs_dir_path, model_dir_path]:
+            observer.schedule(Handler(), str(directory), recursive=True)
+        observer.start()
+        print(f'Watch {model.runs_dir_path} and {model_dir_path} with {observer.__class__.__name__}.')
+
+        try:
+            while True:
+                time.sleep(min(1.0, options['debounce_seconds']))
+                targets = debouncer.pop_ready()
+                if targets:
+                    result = index_changes(model, targets)
+                    print(f"Indexed {len(targets)} changes: {result['parsed']} runs parsed, "
+                          f"{result['removed']} runs removed, reloaded {result['reloaded']}.")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            observer.stop()
+            observer.join()
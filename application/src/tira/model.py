@@ -284,3 +284,98 @@ class Review(models.Model):
     published = models.BooleanField(default=False)
     blinded = models.BooleanField(default=True)
 
+
+
+class LeaderboardEntry(models.Model):
+    """ Denormalized leaderboard row of one evaluation run, so that leaderboards are rendered with a single SELECT.
+    The rows are maintained by tira.data.data whenever runs, evaluations, or reviews are written.
+    - hidden: the run is only shown on leaderboards that include unpublished runs
+    - measures: list of [measure_key, measure_value] pairs in the order the evaluation reported them
+    """
+    run = models.OneToOneField(Run, on_delete=models.CASCADE, primary_key=True)
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE)
+    vm_id = models.CharField(max_length=150)
+    display_run_id = models.CharField(max_length=150)
+    input_run_id = models.CharField(max_length=150, null=True, default=None)
+    input_software_name = models.TextField(default="")
+    published = models.BooleanField(default=False)
+    blinded = models.BooleanField(default=True)
+    hidden = models.BooleanField(default=False)
+    measures = models.JSONField(default=list)
+
+    class Meta:
+        indexes = [models.Index(fields=["dataset", "hidden"])]
+
+
+class IndexedFile(models.Model):
+    """ The state of a protobuf file of the model when it was last indexed, used to re-index only changed files.
+    - sha1: the content hash, only computed when mtime or size changed (may be empty after a full index)
+    - deleted: tombstone for files that were removed after they were indexed
+    """
+    path = models.CharField(max_length=500, unique=True)
+    mtime = models.FloatField()
+    size = models.BigIntegerField()
+    sha1 = models.CharField(max_length=40, default="")
+    deleted = models.BooleanField(default=False)
+    last_indexed = models.DateTimeField(auto_now=True)
+
+
+class JobConfiguration(models.Model):
+    """ The job configuration (job-to-execute.txt) of a branch in a git repository, parsed at the head commit of the
+    branch. Branches are never changed after they are created, so a configuration is only extracted once.
+    - job_configuration: the parsed variables of job-to-execute.txt
+    - software: the display_name, user_image_name, and command of the software of the job
+    """
+    git_repository_id = models.CharField(max_length=100)
+    branch = models.CharField(max_length=500)
+    commit_sha = models.CharField(max_length=64)
+    software_id = models.CharField(max_length=150, default="")
+    job_configuration = models.JSONField(default=dict)
+    software = models.JSONField(default=dict)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = (("git_repository_id", "branch", "commit_sha"),)
+
+
+class PipelineState(models.Model):
+    """ The state of a GitLab pipeline as reported by webhook events, so that running pipelines are not polled.
+    - status: the status of the pipeline (e.g., pending, running, failed, success)
+    - user_software_job_id/user_software_job_status: the job that runs the software of the user
+    - event_at: the latest time reported by GitLab in the applied events, to ignore events that arrive out of order
+    - last_event: the time when the last event was received
+    """
+    git_repository_id = models.CharField(max_length=100)
+    pipeline_id = models.BigIntegerField()
+    ref = models.CharField(max_length=500)
+    commit_sha = models.CharField(max_length=64, default="")
+    status = models.CharField(max_length=50)
+    user_software_job_id = models.BigIntegerField(null=True, default=None)
+    user_software_job_status = models.CharField(max_length=50, default="created")
+    event_at = models.DateTimeField(null=True, default=None)
+    last_event = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = (("git_repository_id", "pipeline_id"),)
+
+
+class DockerImageManifest(models.Model):
+    """ The metadata of a docker image manifest. Manifests are immutable, so they are fetched once per digest. """
+    digest = models.CharField(max_length=100, primary_key=True)
+    architecture = models.CharField(max_length=50)
+    created = models.CharField(max_length=50)
+    size = models.CharField(max_length=50)
+    config_digest = models.CharField(max_length=100)
+
+
+class DockerImage(models.Model):
+    """ The inventory of the docker images (tags) in the user repositories, refreshed incrementally. """
+    user_name = models.CharField(max_length=150)
+    repository = models.CharField(max_length=500)
+    tag = models.CharField(max_length=300)
+    digest = models.CharField(max_length=100)
+    last_seen = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = (("repository", "tag", "digest"),)
+        indexes = [models.Index(fields=["user_name"])]
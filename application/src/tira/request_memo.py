@@ -0,0 +1,91 @@
+"""
+Request-scoped memoization of reads from tira.tira_model.
+
+Within a request (installed via RequestMemoMiddleware) or an explicit request_scope(), each decorated read is executed
+at most once per distinct set of arguments. Every write to the database clears the memo, so that reads after a write
+within the same request see the new state.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from copy import deepcopy
+from functools import wraps
+import inspect
+
+from django.conf import settings
+from django.db import connection
+
+_memo = ContextVar('tira_request_memo', default=None)
+
+
+class RequestMemo(object):
+    def __init__(self):
+        self.entries = {}
+        self.calls = 0
+        self.hits = 0
+
+    def clear_on_write(self, execute, sql, params, many, context):
+        if sql.lstrip()[:6].upper() != 'SELECT':
+            self.entries.clear()
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def request_scope():
+    """ Memoize the reads from tira.tira_model within this scope. Yields the RequestMemo with the call counters. """
+    memo = RequestMemo()
+    token = _memo.set(memo)
+    try:
+        with connection.execute_wrapper(memo.clear_on_write):
+            yield memo
+    finally:
+        _memo.reset(token)
+
+
+def memoize_per_request(func):
+    """ Decorator for reads of the model that are memoized within the current request_scope (if any).
+    Callers get a copy of the memoized result, so that they can modify it. """
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    def func_wrapper(*args, **kwargs):
+        memo = _memo.get()
+        if memo is None:
+            return func(*args, **kwargs)
+
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        try:
+            key = (func.__qualname__, tuple(bound.arguments.items()))
+            hash(key)
+        except TypeError:
+            return func(*args, **kwargs)
+
+        memo.calls += 1
+        if key in memo.entries:
+            memo.hits += 1
+        else:
+            ret = func(*args, **kwargs)
+            memo.entries[key] = ret
+            return deepcopy(ret)
+
+        return deepcopy(memo.entries[key])
+
+    return func_wrapper
+
+
+class RequestMemoMiddleware(object):
+    """ Memoizes the reads from tira.tira_model per request. With settings.DEBUG, the responses have the headers
+    X-Tira-Model-Calls and X-Tira-Model-Cache-Hits with the number of memoized model calls and how many were hits. """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with request_scope() as memo:
+            response = self.get_response(request)
+
+        if settings.DEBUG:
+            response['X-Tira-Model-Calls'] = str(memo.calls)
+            response['X-Tira-Model-Cache-Hits'] = str(memo.hits)
+
+        return response
@@ -0,0 +1,210 @@
+"""
+Zip archives of run directories that are streamed to the client while they are generated.
+
+stream_zip writes the archive into a small buffer that is handed out chunk by chunk, so downloads of runs need neither
+a temporary file nor memory proportional to the size of the run, and concurrent downloads of the same run are
+independent. Published runs do not change anymore, so their archives can be built once and served from a cache
+(settings.RUN_ARCHIVE_CACHE_DIR). The cached archives are content addressed by the hash of the manifest of the run
+directory (the relative paths, sizes, and modification times of all files), so a modified run gets a new archive.
+
+The archives are deterministic for a manifest (the entries are sorted and stored without compression), so the manifest
+hash is a strong ETag of the archive and zip_size knows the size of the archive before it is generated.
+"""
+from copy import copy
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import zipfile
+
+from django.conf import settings
+
+logger = logging.getLogger('tira')
+
+ZIP_CHUNK_BYTES = 1024 * 1024
+
+# The sizes of the fixed parts of the records in zip archives
+_DATA_DESCRIPTOR_BYTES, _DATA_DESCRIPTOR_ZIP64_BYTES = 16, 24
+_CENTRAL_DIRECTORY_BYTES, _END_RECORD_BYTES, _END_RECORD_ZIP64_BYTES = 46, 22, 56 + 20
+
+
+class _ZipBuffer(object):
+    """ A write-only, unseekable file for zipfile.ZipFile that collects the written bytes until they are taken. """
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks += [bytes(data)]
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        ret, self.chunks, self.size = b''.join(self.chunks), [], 0
+        return ret
+
+
+def zip_entries(directory):
+    """ The entries of the zip of the directory as sorted list of (path, zipfile.ZipInfo, modification time in ns).
+    The entries are relative to the parent of the directory (i.e., they start with the name of the directory). """
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+
+    ret = []
+    for f in sorted(directory.rglob('*')):
+        info = zipfile.ZipInfo.from_file(f, arcname=f.relative_to(directory.parent))
+        info.compress_size, info.CRC = 0, 0
+        ret += [(f, info, f.stat().st_mtime_ns)]
+
+    return ret
+
+
+def _entries(directory_or_entries):
+    return directory_or_entries if isinstance(directory_or_entries, list) else zip_entries(directory_or_entries)
+
+
+def _is_zip64(info):
+    # The same rule as zipfile.ZipFile.open(..., 'w') for files with known size
+    return not info.is_dir() and info.file_size * 1.05 > zipfile.ZIP64_LIMIT
+
+
+def stream_zip(directory, chunk_size=ZIP_CHUNK_BYTES):
+    """ Yields the zip archive of the directory (or of its zip_entries) in chunks of about chunk_size bytes.
+    Files are archived with the size of their entry, a file that shrinks in the meantime raises an OSError. """
+    buffer = _ZipBuffer()
+
+    with zipfile.ZipFile(buffer, 'w') as zipf:
+        for f, info, _ in _entries(directory):
+            info = copy(info)
+            if info.is_dir():
+                zipf.mkdir(info)
+                continue
+
+            remaining = info.file_size
+            with f.open('rb') as src, zipf.open(info, 'w') as dst:
+                while remaining > 0:
+                    data = src.read(min(chunk_size, remaining))
+                    if not data:
+                        raise OSError(f'The file {f} changed while it was archived.')
+                    remaining -= len(data)
+                    dst.write(data)
+                    if buffer.size >= chunk_size:
+                        yield buffer.take()
+
+            if buffer.size >= chunk_size:
+                yield buffer.take()
+
+    if buffer.size:
+        yield buffer.take()
+
+
+def stream_zip_range(directory, start, end, chunk_size=ZIP_CHUNK_BYTES):
+    """ Yields the bytes start to end (exclusive) of the zip archive of the directory (or of its zip_entries).
+    The archive is generated from the beginning, the bytes before start are skipped. """
+    pos = 0
+    for chunk in stream_zip(directory, chunk_size):
+        if pos + len(chunk) > start:
+            yield chunk[max(0, start - pos):end - pos]
+        pos += len(chunk)
+        if pos >= end:
+            return
+
+
+def zip_size(directory):
+    """ The size in bytes of the zip archive of the directory (or of its zip_entries) that stream_zip generates. """
+    size, central_directory, count = 0, 0, 0
+    for _, info, _ in _entries(directory):
+        zip64, header_offset = _is_zip64(info), size
+        size += len(info.FileHeader(zip64))
+        if not info.is_dir():
+            size += info.file_size + (_DATA_DESCRIPTOR_ZIP64_BYTES if zip64 else _DATA_DESCRIPTOR_BYTES)
+
+        zip64_fields = (2 if info.file_size > zipfile.ZIP64_LIMIT else 0) + \
+            (1 if header_offset > zipfile.ZIP64_LIMIT else 0)
+        central_directory += _CENTRAL_DIRECTORY_BYTES + len(_encoded_filename(info)) + \
+            (4 + 8 * zip64_fields if zip64_fields else len(info.extra)) + len(info.comment)
+        count += 1
+
+    zip64_end = count > zipfile.ZIP_FILECOUNT_LIMIT or size > zipfile.ZIP64_LIMIT or \
+        central_directory > zipfile.ZIP64_LIMIT
+
+    return size + central_directory + (_END_RECORD_ZIP64_BYTES if zip64_end else 0) + _END_RECORD_BYTES
+
+
+def _encoded_filename(info):
+    try:
+        return info.filename.encode('ascii')
+    except UnicodeEncodeError:
+        return info.filename.encode('utf-8')
+
+
+def run_manifest(directory):
+    """ The manifest of the directory (or of its zip_entries): the list of [name, size, modification time in ns] of
+    all entries. """
+    return [[info.filename, info.file_size, mtime_ns] for _, info, mtime_ns in _entries(directory)]
+
+
+def manifest_hash(directory):
+    """ The sha256 of the manifest of the directory, it changes whenever a file of the directory changes. """
+    return hashlib.sha256(json.dumps(run_manifest(directory)).encode('utf-8')).hexdigest()
+
+
+def cached_zip(directory, cache_dir=None, max_bytes=None):
+    """ The path to the (cached) zip archive of the directory (or of its zip_entries) or None if the cache is disabled.
+    The archive is built on the first request, concurrent builds of the same archive are atomic. """
+    cache_dir = cache_dir if cache_dir is not None else settings.RUN_ARCHIVE_CACHE_DIR
+    if not cache_dir:
+        return None
+
+    entries = _entries(directory)
+    cache_dir = Path(cache_dir)
+    ret = cache_dir / f'{manifest_hash(entries)}.zip'
+    if ret.is_file():
+        os.utime(ret)
+        return ret
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.zip.tmp', delete=False) as tmp:
+        try:
+            for chunk in stream_zip(entries):
+                tmp.write(chunk)
+        except Exception:
+            Path(tmp.name).unlink()
+            raise
+
+    os.replace(tmp.name, ret)
+    evict(cache_dir, max_bytes if max_bytes is not None else settings.RUN_ARCHIVE_CACHE_MAX_BYTES, keep=ret)
+
+    return ret
+
+
+def evict(cache_dir, max_bytes, keep=None):
+    """ Delete the least recently used archives from the cache until it holds at most max_bytes (no limit if None). """
+    if max_bytes is None:
+        return
+
+    archives = []
+    for f in Path(cache_dir).glob('*.zip'):
+        try:
+            stat = f.stat()
+            archives += [(stat.st_mtime, stat.st_size, f)]
+        except FileNotFoundError:
+            pass
+
+    size = sum(i[1] for i in archives)
+    for _, archive_size, f in sorted(archives, key=lambda i: i[0]):
+        if size <= max_bytes:
+            break
+        if f == keep:
+            continue
+
+        logger.info(f'Evict the run archive {f} from the cache.')
+        f.unlink(missing_ok=True)
+        size -= archive_size
@@ -0,0 +1,116 @@
+"""
+A tiered django cache backend: a small per-process LRU cache with a short TTL in front of a shared cache backend
+(e.g., the DatabaseCache, the FileBasedCache, or the RedisCache) that is configured as another alias in settings.CACHES.
+
+Hits in the local tier avoid the round trip to the shared backend. Entries in the local tier expire after at most
+LOCAL_TIMEOUT seconds, so that changes of other processes become visible within this period. Each entry is stored
+together with the time it was refreshed, which is exposed via last_refreshed(key). Values in the shared backend that
+are not such entries (e.g., written by an older version without this backend) are treated as misses.
+"""
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.utils import timezone
+
+
+def _is_entry(entry):
+    return isinstance(entry, tuple) and len(entry) == 2 and isinstance(entry[0], datetime)
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED_CACHE', 'shared')
+        self._local_max_entries = int(options.get('LOCAL_MAX_ENTRIES', 1000))
+        self._local_timeout = float(options.get('LOCAL_TIMEOUT', 10))
+        self._local = OrderedDict()
+        self._lock = Lock()
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._local[key]
+                return None
+
+            self._local.move_to_end(key)
+            return entry[1]
+
+    def _set_local(self, key, entry, timeout):
+        local_timeout = self._local_timeout if timeout is None else min(self._local_timeout, timeout)
+        if local_timeout <= 0:
+            return self._delete_local(key)
+
+        with self._lock:
+            self._local[key] = (time.monotonic() + local_timeout, entry)
+            self._local.move_to_end(key)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+
+    def _delete_local(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+
+    def _get_entry(self, key, version=None):
+        """ Returns the tuple (refreshed_at, value) of the key or None if the key is not cached. """
+        local_key = self.make_and_validate_key(key, version=version)
+        entry = self._get_local(local_key)
+        if entry is not None:
+            return entry
+
+        entry = self.shared.get(key, version=version)
+        if not _is_entry(entry):
+            return None
+
+        self._set_local(local_key, entry, self._local_timeout)
+        return entry
+
+    def get(self, key, default=None, version=None):
+        entry = self._get_entry(key, version)
+        return default if entry is None else entry[1]
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        entry = (timezone.now(), value)
+        self.shared.set(key, entry, timeout=self._seconds(timeout), version=version)
+        self._set_local(self.make_and_validate_key(key, version=version), entry, self._seconds(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        entry = (timezone.now(), value)
+        if not self.shared.add(key, entry, timeout=self._seconds(timeout), version=version):
+            return False
+
+        self._set_local(self.make_and_validate_key(key, version=version), entry, self._seconds(timeout))
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._delete_local(self.make_and_validate_key(key, version=version))
+        return self.shared.touch(key, timeout=self._seconds(timeout), version=version)
+
+    def delete(self, key, version=None):
+        self._delete_local(self.make_and_validate_key(key, version=version))
+        return self.shared.delete(key, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self.shared.clear()
+
+    def last_refreshed(self, key, version=None):
+        """ The (timezone-aware) datetime at which the key was set the last time or None if the key is not cached. """
+        entry = self._get_entry(key, version)
+        return None if entry is None else entry[0]
+
+    def _seconds(self, timeout):
+        """ The timeout in seconds (None for no timeout), the TIMEOUT of this cache is the default. """
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
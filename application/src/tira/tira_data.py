@@ -1,5 +1,6 @@
 from pathlib import Path
 import logging
+import os
 from django.conf import settings
 from tira.endpoints.stdout_beautifier import beautify_ansi_text
 
@@ -8,6 +9,13 @@ logger = logging.getLogger("tira")
 DATA_ROOT = Path(settings.TIRA_ROOT) / "data"
 RUNS_DIR_PATH = DATA_ROOT / "runs"
 
+# The logs of runs that can be read via the api, and how much of them is shown on the review page
+RUN_LOGS = {"stdout": "stdout.txt", "stderr": "stderr.txt"}
+LOG_TAIL_LINES = 100
+LOG_TAIL_BYTES = 1024 * 1024
+LOG_PAGE_BYTES = 64 * 1024
+LOG_CHUNK_BYTES = 64 * 1024
+
 
 def get_run_runtime(dataset_id, vm_id, run_id):
     """ loads a runtime file (runtime.txt) and parses the string to return time, runtime_info"""
@@ -54,29 +62,76 @@ def get_run_file_list(dataset_id, vm_id, run_id):
     return {"size": size[1], "lines": size[2], "files": size[3], "dirs": size[4], "file_list": file_list}
 
 
+def count_lines(path, chunk_size=LOG_CHUNK_BYTES):
+    """ The number of lines of the file (like len(readlines())), counted chunk by chunk in constant memory. """
+    ret, last_chunk = 0, b''
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            ret += chunk.count(b'\n')
+            last_chunk = chunk
+
+    return ret + (1 if last_chunk and not last_chunk.endswith(b'\n') else 0)
+
+
+def read_log_tail(path, lines=LOG_TAIL_LINES, max_bytes=LOG_TAIL_BYTES, chunk_size=LOG_CHUNK_BYTES):
+    """ The last lines of the file (all lines if lines is None), but at most the last max_bytes of the file.
+    The file is read backwards from its end, so that only the returned part of the file is loaded into memory. """
+    with open(path, 'rb') as f:
+        end = start = f.seek(0, os.SEEK_END)
+        data = b''
+        while start > 0 and end - start < max_bytes and (lines is None or data.count(b'\n') <= lines):
+            size = min(chunk_size, start, max_bytes - (end - start))
+            start -= size
+            f.seek(start)
+            data = f.read(size) + data
+
+    ret = (data[:-1] if data.endswith(b'\n') else data).split(b'\n')
+    if lines is not None and len(ret) > lines:
+        ret = ret[-lines:]
+    elif start > 0 and len(ret) > 1:
+        # The first line is incomplete because the tail was capped at max_bytes
+        ret = ret[1:]
+
+    return (b'\n'.join(ret) + (b'\n' if data.endswith(b'\n') else b'')).decode('utf-8', errors='replace')
+
+
+def read_log_range(path, offset=0, length=LOG_PAGE_BYTES, chunk_size=LOG_CHUNK_BYTES):
+    """ Yields the bytes [offset, offset + length) of the file in chunks of at most chunk_size bytes. """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def get_run_log_path(dataset_id, vm_id, run_id, log):
+    return RUNS_DIR_PATH / dataset_id / vm_id / run_id / RUN_LOGS[log]
+
+
+def _get_log_tail(path, lines, always_show_hidden_lines):
+    if not path.exists() or path.stat().st_size == 0:
+        return None
+
+    tail = read_log_tail(path, lines)
+    # lines end with \n as in count_lines (str.splitlines would also split at \r, e.g., of progress bars)
+    hidden_lines = count_lines(path) - tail.count('\n') - (1 if tail and not tail.endswith('\n') else 0)
+    if hidden_lines > 0 or always_show_hidden_lines:
+        tail = f"[{max(hidden_lines, 0)} more lines]\n" + tail
+
+    return beautify_ansi_text(tail)
+
+
 def get_stdout(dataset_id, vm_id, run_id):
-    # TODO: Don't open whole file but only read the n last lines to not have a full xGB file in memory
-    output_lines = 100
-    run_dir = (RUNS_DIR_PATH / dataset_id / vm_id / run_id)
-    if not (run_dir / "stdout.txt").exists():
-        return "No Stdout recorded"
-    with open(run_dir / "stdout.txt", 'r') as stdout_file:
-        stdout = stdout_file.readlines()
-        stdout_len = len(stdout)
-        stdout = ''.join([f"[{max(stdout_len - output_lines, 0)} more lines]\n"] + stdout[-output_lines:])
-    if not stdout:
-        return "No Stdout recorded"
-    return beautify_ansi_text(stdout)
+    ret = _get_log_tail(get_run_log_path(dataset_id, vm_id, run_id, "stdout"), LOG_TAIL_LINES, True)
+    return ret if ret else "No Stdout recorded"
 
 
 def get_stderr(dataset_id, vm_id, run_id):
-    run_dir = (RUNS_DIR_PATH / dataset_id / vm_id / run_id)
-    if not (run_dir / "stderr.txt").exists():
-        return "No Stderr recorded"
-    stderr = open(run_dir / "stderr.txt", 'r').read()
-    if not stderr:
-        return "No Stderr recorded"
-    return beautify_ansi_text(stderr)
+    ret = _get_log_tail(get_run_log_path(dataset_id, vm_id, run_id, "stderr"), None, False)
+    return ret if ret else "No Stderr recorded"
 
 
 def get_tira_log(dataset_id, vm_id, run_id):
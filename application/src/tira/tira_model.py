@@ -8,10 +8,11 @@ from django.core.cache import cache
 from tira.git_runner import get_git_runner
 import randomname
 from django.conf import settings
-from django.db import connections, router
 import datetime
+import time
 from tira.authentication import auth
 from tira.util import get_tira_id
+from tira.request_memo import memoize_per_request
 
 logger = logging.getLogger("tira")
 
@@ -45,6 +46,7 @@ def reload_runs(vm_id):
 
 
 # get methods are the public interface.
+@memoize_per_request
 def get_vm(vm_id: str, create_if_none=False):
     """ Returns a vm as dictionary with:
 
@@ -60,10 +62,12 @@ def get_tasks(include_dataset_stats=False) -> list:
     return model.get_tasks(include_dataset_stats)
 
 
+@memoize_per_request
 def get_run(dataset_id: str, vm_id: str, run_id: str, return_deleted: bool = False) -> dict:
     return model.get_run(dataset_id, vm_id, run_id, return_deleted)
 
 
+@memoize_per_request
 def get_task(task_id: str, include_dataset_stats=False) -> dict:
     """ Get a dict with the task data as follows:
     {"task_id", "task_name", "task_description", "organizer", "web", "year", "dataset_count",
@@ -75,13 +79,82 @@ def get_task(task_id: str, include_dataset_stats=False) -> dict:
     return model.get_task(task_id, include_dataset_stats)
 
 
-def get_dataset(dataset_id: str) -> dict:
+@memoize_per_request
+def get_dataset(dataset_id: str, include_stats=True) -> dict:
     """ Return a Dataset as dict with the keys:
 
         {"display_name", "evaluator_id", "dataset_id", "is_confidential", "is_deprecated", "year",
         "task".task_id, 'organizer', "software_count"}
+
+        @param include_stats: If False, skip the counts of softwares, runs, and evaluations (e.g., for permission checks)
      """
-    return model.get_dataset(dataset_id)
+    return model.get_dataset(dataset_id, include_stats)
+
+
+# The permission metadata is a compact, cached index of the fields that the permission checks need. It is cached only
+# in the shared tier of the cache (not in the per-process tier), so that invalidations are visible to all processes at
+# once. The writes of tira.data.data invalidate it, too (e.g., of the indexer or the watcher).
+PERMISSION_METADATA_TIMEOUT = 300
+PERMISSION_METADATA_GENERATION_KEY = 'permission-metadata-generation'
+
+
+def _permission_cache():
+    return getattr(cache, 'shared', cache)
+
+
+def _permission_metadata_generation():
+    """ The generation of the cached permission metadata, it is part of the cache keys, so that changing it invalidates
+    the permission metadata of all runs, datasets, and tasks. """
+    generation = _permission_cache().get(PERMISSION_METADATA_GENERATION_KEY)
+    if generation is None:
+        _permission_cache().add(PERMISSION_METADATA_GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = _permission_cache().get(PERMISSION_METADATA_GENERATION_KEY)
+
+    return generation
+
+
+def _permission_metadata_key(kind, entity_id):
+    return f'permission-metadata-{_permission_metadata_generation()}-{kind}-{entity_id}'
+
+
+def _permission_metadata(kind, entity_id, load):
+    cache_key = _permission_metadata_key(kind, entity_id)
+    ret = _permission_cache().get(cache_key)
+    if ret is None:
+        ret = load(entity_id)
+        if ret is not None:
+            _permission_cache().set(cache_key, ret, PERMISSION_METADATA_TIMEOUT)
+
+    return ret
+
+
+@memoize_per_request
+def get_run_permission_metadata(run_id: str):
+    """ Returns {"dataset_id", "vm_id", "deleted", "blinded", "published"} of the run or None if it does not exist. """
+    return _permission_metadata('run', run_id, model.get_run_permission_metadata)
+
+
+@memoize_per_request
+def get_dataset_permission_metadata(dataset_id: str):
+    """ Returns {"task_id", "organizer_id", "is_confidential"} of the dataset or None if it does not exist. """
+    return _permission_metadata('dataset', dataset_id, model.get_dataset_permission_metadata)
+
+
+@memoize_per_request
+def get_task_permission_metadata(task_id: str):
+    """ Returns {"organizer_id", "require_registration"} of the task or None if the task does not exist. """
+    return _permission_metadata('task', task_id, model.get_task_permission_metadata)
+
+
+def invalidate_permission_metadata(run_ids=(), dataset_ids=(), task_ids=()):
+    _permission_cache().delete_many([*[_permission_metadata_key('run', i) for i in run_ids],
+                                     *[_permission_metadata_key('dataset', i) for i in dataset_ids],
+                                     *[_permission_metadata_key('task', i) for i in task_ids]])
+
+
+def invalidate_all_permission_metadata():
+    """ Invalidate the cached permission metadata of all runs, datasets, and tasks (e.g., after an index). """
+    _permission_cache().set(PERMISSION_METADATA_GENERATION_KEY, time.time_ns(), timeout=None)
 
 
 def get_datasets() -> dict:
@@ -99,27 +172,20 @@ def get_datasets_by_task(task_id: str, include_deprecated=False) -> list:
 
 
 def load_refresh_timestamp_for_cache_key(cache, key):
+    """ The datetime at which the key was refreshed the last time (None if the key is not cached).
+    Caches without a last_refreshed method (i.e., that are not a TieredCache) report the current time.
+    """
     try:
-        db = router.db_for_read(cache.cache_model_class)
-        connection = connections[db]
-        quote_name = connection.ops.quote_name
-
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT %s FROM %s WHERE %s = '%s'" % (
-                    quote_name("expires"),
-                    quote_name(cache._table),
-                    quote_name("cache_key"),
-                    cache.make_and_validate_key(key),
-                )
-            )
-
-            ret = cursor.fetchall()
-            if len(ret) > 0:
-                return ret[0][0] - datetime.timedelta(seconds=settings.CACHES['default']['TIMEOUT'])
+        return cache.last_refreshed(key)
     except:
         return datetime.datetime.now()
 
 
+def invalidate_cache(*keys):
+    """ Remove the passed keys from all tiers of the cache so that the next access recomputes them. """
+    cache.delete_many(list(keys))
+
+
 def load_docker_data(task_id, vm_id, cache, force_cache_refresh):
     """
     Get the docker data for a particular user (vm_id) from the git registry.
@@ -184,6 +250,7 @@ def get_docker_software(docker_software_id: int) -> dict:
     return model.get_docker_software(docker_software_id)
 
 
+@memoize_per_request
 def get_organizer(organizer_id: str):
     # TODO should return as dict
     return model.get_organizer(organizer_id)
@@ -197,6 +264,7 @@ def get_ova_list() -> list:
     return model.get_ova_list()
 
 
+@memoize_per_request
 def get_organizer_list() -> list:
     return model.get_organizer_list()
 
@@ -262,6 +330,20 @@ def get_evaluations_with_keys_by_dataset(dataset_id, include_unpublished=False):
     return model.get_evaluations_with_keys_by_dataset(dataset_id, include_unpublished)
 
 
+def get_evaluation_measures_for_export(dataset_ids):
+    """ The keys of all evaluation measures on the datasets, mapped to True if all values of the measure are numeric.
+    """
+    return model.get_evaluation_measures_for_export(dataset_ids)
+
+
+def get_evaluations_for_export(dataset_ids):
+    """ Yields all evaluations on the datasets (including unpublished ones) joined with the metadata of the evaluated
+    submissions. Each evaluation is a dict with {dataset, team, run_id, evaluation_run_id, software, is_upload,
+    is_docker, published, blinded, measures: {measure_key: value}}.
+    """
+    return model.get_evaluations_for_export(dataset_ids)
+
+
 def get_evaluation(run_id: str):
     """ Get the evaluation of this run
 
@@ -300,6 +382,7 @@ def get_docker_softwares_with_runs(task_id, vm_id):
     return model.get_docker_softwares_with_runs(task_id, vm_id)
 
 
+@memoize_per_request
 def get_run_review(dataset_id: str, vm_id: str, run_id: str) -> dict:
     """ Returns a review as dict with the following keys:
 
@@ -334,7 +417,11 @@ def add_uploaded_run(task_id, vm_id, dataset_id, uploaded_file):
     return model.add_uploaded_run(task_id, vm_id, dataset_id, uploaded_file)
 
 def update_docker_software_metadata(docker_software_id, display_name, description, paper_link, ir_re_ranker, ir_re_ranking_input):
-    return model.update_docker_software_metadata(docker_software_id, display_name, description, paper_link, ir_re_ranker, ir_re_ranking_input)
+    ret = model.update_docker_software_metadata(docker_software_id, display_name, description, paper_link, ir_re_ranker, ir_re_ranking_input)
+    invalidate_cache('get_all_reranking_datasets')
+    model.delete_job_configurations_of_docker_software(docker_software_id)
+
+    return ret
 
 def add_docker_software(task_id, vm_id, image, command, input_job=None):
     """ Add the docker software to the user of the vm and return it """
@@ -345,7 +432,10 @@ def add_docker_software(task_id, vm_id, image, command, input_job=None):
     tira_image_name = get_git_integration(task_id=task_id).add_new_tag_to_docker_image_repository(image, old_tag, new_tag)
 
 
-    return model.add_docker_software(task_id, vm_id, image + ':' + old_tag, command, tira_image_name, input_job)
+    ret = model.add_docker_software(task_id, vm_id, image + ':' + old_tag, command, tira_image_name, input_job)
+    invalidate_cache('get_all_reranking_datasets')
+
+    return ret
 
 
 def add_registration(data):
@@ -428,15 +518,21 @@ def update_review(dataset_id, vm_id, run_id,
                   has_warnings: bool = False):
     """ updates the review specified by dataset_id, vm_id, and run_id with the values given in the parameters.
     Required Parameters are also required in the function """
-    return model.update_review(dataset_id, vm_id, run_id, reviewer_id, review_date, has_errors, has_no_errors,
-                               no_errors, missing_output, extraneous_output, invalid_output, has_error_output,
-                               other_errors, comment, published, blinded, has_warnings)
+    ret = model.update_review(dataset_id, vm_id, run_id, reviewer_id, review_date, has_errors, has_no_errors,
+                              no_errors, missing_output, extraneous_output, invalid_output, has_error_output,
+                              other_errors, comment, published, blinded, has_warnings)
+    invalidate_permission_metadata(run_ids=[run_id])
+
+    return ret
 
 
 def update_run(dataset_id, vm_id, run_id, deleted: bool = None):
     """ updates the run specified by dataset_id, vm_id, and run_id with the values given in the parameters.
         Required Parameters are also required in the function """
-    return model.update_run(dataset_id, vm_id, run_id, deleted)
+    ret = model.update_run(dataset_id, vm_id, run_id, deleted)
+    invalidate_permission_metadata(run_ids=[run_id])
+
+    return ret
 
 
 def update_software(task_id, vm_id, software_id, command: str = None, working_directory: str = None,
@@ -451,10 +547,14 @@ def edit_task(task_id: str, task_name: str, task_description: str, featured: boo
               irds_re_ranking_image: str = '', irds_re_ranking_command: str = '',
               irds_re_ranking_resource: str = ''):
     """ Update the task's data """
-    return model.edit_task(task_id, task_name, task_description, featured, master_vm_id, organizer, website,
-                           require_registration, require_groups, restrict_groups, help_command, help_text,
-                           allowed_task_teams, is_ir_task, irds_re_ranking_image, irds_re_ranking_command,
-                           irds_re_ranking_resource)
+    ret = model.edit_task(task_id, task_name, task_description, featured, master_vm_id, organizer, website,
+                          require_registration, require_groups, restrict_groups, help_command, help_text,
+                          allowed_task_teams, is_ir_task, irds_re_ranking_image, irds_re_ranking_command,
+                          irds_re_ranking_resource)
+    invalidate_git_integrations()
+    invalidate_permission_metadata(dataset_ids=model.get_dataset_ids_of_task(task_id), task_ids=[task_id])
+
+    return ret
 
 
 def edit_dataset(task_id: str, dataset_id: str, dataset_name: str, command: str,
@@ -462,16 +562,23 @@ def edit_dataset(task_id: str, dataset_id: str, dataset_name: str, command: str,
                  is_git_runner: bool = False, git_runner_image: str = None, git_runner_command: str = None,
                  git_repository_id: str = None):
     """ Update the datasets's data """
-    return model.edit_dataset(task_id, dataset_id, dataset_name, command, working_directory,
-                              measures, upload_name, is_confidential, is_git_runner, git_runner_image,
-                              git_runner_command, git_repository_id)
+    ret = model.edit_dataset(task_id, dataset_id, dataset_name, command, working_directory,
+                             measures, upload_name, is_confidential, is_git_runner, git_runner_image,
+                             git_runner_command, git_repository_id)
+    invalidate_cache('get-evaluators-for-task-' + str(task_id))
+    invalidate_permission_metadata(dataset_ids=[dataset_id])
+
+    return ret
 
 
 def delete_docker_software(task_id, vm_id, docker_software_id):
     """
     Delete a given Docker software.
     """
-    return model.delete_docker_software(task_id, vm_id, docker_software_id)
+    ret = model.delete_docker_software(task_id, vm_id, docker_software_id)
+    invalidate_cache('get_all_reranking_datasets')
+
+    return ret
 
 
 def delete_software(task_id, vm_id, software_id):
@@ -481,16 +588,26 @@ def delete_software(task_id, vm_id, software_id):
 
 
 def delete_run(dataset_id, vm_id, run_id):
-    return model.delete_run(dataset_id, vm_id, run_id)
+    ret = model.delete_run(dataset_id, vm_id, run_id)
+    invalidate_permission_metadata(run_ids=[run_id])
+
+    return ret
 
 
 def delete_task(task_id: str):
     """ Delete a task from the model """
-    return model.delete_task(task_id)
+    dataset_ids = model.get_dataset_ids_of_task(task_id)
+    ret = model.delete_task(task_id)
+    invalidate_permission_metadata(dataset_ids=dataset_ids, task_ids=[task_id])
+
+    return ret
 
 
 def delete_dataset(dataset_id: str):
-    return model.delete_dataset(dataset_id)
+    ret = model.delete_dataset(dataset_id)
+    invalidate_permission_metadata(dataset_ids=[dataset_id])
+
+    return ret
 
 
 def edit_organizer(organizer_id: str, name: str, years: str, web: str, namespace_url: str, private_token: str):
@@ -499,16 +616,37 @@ def edit_organizer(organizer_id: str, name: str, years: str, web: str, namespace
     if git_integration:
         git_integrations = [git_integration]
 
-    return model.edit_organizer(organizer_id, name, years, web, git_integrations)
+    ret = model.edit_organizer(organizer_id, name, years, web, git_integrations)
+    invalidate_git_integrations()
+
+    return ret
 
 
 def all_git_integrations(self):
     return model.all_git_integrations()
 
 
+GIT_INTEGRATION_GENERATION_KEY = 'tira-model-docker-get_git_integration-generation'
+
+
+def _git_integration_generation():
+    """ The generation of the cached git integrations, it is part of their cache keys, so that changing it invalidates
+    the git integrations cached for all combinations of organizer_id, task_id, and dataset_id. """
+    generation = cache.get(GIT_INTEGRATION_GENERATION_KEY)
+    if generation is None:
+        cache.add(GIT_INTEGRATION_GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(GIT_INTEGRATION_GENERATION_KEY)
+
+    return generation
+
+
+def invalidate_git_integrations():
+    """ Invalidate all cached git integrations (e.g., after the organizer or namespace of a task changed). """
+    cache.set(GIT_INTEGRATION_GENERATION_KEY, time.time_ns(), timeout=None)
+
+
 def get_git_integration(organizer_id=None, task_id=None, dataset_id=None, return_metadata_only=False):
-    from django.core.cache import cache
-    cache_key = f'tira-model-docker-get_git_integration-{organizer_id}-{task_id}-{dataset_id}'
+    cache_key = f'tira-model-docker-get_git_integration-{_git_integration_generation()}-{organizer_id}-{task_id}-{dataset_id}'
     ret = cache.get(cache_key)        
     if ret is not None:
         return ret if return_metadata_only else get_git_runner(ret)
@@ -517,7 +655,7 @@ def get_git_integration(organizer_id=None, task_id=None, dataset_id=None, return
         raise ValueError(f'Organizer Id or task_id must be passed. But both are none')
 
     if dataset_id and not organizer_id and not task_id:
-        task_id = model.get_dataset(dataset_id)['task']
+        task_id = model.get_dataset(dataset_id, include_stats=False)['task']
 
     if task_id and not organizer_id:
         organizer_id = model.get_task(task_id, include_dataset_stats=False)['organizer_id']
@@ -547,6 +685,7 @@ def dataset_exists(dataset_id: str) -> bool:
     return model.dataset_exists(dataset_id)
 
 
+@memoize_per_request
 def vm_exists(vm_id: str) -> bool:
     return model.vm_exists(vm_id)
 
@@ -555,6 +694,7 @@ def organizer_exists(organizer_id: str) -> bool:
     return model.organizer_exists(organizer_id)
 
 
+@memoize_per_request
 def run_exists(vm_id: str, dataset_id: str, run_id: str) -> bool:
     return model.run_exists(vm_id, dataset_id, run_id)
 
@@ -3,7 +3,7 @@ from django.urls import path
 from django.views.generic import TemplateView
 
 from . import views
-from .endpoints import organizer_api, admin_api, vm_api, data_api, diffir_api, serp_api
+from .endpoints import organizer_api, admin_api, vm_api, data_api, diffir_api, serp_api, webhook_api
 
 urlpatterns = [
     path('', views.index, name='index'),
@@ -50,6 +50,7 @@ urlpatterns = [
     path('tira-admin/reload/datasets', admin_api.admin_reload_datasets, name='tira-admin-reload-datasets'),
     path('tira-admin/reload/tasks', admin_api.admin_reload_tasks, name='tira-admin-reload-tasks'),
     path('tira-admin/reload-data', admin_api.admin_reload_data, name='tira-admin-reload-data'),
+    path('tira-admin/git-client-metrics', admin_api.admin_git_client_metrics, name='tira-admin-git-client-metrics'),
     path('tira-admin/reload-runs/<str:vm_id>', admin_api.admin_reload_runs, name='tira-admin-reload-runs'),
 
     path('tira-admin/create-vm', admin_api.admin_create_vm, name='tira-admin-create-vm'),
@@ -73,6 +74,7 @@ urlpatterns = [
 
     path('api/evaluations/<str:task_id>/<str:dataset_id>', data_api.get_evaluations_by_dataset, name='get_evaluations_by_dataset'),
     path('api/evaluation/<str:vm_id>/<str:run_id>', data_api.get_evaluation, name='get_evaluation'),
+    path('api/export/evaluations/<str:task_id>', data_api.export_evaluations, name='export_evaluations'),
     path('api/submissions/<str:task_id>/<str:dataset_id>', data_api.get_submissions_by_dataset, name='get_submissions_by_dataset'),
     path('api/ova-list', data_api.get_ova_list, name='get_ova_list'),
     path('api/host-list', data_api.get_host_list, name='get_host_list'),
@@ -87,8 +89,11 @@ urlpatterns = [
     path('api/task/<str:task_id>/user/<str:user_id>/refresh-docker-images', data_api.update_docker_images, name="get_updated_docker_images"),
     path('api/task/<str:task_id>/user/<str:user_id>/software/running/<str:force_cache_refresh>', data_api.get_running_software, name='get_running_software'),
     path('api/review/<str:dataset_id>/<str:vm_id>/<str:run_id>', data_api.get_review, name='get_review'),
+    path('api/run-log/<str:dataset_id>/<str:vm_id>/<str:run_id>/<str:log>', data_api.get_run_log, name='get_run_log'),
     path('api/registration/add_registration/<str:vm_id>/<str:task_id>', data_api.add_registration, name='add_registration'),
 
+    path('api/gitlab-webhook', webhook_api.gitlab_webhook, name='gitlab_webhook'),
+
     path('diffir/<str:task_id>/<str:run_id_1>/<str:run_id_2>', diffir_api.diffir, name='diffir'),
     path('serp/<str:task_id>/user/<str:vm_id>/dataset/<str:dataset_id>/<str:run_id>', serp_api.serp, name='serp'),
 
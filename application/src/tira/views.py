@@ -1,5 +1,5 @@
 from django.shortcuts import render, redirect
-from django.http import JsonResponse, FileResponse
+from django.http import JsonResponse
 from django.conf import settings
 from django.core.cache import cache
 from django.core.serializers.json import DjangoJSONEncoder
@@ -7,13 +7,13 @@ import logging
 
 import tira.tira_model as model
 from .tira_data import get_run_runtime, get_run_file_list, get_stderr, get_stdout, get_tira_log
+from .http_ranges import download_response, read_file_range
+from .run_archives import cached_zip, manifest_hash, stream_zip_range, zip_entries, zip_size
 from .authentication import auth
 from .checks import check_permissions, check_resources_exist, check_conditional_permissions
 from .forms import *
 from pathlib import Path
 from datetime import datetime as dt
-import os
-import zipfile
 import json
 from http import HTTPStatus
 
@@ -240,7 +240,7 @@ def review(request, context, task_id, vm_id, dataset_id, run_id):
     context["review_form_error"] = review_form_error
     context["task_id"] = task_id
     context["dataset_id"] = dataset_id
-    context["is_confidential"] = model.get_dataset(dataset_id).get('is_confidential', True)
+    context["is_confidential"] = model.get_dataset(dataset_id, include_stats=False).get('is_confidential', True)
     context["vm_id"] = vm_id
     context["run_id"] = run_id
     context["run"] = run
@@ -257,20 +257,21 @@ def review(request, context, task_id, vm_id, dataset_id, run_id):
 @check_conditional_permissions(public_data_ok=True)
 @check_resources_exist('json')
 def download_rundir(request, task_id, dataset_id, vm_id, run_id):
-    """ Zip the given run and hand it out for download. Deletes the zip on the server again. """
-    path_to_be_zipped = Path(settings.TIRA_ROOT) / "data" / "runs" / dataset_id / vm_id / run_id
-    zipped = Path(f"{path_to_be_zipped.stem}.zip")
-    with zipfile.ZipFile(zipped, "w") as zipf:
-        for f in path_to_be_zipped.rglob('*'):
-            zipf.write(f, arcname=f.relative_to(path_to_be_zipped.parent))
-
-    if zipped.exists():
-        response = FileResponse(open(zipped, "rb"), as_attachment=True, filename=f"{run_id}-{zipped.stem}.zip")
-        os.remove(zipped)
-        return response
+    """ Stream the zip of the given run. Zips of published runs are served from the cache of run archives (if enabled).
+    The zip has a strong ETag (the hash of the manifest of the run) and supports If-None-Match and byte ranges. """
+    run_dir = Path(settings.TIRA_ROOT) / "data" / "runs" / dataset_id / vm_id / run_id
+    entries = zip_entries(run_dir)
+    etag = f'"{manifest_hash(entries)}"'
+
+    run = model.get_run_permission_metadata(run_id)
+    archive = cached_zip(entries) if run and run['published'] and entries else None
+    if archive:
+        size, read_range = archive.stat().st_size, lambda start, end: read_file_range(archive, start, end)
     else:
-        return JsonResponse({'status': 1, 'reason': f'File does not exist: {zipped}'},
-                            status=HTTPStatus.INTERNAL_SERVER_ERROR)
+        size, read_range = zip_size(entries), lambda start, end: stream_zip_range(entries, start, end)
+
+    return download_response(request, etag, size, read_range, 'application/zip', f"{run_id}-{run_dir.stem}.zip")
+
 
 @add_context
 def request_vm(request, context):
@@ -1379,7 +1379,7 @@ API_ACCESS_MATRIX = [
         url_pattern='tira-admin/reload-data',
         params={},
         group_to_expected_status_code={
-            ADMIN: 500,
+            ADMIN: 200,
             GUEST: 405,
             PARTICIPANT: 405,
             ORGANIZER: 405,
@@ -1391,7 +1391,7 @@ API_ACCESS_MATRIX = [
         url_pattern='tira-admin/reload-runs/<str:vm_id>',
         params={'vm_id': 'does-not-exist'},
         group_to_expected_status_code={
-            ADMIN: 500,
+            ADMIN: 200,
             GUEST: 405,
             PARTICIPANT: 405,
             ORGANIZER: 405,
@@ -1468,6 +1468,72 @@ API_ACCESS_MATRIX = [
             ORGANIZER_WRONG_TASK: 302,
         }
     ),
+    route_to_test(
+        url_pattern='api/gitlab-webhook',
+        params={},
+        group_to_expected_status_code={
+            ADMIN: 405,
+            GUEST: 405,
+            PARTICIPANT: 405,
+            ORGANIZER: 405,
+            ORGANIZER_WRONG_TASK: 405,
+        },
+    ),
+    route_to_test(
+        url_pattern='tira-admin/git-client-metrics',
+        params={},
+        group_to_expected_status_code={
+            ADMIN: 200,
+            GUEST: 405,
+            PARTICIPANT: 405,
+            ORGANIZER: 405,
+            ORGANIZER_WRONG_TASK: 405,
+        },
+    ),
+    route_to_test(
+        url_pattern='api/run-log/<str:dataset_id>/<str:vm_id>/<str:run_id>/<str:log>',
+        params={'dataset_id': f'dataset-1-{now}-training', 'vm_id': 'example_participant', 'run_id': 'run-1', 'log': 'stdout'},
+        group_to_expected_status_code={
+            ADMIN: 404,
+            GUEST: 302,
+            PARTICIPANT: 302,
+            ORGANIZER: 302,
+            ORGANIZER_WRONG_TASK: 302,
+        },
+    ),
+    route_to_test(
+        url_pattern='api/run-log/<str:dataset_id>/<str:vm_id>/<str:run_id>/<str:log>',
+        params={'dataset_id': f'dataset-1-{now}-training', 'vm_id': PARTICIPANT.split('_')[-1], 'run_id': 'run-1', 'log': 'stderr'},
+        group_to_expected_status_code={
+            ADMIN: 404,
+            GUEST: 302,
+            PARTICIPANT: 404,
+            ORGANIZER: 302,
+            ORGANIZER_WRONG_TASK: 302,
+        },
+    ),
+    route_to_test(
+        url_pattern='api/export/evaluations/<str:task_id>',
+        params={'task_id': 'shared-task-1'},
+        group_to_expected_status_code={
+            ADMIN: 200,
+            GUEST: 405,
+            PARTICIPANT: 405,
+            ORGANIZER: 405,
+            ORGANIZER_WRONG_TASK: 405,
+        },
+    ),
+    route_to_test(
+        url_pattern='api/export/evaluations/<str:task_id>',
+        params={'task_id': 'task-of-organizer-1'},
+        group_to_expected_status_code={
+            ADMIN: 200,
+            GUEST: 405,
+            PARTICIPANT: 405,
+            ORGANIZER: 200,
+            ORGANIZER_WRONG_TASK: 405,
+        },
+    ),
     route_to_test(
         url_pattern='tira-admin/delete-task/<str:task_id>',
         params={'task_id': 'task-of-organizer-1'},
@@ -0,0 +1,26 @@
+from django.test import TestCase
+from django.core.cache import cache
+from unittest.mock import patch
+from tira import tira_model
+
+
+class TestGitIntegrationCache(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def load(self, **kwargs):
+        return tira_model.get_git_integration(return_metadata_only=True, **kwargs)
+
+    def test_all_cached_variants_are_invalidated(self):
+        with patch.object(tira_model.model, 'get_organizer', return_value={'gitUrlToNamespace': 'url'}), \
+                patch.object(tira_model.model, 'get_git_integration', side_effect=[{'v': 1}, {'v': 1}, {'v': 2}, {'v': 2}]) as git_integration:
+            self.assertEqual({'v': 1}, self.load(organizer_id='o', task_id='t', dataset_id='d'))
+            self.assertEqual({'v': 1}, self.load(organizer_id='o'))
+            self.assertEqual({'v': 1}, self.load(organizer_id='o', task_id='t', dataset_id='d'))
+            self.assertEqual(2, git_integration.call_count)
+
+            tira_model.invalidate_git_integrations()
+
+            self.assertEqual({'v': 2}, self.load(organizer_id='o', task_id='t', dataset_id='d'))
+            self.assertEqual({'v': 2}, self.load(organizer_id='o'))
+            self.assertEqual(4, git_integration.call_count)
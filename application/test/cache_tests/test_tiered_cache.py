@@ -0,0 +1,67 @@
+from django.test import TestCase
+from django.core.cache import cache, caches
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from tira.tiered_cache import TieredCache
+from tira.tira_model import load_refresh_timestamp_for_cache_key, invalidate_cache
+from django.utils import timezone
+
+
+class TestTieredCache(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_local_hits_do_not_query_the_shared_backend(self):
+        cache.set('tiered-key', {'a': 1})
+
+        with CaptureQueriesContext(connection) as ctx:
+            actual = cache.get('tiered-key')
+
+        self.assertEqual({'a': 1}, actual)
+        self.assertEqual(0, len(ctx.captured_queries))
+
+    def test_values_of_other_processes_are_read_from_the_shared_backend(self):
+        cache.set('tiered-key', 'value')
+        other_process = TieredCache(None, {'OPTIONS': {'SHARED_CACHE': 'shared'}})
+
+        self.assertEqual('value', other_process.get('tiered-key'))
+        self.assertIsNone(other_process.get('missing-key'))
+
+    def test_local_entries_expire_after_the_local_timeout(self):
+        local_only = TieredCache(None, {'OPTIONS': {'SHARED_CACHE': 'shared', 'LOCAL_TIMEOUT': 0}})
+        local_only.set('tiered-key', 'old')
+        caches['shared'].set('tiered-key', (timezone.now(), 'new'))
+
+        self.assertEqual('new', local_only.get('tiered-key'))
+
+    def test_least_recently_used_entries_are_evicted_from_the_local_tier(self):
+        lru = TieredCache(None, {'OPTIONS': {'SHARED_CACHE': 'shared', 'LOCAL_MAX_ENTRIES': 2}})
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+
+        self.assertEqual(['a', 'c'], [k.split(':')[-1] for k in lru._local.keys()])
+
+    def test_invalidation_removes_the_key_from_all_tiers(self):
+        cache.set('tiered-key', 'value')
+        invalidate_cache('tiered-key')
+
+        self.assertIsNone(cache.get('tiered-key'))
+        self.assertIsNone(caches['shared'].get('tiered-key'))
+
+    def test_last_refreshed(self):
+        before = timezone.now()
+        cache.set('tiered-key', 'value')
+
+        actual = load_refresh_timestamp_for_cache_key(cache, 'tiered-key')
+
+        self.assertTrue(before <= actual <= timezone.now())
+        self.assertIsNone(load_refresh_timestamp_for_cache_key(cache, 'missing-key'))
+
+    def test_raw_values_in_the_shared_backend_are_misses(self):
+        caches['shared'].set('tiered-key', {'written': 'without the tiered cache'})
+
+        self.assertIsNone(cache.get('tiered-key'))
+        self.assertEqual('default', cache.get('tiered-key', 'default'))
+        self.assertIsNone(load_refresh_timestamp_for_cache_key(cache, 'tiered-key'))
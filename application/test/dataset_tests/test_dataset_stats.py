@@ -0,0 +1,56 @@
+from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from utils_for_testing import set_up_tira_environment
+from tira.tira_model import model as tira_model
+import tira.model as modeldb
+
+from datetime import datetime
+
+#Used for some tests
+now = datetime.now().strftime("%Y%m%d")
+dataset_id = f'dataset-1-{now}-training'
+
+
+def add_evaluated_run(run_number, published):
+    dataset = modeldb.Dataset.objects.get(dataset_id=dataset_id)
+    evaluator = modeldb.Evaluator.objects.get_or_create(evaluator_id='evaluator-for-stats')[0]
+    run = modeldb.Run.objects.create(run_id=f'eval-{run_number}', input_run=modeldb.Run.objects.get(run_id='run-1'),
+                                     input_dataset=dataset, evaluator=evaluator)
+    modeldb.Review.objects.create(run=run, published=published)
+
+
+class TestDatasetStats(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        set_up_tira_environment()
+
+    def test_stats_are_counted_per_dataset(self):
+        add_evaluated_run(1, published=True)
+        add_evaluated_run(2, published=False)
+
+        actual = {d['dataset_id']: d for d in tira_model.get_datasets_by_task('shared-task-1')}
+
+        self.assertEqual(3, actual[dataset_id]['runs_count'])
+        self.assertEqual(2, actual[dataset_id]['evaluations_count'])
+        self.assertEqual(1, actual[dataset_id]['evaluations_public_count'])
+        self.assertEqual(0, actual[f'dataset-2-{now}-test']['runs_count'])
+        self.assertEqual(actual[dataset_id], tira_model.get_dataset(dataset_id))
+
+    def test_stats_are_skipped_in_the_lightweight_mode(self):
+        actual = tira_model.get_dataset(dataset_id, include_stats=False)
+
+        self.assertEqual('organizer', actual['organizer_id'])
+        self.assertNotIn('runs_count', actual)
+
+    def test_number_of_queries_does_not_grow_with_the_number_of_datasets(self):
+        with CaptureQueriesContext(connection) as queries_for_all_datasets:
+            tira_model.get_datasets()
+        with CaptureQueriesContext(connection) as queries_for_one_dataset:
+            tira_model.get_dataset(dataset_id)
+
+        self.assertEqual(len(queries_for_one_dataset), len(queries_for_all_datasets))
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
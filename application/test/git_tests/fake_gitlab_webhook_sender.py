@@ -0,0 +1,41 @@
+import json
+
+
+class FakeGitLabWebhookSender(object):
+    """ Sends GitLab webhook events (in the format of GitLab) to the webhook endpoint of TIRA, for tests and local
+    development without a GitLab instance. """
+
+    def __init__(self, client, secret, git_repository_id, url='/api/gitlab-webhook'):
+        self.client = client
+        self.secret = secret
+        self.git_repository_id = git_repository_id
+        self.url = url
+
+    def send(self, event):
+        return self.client.post(self.url, data=json.dumps(event), content_type='application/json',
+                                HTTP_X_GITLAB_TOKEN=self.secret, HTTP_X_GITLAB_EVENT='System Hook')
+
+    def pipeline(self, pipeline_id, ref, status, user_software_job_status='created', sha='sha-1', job_id=None,
+                 created_at=None, finished_at=None):
+        return self.send({
+            'object_kind': 'pipeline',
+            'object_attributes': {'id': pipeline_id, 'ref': ref, 'sha': sha, 'status': status, 'created_at': created_at,
+                                  'finished_at': finished_at},
+            'project': {'id': self.git_repository_id},
+            'builds': [{'id': job_id or pipeline_id * 10, 'name': 'run-user-software',
+                        'status': user_software_job_status},
+                       {'id': (job_id or pipeline_id * 10) + 1, 'name': 'evaluate-software-result',
+                        'status': 'created'}],
+        })
+
+    def job(self, pipeline_id, ref, status, job_id=None, name='run-user-software', sha='sha-1', started_at=None,
+            finished_at=None):
+        return self.send({
+            'object_kind': 'build', 'build_id': job_id or pipeline_id * 10, 'build_name': name,
+            'build_status': status, 'pipeline_id': pipeline_id, 'ref': ref, 'sha': sha,
+            'project_id': self.git_repository_id, 'build_started_at': started_at, 'build_finished_at': finished_at,
+        })
+
+    def delete_branch(self, ref):
+        return self.send({'object_kind': 'push', 'ref': 'refs/heads/' + ref, 'before': 'sha-1', 'after': '0' * 40,
+                          'project': {'id': self.git_repository_id}})
@@ -0,0 +1,113 @@
+from django.test import TestCase
+from tira.git_runner_integration import GitLabRunner
+from tira.model import DockerImage, DockerImageManifest
+
+
+class Obj(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FakeUserRepository(object):
+    def __init__(self, locations):
+        tags = lambda: Obj(list=lambda get_all: [Obj(location=i) for i in locations])
+        self.repositories = Obj(list=lambda get_all: [Obj(tags=tags())])
+
+
+class TestDockerImageInventory(TestCase):
+    def runner(self, locations, digests):
+        runner = GitLabRunner('token', 'git.example.com', 'user', 'password', 1, 'registry.example.com/tira', 'main')
+        runner.manifest_requests = []
+        runner.existing_repository = lambda name: FakeUserRepository(locations)
+        runner._GitLabRunner__registry_headers = lambda repository_name: {}
+        runner._GitLabRunner__docker_image_digest = lambda repository, tag, headers: digests.get(f'{repository}:{tag}')
+
+        def manifest(repository_name, tag, cache, force_cache_refresh):
+            runner.manifest_requests += [(repository_name, tag)]
+            return {'architecture': 'amd64', 'created': '2023-01-01T10:00:00.123', 'size': '1 MB', 'digest': tag[-4:]}
+
+        runner.get_manifest_of_docker_image_image_repository = manifest
+        return runner
+
+    def test_manifests_are_only_fetched_for_unseen_digests(self):
+        locations = ['registry.example.com/tira/tira-user-a/img:1', 'registry.example.com/tira/tira-user-a/img:latest']
+        digests = {locations[0]: 'sha256:aaaa', locations[1]: 'sha256:aaaa'}
+
+        runner = self.runner(locations, digests)
+        actual = runner.docker_images_in_user_repository('a', force_cache_refresh=True)
+
+        self.assertEqual([i for i in locations], [i['image'] for i in actual])
+        self.assertEqual('2023-01-01T10:00:00', actual[0]['created'])
+        self.assertEqual([('registry.example.com/tira/tira-user-a/img', 'sha256:aaaa')], runner.manifest_requests)
+        self.assertEqual(2, DockerImage.objects.filter(user_name='a').count())
+
+        # A new tag of a known image and a new image
+        locations += ['registry.example.com/tira/tira-user-a/img:2', 'registry.example.com/tira/tira-user-a/img2:1']
+        digests.update({locations[2]: 'sha256:aaaa', locations[3]: 'sha256:bbbb'})
+        runner = self.runner(locations, digests)
+        actual = runner.docker_images_in_user_repository('a', force_cache_refresh=True)
+
+        self.assertEqual(sorted(locations), [i['image'] for i in actual])
+        self.assertEqual([('registry.example.com/tira/tira-user-a/img2', 'sha256:bbbb')], runner.manifest_requests)
+        self.assertEqual(2, DockerImageManifest.objects.filter(digest__in=['sha256:aaaa', 'sha256:bbbb']).count())
+
+    def test_manifests_of_re_pushed_tags_are_fetched_by_digest(self):
+        locations = ['registry.example.com/tira/tira-user-e/img:latest']
+        self.runner(locations, {locations[0]: 'sha256:eeee'}).docker_images_in_user_repository(
+            'e', force_cache_refresh=True)
+
+        runner = self.runner(locations, {locations[0]: 'sha256:ffff'})
+        actual = runner.docker_images_in_user_repository('e', force_cache_refresh=True)
+
+        self.assertEqual([('registry.example.com/tira/tira-user-e/img', 'sha256:ffff')], runner.manifest_requests)
+        self.assertEqual('ffff', actual[0]['digest'])
+        self.assertEqual(['sha256:ffff'], [i.digest for i in DockerImage.objects.filter(user_name='e')])
+
+    def test_removed_tags_are_removed_from_the_inventory(self):
+        locations = ['registry.example.com/tira/tira-user-b/img:1', 'registry.example.com/tira/tira-user-b/img:2']
+        self.runner(locations, {i: 'sha256:cccc' for i in locations}).docker_images_in_user_repository(
+            'b', force_cache_refresh=True)
+
+        runner = self.runner(locations[:1], {locations[0]: 'sha256:cccc'})
+        actual = runner.docker_images_in_user_repository('b', force_cache_refresh=True)
+
+        self.assertEqual(locations[:1], [i['image'] for i in actual])
+        self.assertEqual(['1'], [i.tag for i in DockerImage.objects.filter(user_name='b')])
+
+    def test_images_are_served_from_the_inventory_without_calls_to_gitlab(self):
+        locations = ['registry.example.com/tira/tira-user-c/img:1']
+        self.runner(locations, {locations[0]: 'sha256:dddd'}).docker_images_in_user_repository(
+            'c', force_cache_refresh=True)
+
+        runner = self.runner(locations, {})
+        runner.existing_repository = None
+        actual = runner.docker_images_in_user_repository('c')
+
+        self.assertEqual(locations, [i['image'] for i in actual])
+        self.assertEqual('dddd', actual[0]['digest'])
+
+    def test_images_without_digest_are_not_recorded(self):
+        locations = ['registry.example.com/tira/tira-user-d/img:1']
+        runner = self.runner(locations, {})
+        actual = runner.docker_images_in_user_repository('d', force_cache_refresh=True)
+
+        self.assertEqual(locations, [i['image'] for i in actual])
+        self.assertEqual(0, DockerImage.objects.filter(user_name='d').count())
+
+    def test_failed_registry_authentication_is_treated_as_images_without_digest(self):
+        locations = ['registry.example.com/tira/tira-user-e/img:1', 'registry.example.com/tira/tira-user-e/img2:1']
+        runner = self.runner(locations, {})
+        del runner._GitLabRunner__docker_image_digest
+        runner.session = Obj(head=lambda url, headers: Obj(ok=True, headers={'Docker-Content-Digest': 'sha256:eeee'}))
+
+        def registry_headers(repository_name):
+            if repository_name.endswith('img2'):
+                raise ValueError('401 Unauthorized')
+            return {}
+        runner._GitLabRunner__registry_headers = registry_headers
+
+        with self.assertLogs('tira', level='WARNING'):
+            actual = runner.docker_images_in_user_repository('e', force_cache_refresh=True)
+
+        self.assertEqual(sorted(locations), sorted(i['image'] for i in actual))
+        self.assertEqual(['img'], [i.repository.split('/')[-1] for i in DockerImage.objects.filter(user_name='e')])
@@ -0,0 +1,78 @@
+from django.test import TestCase, override_settings
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from threading import Thread
+from tira.git_clients import GitClientMetrics, PageCalls, UNRESOLVED_ROUTE, endpoint_of_url, gitlab_client, \
+    git_session, metrics, pooled_session, set_page_calls
+from tira.git_refresher import map_concurrently
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """ Fails the first two requests with 503 and answers all other requests with 200. """
+    requests = 0
+
+    def do_GET(self):
+        FlakyHandler.requests += 1
+        self.send_response(503 if FlakyHandler.requests <= 2 else 200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestGitClients(TestCase):
+    def test_endpoints_have_placeholders_for_ids_and_names(self):
+        self.assertEqual('/api/v4/projects/:id/pipelines',
+                         endpoint_of_url('https://git.webis.de/api/v4/projects/1234/pipelines?status=running'))
+        self.assertEqual('/api/v4/projects/:id/repository/branches/:name',
+                         endpoint_of_url('https://git.webis.de/api/v4/projects/1234/repository/branches/ds---u---r'))
+        self.assertEqual('/api/v4/projects/:id', endpoint_of_url('https://git.webis.de/api/v4/projects/code%2Ftira'))
+        self.assertEqual('/v2/:repository/manifests/:reference',
+                         endpoint_of_url('https://registry.webis.de/v2/code/tira/tira-user-a/img/manifests/latest'))
+
+    @override_settings(GIT_RETRY_BACKOFF=0.01)
+    def test_failed_requests_are_retried_and_measured(self):
+        server = HTTPServer(('127.0.0.1', 0), FlakyHandler)
+        Thread(target=server.serve_forever, daemon=True).start()
+        metrics.reset()
+        try:
+            response = pooled_session().get(f'http://127.0.0.1:{server.server_port}/api/v4/projects/1/jobs')
+        finally:
+            server.shutdown()
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, FlakyHandler.requests)
+        endpoint = metrics.snapshot()['endpoints'][0]
+        self.assertEqual(('127.0.0.1', 'GET', '/api/v4/projects/:id/jobs'),
+                         (endpoint['host'], endpoint['method'], endpoint['endpoint']))
+        self.assertEqual((1, 0, 2), (endpoint['calls'], endpoint['errors'], endpoint['retries']))
+        self.assertEqual(1, sum(i['count'] for i in endpoint['latency_histogram']))
+
+    def test_clients_are_shared_per_git_integration(self):
+        self.assertIs(gitlab_client('git.example.com', 'a'), gitlab_client('git.example.com', 'a'))
+        self.assertIsNot(gitlab_client('git.example.com', 'a'), gitlab_client('git.example.com', 'b'))
+        self.assertIs(git_session('git.example.com', 'a'), gitlab_client('git.example.com', 'a').session)
+
+    def test_requests_without_route_share_one_page(self):
+        for path in ['/does-not-exist-1', '/wp-admin/does-not-exist-2']:
+            self.client.get(path)
+
+        pages = [i['page'] for i in metrics.snapshot()['pages']]
+        self.assertIn(UNRESOLVED_ROUTE, pages)
+        self.assertFalse(any('does-not-exist' in i for i in pages))
+
+    def test_calls_in_worker_threads_are_attributed_to_the_page(self):
+        metrics = GitClientMetrics()
+        page_calls = PageCalls()
+        set_page_calls(page_calls)
+        try:
+            map_concurrently(lambda i: metrics.record('git.example.com', 'GET', '/api/v4/projects/:id', 200, 0.2),
+                             range(5))
+        finally:
+            set_page_calls(None)
+        metrics.record_page('task/<str:task_id>', page_calls.count)
+
+        self.assertEqual(5, page_calls.count)
+        self.assertEqual([{'page': 'task/<str:task_id>', 'requests': 1, 'git_calls': 5, 'max_git_calls': 5}],
+                         metrics.snapshot()['pages'])
+        self.assertEqual({'le': '0.25', 'count': 5}, metrics.snapshot()['endpoints'][0]['latency_histogram'][2])
@@ -0,0 +1,69 @@
+from django.test import TestCase
+from threading import Lock
+import time
+from tira.git_refresher import HostRateLimiter, map_concurrently
+from tira.git_runner_integration import GitLabRunner
+
+
+class Obj(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FakeProject(object):
+    """ A gitlab project with one running and one pending pipeline and a branch of a pipeline that failed to start. """
+    def __init__(self):
+        job = lambda name, status: Obj(name=name, status=status, id=1)
+        pipeline = lambda ref, status: Obj(ref=ref, jobs=Obj(list=lambda: [job('run-user-software', status)]))
+        self.statuses = {
+            'running': [pipeline('dataset---user---run-1---started-1', 'running')],
+            'pending': [pipeline('dataset---user---run-2---started-2', 'created')],
+        }
+        self.pipelines = Obj(list=lambda status: self.statuses.get(status, []))
+        self.branches = Obj(list=lambda: [Obj(name=i) for i in ['main', 'dataset---user---run-1---started-1', 'dataset---user---run-3---started-3']])
+
+
+class TestGitRefresher(TestCase):
+    def test_map_concurrently_keeps_the_order_and_runs_concurrently(self):
+        lock, running, max_running = Lock(), [0], [0]
+
+        def func(i):
+            with lock:
+                running[0] += 1
+                max_running[0] = max(max_running[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+            return i * 2
+
+        self.assertEqual([0, 2, 4, 6, 8, 10], map_concurrently(func, range(6), max_workers=3))
+        self.assertEqual(3, max_running[0])
+
+    def test_map_concurrently_raises_exceptions(self):
+        def func(i):
+            raise ValueError(f'fail {i}')
+
+        with self.assertRaises(ValueError):
+            map_concurrently(func, [1, 2])
+
+    def test_rate_limiter_spaces_out_requests_per_host(self):
+        limiter = HostRateLimiter(requests_per_second=20)
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.acquire('host-a')
+        limiter.acquire('host-b')
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_running_and_failed_pipelines_are_collected_concurrently(self):
+        runner = GitLabRunner('token', 'git.example.com', 'user', 'password', 1, 'registry', 'main')
+        runner.gitHoster_client = Obj(projects=Obj(get=lambda repository_id: FakeProject()))
+        runner.extract_job_configuration = lambda gl_project, branch, commit_sha=None: None if branch == 'main' else {'branch': branch}
+
+        actual = runner.all_running_pipelines_for_repository(1)
+
+        self.assertEqual(['run-1', 'run-2', 'run-3'], [i['run_id'] for i in actual])
+        self.assertEqual('running', actual[0]['execution']['execution'])
+        self.assertEqual('pending', actual[1]['execution']['execution'])
+        self.assertEqual('failed', actual[2]['execution']['execution'])
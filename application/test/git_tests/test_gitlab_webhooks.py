@@ -0,0 +1,141 @@
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from unittest.mock import patch
+from git_tests.fake_gitlab_webhook_sender import FakeGitLabWebhookSender
+from tira.git_runner_integration import GitLabRunner
+from tira.git_refresher import refresh_running_pipelines
+from tira.gitlab_webhooks import PIPELINE_STATES_MAX_AGE, last_event
+import tira.model as modeldb
+
+TRAINING_REF = 'dataset-training---user---run-1---started-1'
+TEST_REF = 'dataset-test---user---run-2---started-2'
+
+
+@override_settings(GITLAB_WEBHOOK_SECRET='webhook-secret')
+class TestGitLabWebhooks(TestCase):
+    def setUp(self):
+        self.sender = FakeGitLabWebhookSender(self.client, 'webhook-secret', 12)
+        self.runner = GitLabRunner('token', 'git.example.com', 'user', 'password', 1, 'registry', 'main')
+        self.runner.extract_job_configuration = lambda gl_project, branch, commit_sha=None: {'branch': branch}
+
+    def running_pipelines(self, user_id='user'):
+        return list(self.runner.yield_all_running_pipelines(12, user_id))
+
+    def test_events_with_wrong_secret_are_rejected(self):
+        response = FakeGitLabWebhookSender(self.client, 'wrong-secret', 12).pipeline(1, TEST_REF, 'running')
+
+        self.assertEqual(403, response.status_code)
+        self.assertFalse(modeldb.PipelineState.objects.exists())
+
+    @override_settings(GITLAB_WEBHOOK_SECRET=None)
+    def test_webhooks_are_disabled_without_secret(self):
+        self.assertEqual(403, FakeGitLabWebhookSender(self.client, '', 12).pipeline(1, TEST_REF, 'running').status_code)
+
+    def test_invalid_events_are_rejected(self):
+        self.assertEqual(400, self.sender.send({'object_kind': 'pipeline'}).status_code)
+
+    def test_pipeline_events_create_running_pipelines(self):
+        self.assertEqual(200, self.sender.pipeline(2, TEST_REF, 'pending').status_code)
+
+        actual = self.running_pipelines()
+
+        self.assertEqual(1, len(actual))
+        self.assertEqual('run-2', actual[0]['run_id'])
+        self.assertEqual({'scheduling': 'running', 'execution': 'pending', 'evaluation': 'pending'}, actual[0]['execution'])
+        self.assertEqual('Output for runs on the test-data is hidden.', actual[0]['stdOutput'])
+        self.assertEqual({'branch': TEST_REF}, actual[0]['job_config'])
+
+    def test_job_events_update_the_execution(self):
+        self.sender.pipeline(2, TEST_REF, 'pending')
+        self.sender.job(2, TEST_REF, 'running')
+        self.assertEqual('running', self.running_pipelines()[0]['execution']['execution'])
+
+        self.sender.job(2, TEST_REF, 'success')
+        self.assertEqual('running', self.running_pipelines()[0]['execution']['evaluation'])
+
+    def test_job_events_of_other_jobs_are_ignored(self):
+        self.sender.job(2, TEST_REF, 'running', name='evaluate-software-result')
+
+        self.assertFalse(modeldb.PipelineState.objects.exists())
+
+    def test_failed_pipelines_are_reported_until_their_branch_is_deleted(self):
+        self.sender.pipeline(1, TRAINING_REF, 'failed')
+        self.assertEqual('failed', self.running_pipelines()[0]['execution']['execution'])
+
+        self.sender.delete_branch(TRAINING_REF)
+        self.assertEqual([], self.running_pipelines())
+
+    def test_successful_pipelines_are_not_running(self):
+        self.sender.pipeline(2, TEST_REF, 'running')
+        self.sender.pipeline(2, TEST_REF, 'success', user_software_job_status='success')
+
+        self.assertEqual([], self.running_pipelines())
+        self.assertEqual(1, modeldb.PipelineState.objects.count())
+
+    def test_only_pipelines_of_the_user_are_returned(self):
+        self.sender.pipeline(2, TEST_REF, 'running')
+
+        self.assertEqual([], self.running_pipelines('other-user'))
+
+    def test_events_that_arrive_out_of_order_are_ignored(self):
+        self.sender.pipeline(2, TEST_REF, 'success', created_at='2023-05-01 10:00:00 UTC',
+                             finished_at='2023-05-01 10:30:00 UTC')
+        self.sender.pipeline(2, TEST_REF, 'pending', created_at='2023-05-01 10:00:00 UTC')
+        self.sender.pipeline(2, TEST_REF, 'running')
+        self.assertEqual('success', modeldb.PipelineState.objects.get(pipeline_id=2).status)
+
+        self.sender.job(3, TRAINING_REF, 'success', started_at='2023-05-01T10:05:00Z', finished_at='2023-05-01T10:20:00Z')
+        self.sender.job(3, TRAINING_REF, 'running', started_at='2023-05-01T10:05:00Z')
+        self.assertEqual('success', modeldb.PipelineState.objects.get(pipeline_id=3).user_software_job_status)
+
+    def test_pipelines_are_polled_when_the_events_are_not_recent(self):
+        self.sender.pipeline(2, TEST_REF, 'running')
+        modeldb.PipelineState.objects.update(last_event=timezone.now() - 2 * PIPELINE_STATES_MAX_AGE)
+        polled = {'run_id': 'run-3', 'pipeline_name': 'dataset-test---user---run-3', 'stdOutput': ''}
+
+        with patch.object(GitLabRunner, 'all_running_pipelines_for_repository', return_value=[polled]):
+            self.assertEqual(['run-3'], [i['run_id'] for i in self.running_pipelines()])
+
+    def test_states_of_finished_pipelines_are_pruned(self):
+        self.sender.pipeline(1, TRAINING_REF, 'failed')
+        self.sender.pipeline(2, TEST_REF, 'success')
+        modeldb.PipelineState.objects.update(last_event=timezone.now() - 2 * PIPELINE_STATES_MAX_AGE)
+
+        self.sender.pipeline(3, TEST_REF, 'running')
+
+        self.assertEqual([1, 3], sorted(modeldb.PipelineState.objects.values_list('pipeline_id', flat=True)))
+
+    def test_job_configurations_and_traces_are_cached(self):
+        calls = []
+        self.runner.extract_job_configuration = lambda gl_project, branch, commit_sha=None: \
+            calls.append(branch) or {'branch': branch}
+        self.sender.pipeline(1, TRAINING_REF, 'running')
+        cache = LocMemCache('webhooks', {})
+
+        with patch.object(GitLabRunner, '_GitLabRunner__job_output', return_value='trace') as job_output:
+            for _ in range(3):
+                actual = list(self.runner.yield_all_running_pipelines(12, 'user', cache))
+                self.assertEqual('trace', actual[0]['stdOutput'])
+
+        self.assertEqual([TRAINING_REF], calls)
+        self.assertEqual(1, job_output.call_count)
+
+    def test_last_event_of_repositories(self):
+        self.assertIsNone(last_event(12))
+
+        self.sender.pipeline(2, TEST_REF, 'running')
+
+        self.assertEqual(modeldb.PipelineState.objects.get(pipeline_id=2).last_event, last_event(12))
+
+    def test_repositories_with_webhooks_are_not_polled(self):
+        self.sender.pipeline(2, TEST_REF, 'running')
+        polled = []
+        runner = type('Runner', (), {'all_running_pipelines_for_repository':
+                                     lambda _, repo, cache, force_cache_refresh: polled.append(repo) or []})()
+
+        with patch('tira.git_refresher.repositories_with_running_pipelines', return_value=[('t', '12'), ('t', '13')]), \
+                patch('tira.tira_model.get_git_integration', return_value=runner):
+            refresh_running_pipelines(None, 1)
+
+        self.assertEqual(['13'], polled)
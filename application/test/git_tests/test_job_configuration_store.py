@@ -0,0 +1,63 @@
+from django.test import TestCase
+from tira.git_runner_integration import GitLabRunner
+import tira.model as modeldb
+
+BRANCH = 'dataset---user---run-1---started-1'
+JOB_TO_EXECUTE = "\n+TIRA_COMMAND_TO_EXECUTE='No software to execute. Only evaluation'\n+TIRA_SOFTWARE_ID=-1\n+TIRA_CPU_COUNT=2"
+
+
+class Obj(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class CountingProject(object):
+    def __init__(self):
+        self.id = 12
+        self.api_calls = 0
+        diff = {'old_path': 'x/job-to-execute.txt', 'new_path': 'x/job-to-execute.txt', 'diff': JOB_TO_EXECUTE}
+        self.commits = Obj(list=self.list_commits)
+        self.commit = Obj(title=f'Start {BRANCH}', diff=lambda: [diff])
+
+    def list_commits(self, **kwargs):
+        self.api_calls += 1
+        return [self.commit]
+
+
+class TestJobConfigurationStore(TestCase):
+    def setUp(self):
+        self.runner = GitLabRunner('token', 'git.example.com', 'user', 'password', 1, 'registry', 'main')
+        self.project = CountingProject()
+
+    def test_job_configurations_are_extracted_once_per_head_commit(self):
+        expected = self.runner.extract_job_configuration(self.project, BRANCH, 'sha-1')
+        actual = self.runner.extract_job_configuration(self.project, BRANCH, 'sha-1')
+
+        self.assertEqual(expected, actual)
+        self.assertEqual('Evaluate Run', actual['software_name'])
+        self.assertEqual('2 CPU Cores', actual['cores'])
+        self.assertEqual(1, self.project.api_calls)
+        self.assertEqual(1, modeldb.JobConfiguration.objects.filter(git_repository_id='12', branch=BRANCH).count())
+
+    def test_new_head_commits_are_extracted_again(self):
+        self.runner.extract_job_configuration(self.project, BRANCH, 'sha-1')
+        self.runner.extract_job_configuration(self.project, BRANCH, 'sha-2')
+
+        self.assertEqual(2, self.project.api_calls)
+
+    def test_job_configurations_without_commit_are_not_stored(self):
+        self.runner.extract_job_configuration(self.project, BRANCH)
+        self.runner.extract_job_configuration(self.project, BRANCH)
+
+        self.assertEqual(2, self.project.api_calls)
+        self.assertFalse(modeldb.JobConfiguration.objects.exists())
+
+    def test_failed_extractions_are_not_stored(self):
+        def fail(**kwargs):
+            raise ConnectionError('GitLab is not available')
+        self.project.commits = Obj(list=fail)
+
+        actual = self.runner.extract_job_configuration(self.project, BRANCH, 'sha-1')
+
+        self.assertEqual('Loading...', actual['dataset'])
+        self.assertFalse(modeldb.JobConfiguration.objects.exists())
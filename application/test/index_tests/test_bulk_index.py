@@ -0,0 +1,94 @@
+from django.test import TestCase
+from django.core.management import call_command
+from utils_for_testing import set_up_tira_environment
+from tira.tira_model import model as tira_model
+from tira.data.bulk_index import upsert
+import tira.model as modeldb
+import shutil
+
+from datetime import datetime
+
+#Used for some tests
+now = datetime.now().strftime("%Y%m%d")
+
+
+def snapshot():
+    return {'organizers': sorted(modeldb.Organizer.objects.values_list('organizer_id', 'name')),
+            'tasks': sorted(modeldb.Task.objects.values_list('task_id', 'organizer_id', 'vm_id')),
+            'datasets': sorted(modeldb.Dataset.objects.values_list('dataset_id', 'default_task_id', 'is_confidential')),
+            'task_has_dataset': sorted(modeldb.TaskHasDataset.objects.values_list('task_id', 'dataset_id', 'is_test')),
+            'runs': sorted(modeldb.Run.objects.values_list('run_id', 'input_dataset_id', 'task_id', 'upload__vm_id')),
+            'reviews': sorted(modeldb.Review.objects.values_list('run_id', 'published', 'blinded'))}
+
+
+class TestBulkIndex(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        set_up_tira_environment()
+        tira_model.organizers_file_path.parent.mkdir(parents=True, exist_ok=True)
+        tira_model.organizers_file_path.touch(exist_ok=True)
+
+    def index_into_empty_database(self, processes):
+        expected = snapshot()
+        modeldb.Review.objects.all().delete()
+        modeldb.Run.objects.all().delete()
+        modeldb.Dataset.objects.all().delete()
+        modeldb.Task.objects.all().delete()
+
+        actual = tira_model.index_model_from_files(processes)
+
+        self.assertEqual(expected, snapshot())
+        return actual
+
+    def test_index_in_current_process_restores_the_model(self):
+        self.index_into_empty_database(processes=1)
+
+    def test_index_with_process_pool_restores_the_model(self):
+        self.index_into_empty_database(processes=2)
+
+    def test_index_reports_throughput_per_phase(self):
+        actual = self.index_into_empty_database(processes=1)
+
+        self.assertEqual(['organizers', 'virtual machines', 'datasets', 'tasks', 'softwares', 'runs'],
+                         [i['phase'] for i in actual])
+        self.assertEqual(2, [i for i in actual if i['phase'] == 'runs'][0]['files'])
+        self.assertTrue(all('files_per_second' in i and 'rows_per_second' in i for i in actual))
+
+    def test_index_twice_is_idempotent(self):
+        tira_model.index_model_from_files(1)
+        expected = snapshot()
+        tira_model.index_model_from_files(1)
+
+        self.assertEqual(expected, snapshot())
+
+    def test_duplicate_run_ids_are_indexed_once(self):
+        run_dir = tira_model.runs_dir_path / 'dataset-1' / 'example_participant' / 'run-1'
+        shutil.copytree(run_dir, run_dir.parent / 'copy-of-run-1')
+        try:
+            self.index_into_empty_database(processes=1)
+        finally:
+            shutil.rmtree(run_dir.parent / 'copy-of-run-1')
+
+        self.assertEqual(1, modeldb.Run.objects.filter(run_id='run-1').count())
+        self.assertEqual(1, modeldb.Review.objects.filter(run_id='run-1').count())
+
+    def test_corrupt_runs_are_skipped(self):
+        run_dir = tira_model.runs_dir_path / 'dataset-1' / 'example_participant' / 'corrupt-run'
+        run_dir.mkdir()
+        (run_dir / 'run.prototext').write_text('this is { not a run')
+        try:
+            self.index_into_empty_database(processes=1)
+        finally:
+            shutil.rmtree(run_dir)
+
+    def test_upsert_writes_the_last_of_duplicate_objects(self):
+        actual = upsert(modeldb.Organizer, [modeldb.Organizer(organizer_id='org-duplicate', name='first'),
+                                            modeldb.Organizer(organizer_id='org-duplicate', name='second')],
+                        ['organizer_id'], ['name'])
+
+        self.assertEqual(['second'], [i.name for i in actual])
+        self.assertEqual('second', modeldb.Organizer.objects.get(organizer_id='org-duplicate').name)
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
@@ -0,0 +1,79 @@
+from django.test import TestCase
+from utils_for_testing import set_up_tira_environment
+from tira.tira_model import model as tira_model
+import tira.data.data as dbops
+import tira.model as modeldb
+from pathlib import Path
+from unittest.mock import patch
+import shutil
+
+from datetime import datetime
+
+#Used for some tests
+now = datetime.now().strftime("%Y%m%d")
+
+
+class TestIncrementalIndex(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        set_up_tira_environment()
+
+    def test_unchanged_runs_are_not_parsed_again(self):
+        tira_model.reload_runs('example_participant')
+        actual = tira_model.reload_runs('example_participant')
+
+        self.assertEqual({'parsed': 0, 'removed': 0}, actual)
+
+    def test_only_runs_with_changed_files_are_parsed(self):
+        tira_model.reload_runs('example_participant')
+        tira_model.update_review(f'dataset-1', 'example_participant', 'run-1', published=True)
+        modeldb.Review.objects.filter(run__run_id='run-1').update(published=False)
+
+        actual = tira_model.reload_runs('example_participant')
+
+        self.assertEqual({'parsed': 1, 'removed': 0}, actual)
+        self.assertTrue(modeldb.Review.objects.get(run__run_id='run-1').published)
+
+    def test_runs_of_removed_run_directories_are_deleted(self):
+        run_dir = Path('tira-root/data/runs/dataset-1/example_participant/run-to-remove')
+        run_dir.mkdir(parents=True, exist_ok=True)
+        (run_dir / 'run.prototext').write_text(f'\nsoftwareId: "upload"\nrunId: "run-to-remove"\n'
+                                               f'inputDataset: "dataset-1-{now}-training"\ndownloadable: true\ndeleted: false\n')
+
+        self.assertEqual(3, tira_model.reload_runs('example_participant')['parsed'])
+        self.assertTrue(modeldb.Run.objects.filter(run_id='run-to-remove').exists())
+
+        shutil.rmtree(run_dir)
+        actual = tira_model.reload_runs('example_participant')
+
+        self.assertEqual({'parsed': 0, 'removed': 1}, actual)
+        self.assertFalse(modeldb.Run.objects.filter(run_id='run-to-remove').exists())
+        self.assertTrue(modeldb.IndexedFile.objects.filter(path__endswith='run-to-remove/run.bin', deleted=True).exists())
+
+    def test_reloads_of_runs_only_load_the_recorded_files_of_their_scope(self):
+        tira_model.reload_runs('example_participant')
+
+        with patch('tira.data.data._recorded_index_state', wraps=dbops._recorded_index_state) as recorded:
+            tira_model.reload_runs('example_participant')
+
+        scopes = recorded.call_args[0][0]
+        self.assertTrue(len(scopes) > 0)
+        self.assertTrue(all(scope.name == 'example_participant' for scope in scopes))
+
+    def test_recorded_index_state_of_many_scopes(self):
+        scopes = [Path(f'/tmp/scopes/run-{i}') for i in range(2 * dbops.SCOPES_PER_QUERY + 1)]
+        modeldb.IndexedFile.objects.bulk_create([modeldb.IndexedFile(path=str(i / 'run.bin'), mtime=0, size=0)
+                                                 for i in scopes + [Path('/tmp/scopes/other-run')]])
+
+        actual = dbops._recorded_index_state(scopes)
+
+        self.assertEqual(sorted(str(i / 'run.bin') for i in scopes), sorted(actual.keys()))
+
+    def test_unchanged_tasks_are_not_parsed_again(self):
+        tira_model.reload_tasks()
+
+        self.assertEqual({'parsed': 0, 'removed': 0}, tira_model.reload_tasks())
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
@@ -0,0 +1,65 @@
+from django.test import TestCase
+from utils_for_testing import set_up_tira_environment
+from tira.tira_model import model as tira_model
+from tira.data.model_watcher import ChangeDebouncer, target_of_path, index_changes
+import tira.model as modeldb
+from pathlib import Path
+import shutil
+
+from datetime import datetime
+
+#Used for some tests
+now = datetime.now().strftime("%Y%m%d")
+RUNS_DIR = tira_model.runs_dir_path
+MODEL_DIR = tira_model.tira_root / 'model'
+
+
+class TestModelWatcher(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        set_up_tira_environment()
+
+    def test_debouncer_releases_only_quiet_targets(self):
+        debouncer = ChangeDebouncer(debounce_seconds=5)
+        debouncer.add('a', now=0)
+        debouncer.add('b', now=3)
+        debouncer.add('a', now=4)
+
+        self.assertEqual([], debouncer.pop_ready(now=7))
+        self.assertEqual(['b'], debouncer.pop_ready(now=8))
+        self.assertEqual(['a'], debouncer.pop_ready(now=9))
+        self.assertEqual([], debouncer.pop_ready(now=100))
+
+    def test_files_of_runs_are_mapped_to_their_run_directory(self):
+        actual = target_of_path(RUNS_DIR / 'dataset-1' / 'example_participant' / 'run-1' / 'output' / 'run.txt',
+                                RUNS_DIR, MODEL_DIR)
+
+        self.assertEqual(('run', RUNS_DIR / 'dataset-1' / 'example_participant' / 'run-1'), actual)
+
+    def test_files_of_the_model_are_mapped_to_their_reload_method(self):
+        self.assertEqual(('model', 'reload_tasks'), target_of_path(MODEL_DIR / 'tasks' / 't.prototext', RUNS_DIR, MODEL_DIR))
+        self.assertEqual(('model', 'reload_vms'), target_of_path(MODEL_DIR / 'users' / 'users.prototext', RUNS_DIR, MODEL_DIR))
+        self.assertEqual(('model', 'build_model'), target_of_path(MODEL_DIR / 'softwares' / 'a' / 'b', RUNS_DIR, MODEL_DIR))
+
+    def test_directories_above_runs_and_unrelated_paths_are_ignored(self):
+        self.assertIsNone(target_of_path(RUNS_DIR / 'dataset-1' / 'example_participant', RUNS_DIR, MODEL_DIR))
+        self.assertIsNone(target_of_path(tira_model.tira_root / 'state' / 'foo', RUNS_DIR, MODEL_DIR))
+
+    def test_changed_run_directories_are_indexed(self):
+        run_dir = RUNS_DIR / 'dataset-1' / 'example_participant' / 'run-watched'
+        run_dir.mkdir(parents=True, exist_ok=True)
+        (run_dir / 'run.prototext').write_text(f'\nsoftwareId: "upload"\nrunId: "run-watched"\n'
+                                               f'inputDataset: "dataset-1-{now}-training"\ndownloadable: true\ndeleted: false\n')
+
+        actual = index_changes(tira_model, [('run', run_dir)])
+        self.assertEqual({'parsed': 1, 'removed': 0, 'reloaded': []}, actual)
+        self.assertTrue(modeldb.Run.objects.filter(run_id='run-watched').exists())
+
+        shutil.rmtree(run_dir)
+        actual = index_changes(tira_model, [('run', run_dir)])
+        self.assertEqual({'parsed': 0, 'removed': 1, 'reloaded': []}, actual)
+        self.assertFalse(modeldb.Run.objects.filter(run_id='run-watched').exists())
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
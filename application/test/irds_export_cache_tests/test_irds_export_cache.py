@@ -0,0 +1,140 @@
+from django.test import TestCase, override_settings
+from pathlib import Path
+import os
+import subprocess
+import tempfile
+from unittest.mock import patch
+from tira.irds_export_cache import IrdsExportCache, export_key
+from tira.ir_datasets_loader import run_irds_command
+
+IMPORT_COMMAND = '/irds_cli.sh --skip_qrels true --ir_datasets_id cranfield --output_dataset_path $outputDir'
+
+
+class TestIrdsExportCache(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp_dir.name)
+        self.cache = IrdsExportCache(self.directory / 'cache')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def export(self, name, files):
+        ret = self.directory / name
+        for file_name, content in files.items():
+            (ret / file_name).parent.mkdir(parents=True, exist_ok=True)
+            (ret / file_name).write_text(content)
+        return ret
+
+    def test_key_covers_dataset_loader_flags_and_allowlist_content(self):
+        allowlist = self.directory / 'allowlist.txt'
+        allowlist.write_text('doc-1\n')
+        command = f'{IMPORT_COMMAND} --allowlist_path_ids {allowlist}'
+        key, fields = export_key('image:0.0.1', command)
+
+        self.assertEqual('cranfield', fields['ir_datasets_id'])
+        self.assertEqual('true', fields['include_original'])
+        self.assertTrue(fields['allowlist'].startswith('sha256:'))
+        self.assertEqual(key, export_key('image:0.0.1', command.replace('--skip_qrels true ', '') + ' --skip_qrels true')[0])
+        self.assertEqual(key, export_key('image:0.0.1', command + ' --include_original True')[0])
+
+        self.assertNotEqual(key, export_key('image:0.0.2', command)[0])
+        self.assertNotEqual(key, export_key('image:0.0.1', command + ' --include_original false')[0])
+        self.assertNotEqual(key, export_key('image:0.0.1', command.replace('cranfield', 'vaswani'))[0])
+        self.assertNotEqual(key, export_key('image:0.0.1', IMPORT_COMMAND.replace('--output_dataset_path', '--output_dataset_truth_path'))[0])
+        allowlist.write_text('doc-2\n')
+        self.assertNotEqual(key, export_key('image:0.0.1', command)[0])
+
+    def test_exports_are_linked_into_new_datasets(self):
+        key, fields = export_key('image:0.0.1', IMPORT_COMMAND)
+        self.assertIsNone(self.cache.link_into(key, self.directory / 'task-2'))
+
+        self.cache.add(key, fields, self.export('task-1', {'documents.jsonl': 'docs', 'sub/queries.jsonl': 'queries'}))
+        entry = self.cache.link_into(key, self.directory / 'task-2')
+
+        self.assertEqual('cranfield', entry['ir_datasets_id'])
+        self.assertEqual('docs', (self.directory / 'task-2' / 'documents.jsonl').read_text())
+        self.assertEqual('queries', (self.directory / 'task-2' / 'sub' / 'queries.jsonl').read_text())
+        self.assertEqual(1, os.stat(self.directory / 'task-1' / 'documents.jsonl').st_nlink)
+        self.assertTrue(os.stat(self.directory / 'task-1' / 'documents.jsonl').st_mode & 0o200)
+        self.assertNotEqual(os.stat(self.directory / 'task-1' / 'documents.jsonl').st_ino,
+                            os.stat(self.directory / 'task-2' / 'documents.jsonl').st_ino)
+
+        # Existing files are a miss (the export runs instead) and are not removed
+        self.assertIsNone(self.cache.link_into(key, self.directory / 'task-2'))
+        self.assertEqual('docs', (self.directory / 'task-2' / 'documents.jsonl').read_text())
+
+    def test_partially_linked_files_are_removed_on_errors(self):
+        key, fields = export_key('image:0.0.1', IMPORT_COMMAND)
+        self.cache.add(key, fields, self.export('task-1', {'documents.jsonl': 'docs', 'queries.jsonl': 'queries'}))
+        calls = []
+
+        def link_or_fail(source, target):
+            calls.append(target)
+            if len(calls) > 1:
+                raise FileNotFoundError(f'The blob {source} was evicted.')
+            os.link(source, target)
+
+        with patch('tira.irds_export_cache.link_file', link_or_fail):
+            self.assertIsNone(self.cache.link_into(key, self.directory / 'task-2'))
+
+        self.assertEqual(2, len(calls))
+        self.assertEqual([], [i for i in (self.directory / 'task-2').rglob('*') if i.is_file()])
+
+    def test_modified_blobs_are_not_linked(self):
+        key, fields = export_key('image:0.0.1', IMPORT_COMMAND)
+        entry = self.cache.add(key, fields, self.export('task-1', {'documents.jsonl': 'docs'}))
+        blob = self.cache.blobs / entry['files'][0][1]
+        blob.chmod(0o644)
+        blob.write_text('modified docs')
+
+        self.assertIsNone(self.cache.link_into(key, self.directory / 'task-2'))
+        self.assertFalse((self.directory / 'task-2' / 'documents.jsonl').exists())
+
+    def test_identical_files_are_stored_once(self):
+        for i in range(3):
+            key, fields = export_key(f'image:0.0.{i}', IMPORT_COMMAND)
+            self.cache.add(key, fields, self.export(f'task-{i}', {'documents.jsonl': 'docs', 'qrels.txt': f'{i % 2}'}))
+
+        self.assertEqual(3, len(self.cache.index()))
+        self.assertEqual(3, len(list(self.cache.blobs.iterdir())))
+        self.assertEqual(len('docs') + 2, self.cache.size())
+
+    def test_evict_least_recently_used_exports(self):
+        keys = []
+        for i in range(3):
+            key, fields = export_key(f'image:0.0.{i}', IMPORT_COMMAND)
+            self.cache.add(key, fields, self.export(f'task-{i}', {'documents.jsonl': f'documents {i}', 'qrels': 'a'}))
+            os.utime(self.cache.entries / f'{key}.json', (1000 + i, 1000 + i))
+            keys += [key]
+        self.cache.link_into(keys[0], self.directory / 'task-3')
+
+        self.assertEqual([keys[1]], self.cache.evict(max_bytes=2 * len('documents 0') + 1))
+        self.assertEqual([keys[0], keys[2]], [i['key'] for i in self.cache.index()])
+        self.assertEqual(2 * len('documents 0') + 1, self.cache.size())
+        self.assertEqual('documents 1', (self.directory / 'task-1' / 'documents.jsonl').read_text())
+
+        self.assertEqual([keys[2]], self.cache.evict(max_age_seconds=60))
+        self.assertIsNotNone(self.cache.link_into(keys[0], self.directory / 'task-4'))
+
+    def test_run_irds_command_links_cached_exports(self):
+        key, fields = export_key('image:0.0.1', IMPORT_COMMAND)
+        self.cache.add(key, fields, self.export('task-1', {'documents.jsonl': 'docs'}))
+
+        with override_settings(IRDS_EXPORT_CACHE_DIR=self.cache.directory):
+            ret = run_irds_command('task-2', 'dataset-2', 'image:0.0.1', IMPORT_COMMAND, self.directory / 'task-2')
+
+        self.assertIn(f'Linked the cached export {key}', ret)
+        self.assertEqual('docs', (self.directory / 'task-2' / 'documents.jsonl').read_text())
+
+    def test_failures_of_the_cache_do_not_fail_the_export(self):
+        export = subprocess.CompletedProcess(args=[], returncode=0, stdout='exported', stderr='')
+
+        with override_settings(IRDS_EXPORT_CACHE_DIR=self.cache.directory), \
+                patch('subprocess.run', return_value=export), \
+                patch.object(IrdsExportCache, 'add', side_effect=OSError('No space left on device')), \
+                self.assertLogs('tira', level='WARNING') as logs:
+            ret = run_irds_command('task-2', 'dataset-2', 'image:0.0.1', IMPORT_COMMAND, self.directory / 'task-2')
+
+        self.assertIn('exported', ret)
+        self.assertIn('No space left on device', logs.output[0])
@@ -0,0 +1,48 @@
+"""
+Benchmark of the construction of rerank files (rerank.jsonl.gz) for runs with 1000 documents per query, row by row
+with construct_rerank_row (as before) and with the columnar builder of load_dataset_for_rerank.
+
+Usage (from application/test): PYTHONPATH=../src:. python3 irds_loader_tests/benchmark_rerank.py [queries ...]
+"""
+from pathlib import Path
+import gzip
+import random
+import sys
+import tempfile
+import time
+from tira.ir_datasets_loader import IrDatasetsLoader, write_gzip_members
+from irds_loader_tests.fake_dataset import FakeDataset
+
+
+def row_by_row(loader, dataset, queries, run_file, output):
+    run = loader.load_run_file(run_file)
+    docs = loader.get_docs_by_ids(dataset, list(set([str(i['docno']) for i in run])))
+    with gzip.open(output, 'wb') as file:
+        for i in run:
+            line = loader.construct_rerank_row(docs, queries, i, True)
+            if line:
+                file.write((line + '\n').encode('utf-8'))
+
+
+def columnar(loader, dataset, queries, run_file, output):
+    with output.open('wb') as file:
+        write_gzip_members(loader.yield_rerank_lines(dataset, queries, loader.load_run(run_file), True), file)
+
+
+if __name__ == '__main__':
+    for num_queries in [int(i) for i in sys.argv[1:]] or [10, 50]:
+        dataset = FakeDataset([f'doc-{i}' for i in range(20000)], [str(i) for i in range(num_queries)])
+        queries = {i.query_id: i for i in dataset.queries}
+        loader = IrDatasetsLoader()
+
+        with tempfile.TemporaryDirectory() as directory:
+            run_file, rand = Path(directory) / 'run.txt', random.Random(0)
+            run_file.write_text(''.join(f'{q} Q0 doc-{d} 0 {rand.random()} bm25\n' for q in range(num_queries)
+                                        for d in rand.sample(range(20000), 1000)))
+
+            for name, build in [('row by row', row_by_row), ('columnar', columnar)]:
+                start = time.perf_counter()
+                build(loader, dataset, queries, run_file, Path(directory) / f'{name}.jsonl.gz')
+                seconds = time.perf_counter() - start
+                print(f'{num_queries:>4} queries x 1000 docs, {name:>10}: {seconds:8.3f} s '
+                      f'({num_queries * 1000 / seconds:9.1f} rows/s)')
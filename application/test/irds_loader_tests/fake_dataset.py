@@ -0,0 +1,49 @@
+from collections import namedtuple
+
+Doc = namedtuple('Doc', ['doc_id', 'title', 'body'])
+Query = namedtuple('Query', ['query_id', 'title', 'description'])
+Qrel = namedtuple('Qrel', ['query_id', 'doc_id', 'relevance', 'iteration'])
+
+
+class FakeDoc(Doc):
+    def default_text(self):
+        return f'{self.title} {self.body}'
+
+
+class FakeQuery(Query):
+    def default_text(self):
+        return self.title
+
+
+class FakeDataset(object):
+    """ A dataset with the interface of ir_datasets that counts how often it is iterated. """
+
+    def __init__(self, doc_ids, query_ids=('1', '2'), sliceable=True):
+        self.sliceable = sliceable
+        self.docs = [FakeDoc(str(i), f'title {i}', f'body {i}') for i in doc_ids]
+        self.queries = [FakeQuery(str(i), f'query {i}', f'description of {i}') for i in query_ids]
+        self.qrels = [Qrel(str(i), self.docs[0].doc_id, 1, '0') for i in query_ids]
+        self.iterations = {'docs': 0, 'queries': 0, 'qrels': 0}
+
+    def docs_count(self):
+        return len(self.docs)
+
+    def docs_iter(self):
+        self.iterations['docs'] += 1
+        return list(self.docs) if self.sliceable else iter(self.docs)
+
+    def docs_store(self):
+        return self
+
+    def get_many_iter(self, doc_ids):
+        self.iterations['get_many_iter'] = self.iterations.get('get_many_iter', 0) + 1
+        doc_ids = set(doc_ids)
+        return (i for i in self.docs if i.doc_id in doc_ids)
+
+    def queries_iter(self):
+        self.iterations['queries'] += 1
+        return iter(self.queries)
+
+    def qrels_iter(self):
+        self.iterations['qrels'] += 1
+        return iter(self.qrels)
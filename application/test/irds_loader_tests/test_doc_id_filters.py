@@ -0,0 +1,86 @@
+from django.test import TestCase
+from pathlib import Path
+import random
+import tempfile
+from tira.doc_id_filters import BloomFilter, DuplicateIdFilter, SortedIdFile, SpilledIdSet, open_allowlist, \
+    sort_id_file
+
+
+class TestDocIdFilters(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def id_file(self, ids, name='ids.txt'):
+        ret = self.directory / name
+        ret.write_text(''.join(f'{i}\n' for i in ids))
+        return ret
+
+    def test_sorted_id_file_finds_exactly_the_contained_ids(self):
+        ids = sorted({f'clueweb12-{random.Random(i).randint(0, 10 ** 6):07d}' for i in range(1000)} | {'ü-id'})
+        id_file = SortedIdFile(self.id_file(ids))
+
+        for i in ids:
+            self.assertIn(i, id_file)
+        for i in ['', 'a', 'clueweb12-', 'clueweb12-99999999', 'ü', 'ü-id-2', 'zzz']:
+            self.assertNotIn(i, id_file)
+        id_file.close()
+
+    def test_sorted_id_file_without_trailing_newline_and_empty_file(self):
+        path = self.directory / 'ids.txt'
+        path.write_text('a\nb\nc')
+        self.assertTrue(all(i in SortedIdFile(path) for i in ['a', 'b', 'c']))
+
+        self.assertNotIn('a', SortedIdFile(self.id_file([])))
+
+    def test_unsorted_allowlist_is_sorted(self):
+        ids = [str(i) for i in random.Random(1).sample(range(10000), 500)]
+        sorted_ids = sort_id_file(self.id_file(ids), self.directory / 'sorted.ids', buffer_ids=64)
+
+        self.assertEqual(sorted(set(ids)), [i.decode() for i in SortedIdFile(sorted_ids)])
+
+        allowlist = open_allowlist(self.id_file(ids + ids[:10], 'allowlist.txt'), self.directory)
+        self.assertTrue(all(i in allowlist for i in ids))
+        self.assertNotIn('10001', allowlist)
+
+    def test_spilled_id_set_merges_runs_of_the_same_size(self):
+        ids = SpilledIdSet(self.directory, buffer_ids=10, merge_runs=2)
+        for i in range(75):
+            ids.add(str(i))
+
+        self.assertEqual([2, 1, 0], [level for level, _ in ids.runs])
+        self.assertEqual(3, len(list(self.directory.glob('*.ids'))))
+        self.assertTrue(all(str(i) in ids for i in range(75)))
+        self.assertNotIn('75', ids)
+
+        (self.directory / 'runs').mkdir()
+        ids = SpilledIdSet(self.directory / 'runs', buffer_ids=10, merge_runs=3)
+        for i in range(0, 75, 5):
+            ids.update([str(j) for j in range(i, i + 5)])
+        self.assertEqual([1, 1, 0], [level for level, _ in ids.runs])
+
+    def test_bloom_filter_has_no_false_negatives_and_few_false_positives(self):
+        bloom_filter = BloomFilter(10000, 0.01)
+        self.assertLess(sum(bloom_filter.add_many([f'doc-{i}' for i in range(10000)])), 300)
+
+        self.assertIn('doc-1', bloom_filter)
+        self.assertTrue(all(bloom_filter.contains_many([f'doc-{i}' for i in range(10000)])))
+        self.assertTrue(all(bloom_filter.add_many([f'doc-{i}' for i in range(10000)])))
+        self.assertLess(sum(bloom_filter.contains_many([f'other-{i}' for i in range(10000)])), 300)
+
+    def test_duplicate_filter_is_exact_even_if_the_bloom_filter_is_too_small(self):
+        doc_ids = [str(i) for i in random.Random(2).choices(range(3000), k=5000)]
+        duplicates = DuplicateIdFilter(self.directory, expected_ids=100, buffer_ids=256)
+
+        seen, expected = set(), []
+        for i in doc_ids:
+            expected += [i in seen]
+            seen.add(i)
+
+        self.assertEqual(expected[:100], [duplicates.seen_before(i) for i in doc_ids[:100]])
+        self.assertEqual(expected[100:], duplicates.seen_before_many(doc_ids[100:]))
+        self.assertGreater(duplicates.exact_lookups, 0)
+        duplicates.close()
@@ -0,0 +1,116 @@
+from django.test import TestCase
+from pathlib import Path
+import json
+import tempfile
+from tira.docstore import Docstore, DocstoreWriter
+from .fake_dataset import FakeDataset
+from .test_ir_datasets_loader import FakeDatasetsLoader
+
+
+class TestDocstore(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, docs, **kwargs):
+        with DocstoreWriter(self.directory / 'documents.docstore', **kwargs) as docstore:
+            for docno, text in docs:
+                docstore.add(docno, json.dumps({'docno': docno, 'text': text}))
+
+        return Docstore(self.directory / 'documents.docstore')
+
+    def test_all_documents_can_be_looked_up(self):
+        docs = [(f'doc-{i}', 'text ' * (i % 13)) for i in range(1000)]
+        docstore = self.write(docs, block_bytes=256)
+
+        self.assertEqual(1000, len(docstore))
+        self.assertGreater(docstore.num_blocks, 10)
+        for docno, text in reversed(docs):
+            self.assertEqual({'docno': docno, 'text': text}, docstore.get(docno))
+        docstore.close()
+
+    def test_index_is_built_in_chunks(self):
+        docs = [(f'doc-{i}', 'text ' * (i % 13)) for i in range(1000)]
+        self.write(docs, block_bytes=256).close()
+        expected = (self.directory / 'documents.docstore').read_bytes()
+        (self.directory / 'documents.docstore').unlink()
+        docstore = self.write(docs, block_bytes=256, index_chunk=7)
+
+        self.assertEqual(expected, (self.directory / 'documents.docstore').read_bytes())
+        for docno, text in docs:
+            self.assertEqual({'docno': docno, 'text': text}, docstore.get(docno))
+        docstore.close()
+
+    def test_missing_documents(self):
+        docstore = self.write([('a', 'text of a'), ('b', 'text of b')])
+
+        self.assertIsNone(docstore.get('c'))
+        self.assertNotIn('c', docstore)
+        self.assertIn('a', docstore)
+        docstore.close()
+
+    def test_unicode_docnos_and_integer_lookups(self):
+        docstore = self.write([('dökümän', 'tëxt'), ('1', 'one')])
+
+        self.assertEqual('tëxt', docstore.get('dökümän')['text'])
+        self.assertEqual('one', docstore.get(1)['text'])
+        docstore.close()
+
+    def test_empty_docstore(self):
+        docstore = self.write([])
+
+        self.assertEqual(0, len(docstore))
+        self.assertIsNone(docstore.get('a'))
+        docstore.close()
+
+    def test_existing_docstore_is_not_overwritten(self):
+        self.write([('a', 'text')]).close()
+
+        with self.assertRaises(RuntimeError):
+            DocstoreWriter(self.directory / 'documents.docstore')
+
+    def test_docstore_is_removed_on_errors(self):
+        with self.assertRaises(ValueError):
+            with DocstoreWriter(self.directory / 'documents.docstore') as docstore:
+                docstore.add('a', 'text')
+                raise ValueError('Failed export.')
+
+        self.assertEqual([], list(self.directory.iterdir()))
+
+
+class TestDocstoreExport(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def assertDocstoreHasTheDocuments(self, output):
+        lines = (output / 'documents.jsonl').read_text().splitlines()
+        docstore = Docstore(output / 'documents.docstore')
+
+        self.assertEqual(len(lines), len(docstore))
+        for line in lines:
+            self.assertEqual(line, docstore.get_line(json.loads(line)['docno']))
+        docstore.close()
+
+    def test_sequential_and_sharded_exports_write_the_docstore(self):
+        doc_ids = [str(i % 37) for i in range(100)] + ['x', '5', 'y']
+
+        for i, kwargs in enumerate([{}, {'workers': 3, 'shard_size': 7}]):
+            output = self.directory / f'output-{i}'
+            FakeDatasetsLoader(FakeDataset(doc_ids)).load_dataset_for_fullrank('fake', output, None, skip_qrels=True,
+                                                                               docstore=True, **kwargs)
+
+            self.assertEqual(['documents.docstore', 'documents.jsonl', 'metadata.json', 'queries.jsonl', 'queries.xml'],
+                             sorted(i.name for i in output.iterdir()))
+            self.assertDocstoreHasTheDocuments(output)
+
+    def test_no_docstore_by_default(self):
+        FakeDatasetsLoader(FakeDataset(['a'])).load_dataset_for_fullrank('fake', self.directory, None, skip_qrels=True)
+
+        self.assertFalse((self.directory / 'documents.docstore').exists())
@@ -0,0 +1,207 @@
+from django.test import TestCase
+from pathlib import Path
+import gzip
+import json
+import tempfile
+from unittest.mock import patch
+from tira.docstore import Docstore
+from tira.ir_datasets_loader import IrDatasetsLoader, write_gzip_members, read_shard_ids
+from .fake_dataset import FakeDataset
+
+
+class FakeDatasetsLoader(IrDatasetsLoader):
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def load_irds(self, ir_datasets_id):
+        return self.dataset
+
+
+class TestIrDatasetsLoader(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def doc_ids(self, path):
+        return [json.loads(i)['docno'] for i in path.read_text().splitlines()]
+
+    def test_duplicate_documents_are_skipped(self):
+        dataset = FakeDataset(['a', 'b', 'a', 'c', 'b', 'd'])
+        docs = FakeDatasetsLoader(dataset).yield_docs(dataset, False, True, None, tmp_dir=self.directory)
+
+        self.assertEqual(['a', 'b', 'c', 'd'], [json.loads(i)['docno'] for i in docs])
+        self.assertEqual([], list(self.directory.iterdir()))
+
+    def test_duplicate_documents_are_kept_without_skip_duplicate_ids(self):
+        dataset = FakeDataset(['a', 'b', 'a'])
+        docs = FakeDatasetsLoader(dataset).yield_docs(dataset, False, False, None)
+
+        self.assertEqual(['a', 'b', 'a'], [json.loads(i)['docno'] for i in docs])
+
+    def test_unsorted_allowlist(self):
+        dataset = FakeDataset(['a', 'b', 'c', 'd', 'c'])
+        allowlist = self.directory / 'allowlist.txt'
+        allowlist.write_text('d\nc\nx\n')
+        docs = FakeDatasetsLoader(dataset).yield_docs(dataset, False, True, allowlist)
+
+        self.assertEqual(['c', 'd'], [json.loads(i)['docno'] for i in docs])
+
+    def test_fullrank_export_iterates_the_dataset_once(self):
+        dataset = FakeDataset(['a', 'b', 'a'])
+        FakeDatasetsLoader(dataset).load_dataset_for_fullrank('fake', self.directory / 'input',
+                                                              self.directory / 'truth', include_original=True)
+
+        self.assertEqual({'docs': 1, 'queries': 1, 'qrels': 1}, dataset.iterations)
+        self.assertEqual(['a', 'b'], self.doc_ids(self.directory / 'input' / 'documents.jsonl'))
+        self.assertEqual({'b', 'a'}, {json.loads(i)['original_document']['doc_id']
+                                      for i in (self.directory / 'input' / 'documents.jsonl').open()})
+        self.assertEqual(['1 0 a 1', '2 0 a 1'], (self.directory / 'truth' / 'qrels.txt').read_text().splitlines())
+
+        for directory in ['input', 'truth']:
+            queries = [json.loads(i) for i in (self.directory / directory / 'queries.jsonl').open()]
+            self.assertEqual(['1', '2'], [i['qid'] for i in queries])
+            self.assertEqual('description of 2', queries[1]['original_query']['description'])
+
+            xml = (self.directory / directory / 'queries.xml').read_text()
+            self.assertIn('<topics ir-datasets-id="fake">', xml)
+            self.assertEqual(2, xml.count('<topic number='))
+            self.assertEqual(2, xml.count('<original_query>'))
+
+    def test_existing_queries_are_not_overwritten(self):
+        dataset = FakeDataset(['a'])
+        (self.directory / 'truth').mkdir()
+        (self.directory / 'truth' / 'queries.xml').write_text('')
+
+        with self.assertRaises(RuntimeError):
+            FakeDatasetsLoader(dataset).load_dataset_for_fullrank('fake', None, self.directory / 'truth',
+                                                                  skip_qrels=True)
+
+
+class TestShardedDocumentExport(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def export(self, dataset, directory, **kwargs):
+        FakeDatasetsLoader(dataset).load_dataset_for_fullrank('fake', self.directory / directory, None,
+                                                              skip_qrels=True, **kwargs)
+        return self.directory / directory
+
+    def test_sharded_export_is_identical_to_the_sequential_export(self):
+        doc_ids = [str(i % 37) for i in range(100)] + ['x', '5', 'y']
+        allowlist = self.directory / 'allowlist.txt'
+        allowlist.write_text(''.join(f'{i}\n' for i in reversed(doc_ids[::3])))
+
+        for i, kwargs in enumerate([{}, {'allowlist_path_ids': allowlist}, {'skip_duplicate_ids': False}]):
+            sequential = self.export(FakeDataset(doc_ids), f'sequential-{i}', **kwargs)
+            sharded = self.export(FakeDataset(doc_ids), f'sharded-{i}', workers=3, shard_size=7, **kwargs)
+
+            self.assertEqual((sequential / 'documents.jsonl').read_text(), (sharded / 'documents.jsonl').read_text())
+            self.assertEqual(['documents.jsonl', 'metadata.json', 'queries.jsonl', 'queries.xml'],
+                             sorted(i.name for i in sharded.iterdir()))
+
+    def test_sharded_export_of_ids_with_line_boundaries(self):
+        doc_ids = ['a\rb', 'c\u2028d', 'e\x1cf', 'g\x0bh', 'i'] * 2
+
+        sequential = self.export(FakeDataset(doc_ids), 'sequential', docstore=True)
+        sharded = self.export(FakeDataset(doc_ids), 'sharded', workers=2, shard_size=2, docstore=True)
+
+        self.assertEqual((sequential / 'documents.jsonl').read_bytes(), (sharded / 'documents.jsonl').read_bytes())
+        docstore = Docstore(sharded / 'documents.docstore')
+        self.assertEqual(5, len(docstore))
+        for doc_id in doc_ids:
+            self.assertEqual(doc_id, docstore.get(doc_id)['docno'])
+        docstore.close()
+
+    def test_sharded_export_keeps_a_bounded_number_of_shards_on_disk(self):
+        shards_on_disk = []
+
+        def read_and_count_shards(shard):
+            shards_on_disk.append(len(list(shard.parent.glob('documents-*.jsonl.gz'))))
+            return read_shard_ids(shard)
+
+        with patch('tira.ir_datasets_loader.read_shard_ids', read_and_count_shards):
+            output = self.export(FakeDataset([str(i) for i in range(40)]), 'bounded', workers=2, shard_size=2)
+
+        self.assertEqual([str(i) for i in range(40)],
+                         [json.loads(i)['docno'] for i in (output / 'documents.jsonl').read_text().splitlines()])
+        self.assertEqual(20, len(shards_on_disk))
+        self.assertLessEqual(max(shards_on_disk), 5)
+
+    def test_sharded_export_with_manifest(self):
+        output = self.export(FakeDataset(['a', 'b', 'c', 'a', 'd']), 'manifest', workers=2, shard_size=3,
+                             shard_output='manifest')
+
+        manifest = json.loads((output / 'documents-shards.json').read_text())
+        self.assertEqual(4, manifest['documents'])
+        self.assertEqual([{'file': 'documents-00000.jsonl.gz', 'documents': 3},
+                          {'file': 'documents-00001.jsonl.gz', 'documents': 1}], manifest['shards'])
+
+        with gzip.open(output / 'documents-00001.jsonl.gz', 'rt') as shard:
+            self.assertEqual(['d'], [json.loads(i)['docno'] for i in shard])
+
+    def test_documents_that_can_not_be_sliced_are_exported_by_one_process(self):
+        output = self.export(FakeDataset(['a', 'b', 'a'], sliceable=False), 'unsliced', workers=2)
+
+        self.assertEqual(['a', 'b'], [json.loads(i)['docno'] for i in (output / 'documents.jsonl').open()])
+
+
+class TestRerankExport(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp_dir.name)
+        self.dataset = FakeDataset([f'doc-{i}' for i in range(30)], ['1', '2'])
+        self.queries = {i.query_id: i for i in self.dataset.queries}
+        scores = [1.5, 2.25, 0.1, 3.0, 1.5]
+        (self.directory / 'run.txt').write_text(''.join(f'{q} Q0 doc-{d} 0 {scores[d % 5]} bm25\n'
+                                                        for q in [2, 1] for d in range(0, 35, q)))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_rerank_lines_are_identical_to_construct_rerank_row(self):
+        loader = IrDatasetsLoader()
+        run = loader.load_run_file(self.directory)
+        docs = loader.get_docs_by_ids(self.dataset, [str(i['docno']) for i in run])
+
+        for include_original in [True, False]:
+            expected = [loader.construct_rerank_row(docs, self.queries, i, include_original) for i in run]
+            actual = loader.yield_rerank_lines(self.dataset, self.queries, loader.load_run(self.directory),
+                                               include_original, batch_size=4)
+
+            self.assertEqual([i for i in expected if i], list(actual))
+
+    def test_ranks_start_at_one_per_query(self):
+        run = IrDatasetsLoader().load_run(self.directory)
+
+        self.assertEqual([1, 2], run['qid'].unique().tolist())
+        self.assertEqual(list(range(1, 36)), run[run['qid'] == 1]['rank'].tolist())
+        self.assertEqual(list(range(1, 19)), run[run['qid'] == 2]['rank'].tolist())
+        self.assertEqual([3.0, 3.0, 3.0, 2.25], run[run['qid'] == 2]['score'].tolist()[:4])
+        self.assertEqual(['doc-8', 'doc-28', 'doc-18'], run[run['qid'] == 2]['docno'].tolist()[:3])
+
+    def test_rerank_file_is_gzip_compressed_in_multiple_members(self):
+        FakeDatasetsLoader(self.dataset).load_dataset_for_rerank('fake', self.directory / 'output', None, False,
+                                                                 self.directory / 'run.txt')
+
+        with gzip.open(self.directory / 'output' / 'rerank.jsonl.gz', 'rt') as rerank:
+            rows = [json.loads(i) for i in rerank]
+        self.assertEqual(30 + 15, len(rows))
+        self.assertEqual(('1', 'doc-8', 1), (rows[0]['qid'], rows[0]['docno'], rows[0]['rank']))
+
+        lines = [f'line {i}' for i in range(1000)]
+        with (self.directory / 'lines.gz').open('wb') as file:
+            write_gzip_members(iter(lines), file, threads=2, chunk_size=100)
+        with gzip.open(self.directory / 'lines.gz', 'rt') as file:
+            self.assertEqual(lines, file.read().splitlines())
+
+        with (self.directory / 'empty.gz').open('wb') as file:
+            write_gzip_members([], file)
+        with gzip.open(self.directory / 'empty.gz', 'rt') as file:
+            self.assertEqual('', file.read())
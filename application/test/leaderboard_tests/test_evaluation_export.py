@@ -0,0 +1,96 @@
+from django.test import TestCase
+from io import BytesIO
+import json
+import pyarrow
+import pyarrow.parquet
+from utils_for_testing import set_up_tira_environment, mock_request, method_for_url_pattern
+from api_access_matrix import ADMIN
+from tira.tira_model import model as tira_model
+from tira.evaluation_export import export_chunks
+import tira.model as modeldb
+import tira.data.data as dbops
+
+from datetime import datetime
+
+now = datetime.now().strftime("%Y%m%d")
+dataset_id = f'dataset-1-{now}-training'
+url = 'api/export/evaluations/<str:task_id>'
+export_evaluations = method_for_url_pattern(url)
+
+
+def add_evaluated_run(run_number, published=True):
+    input_run = modeldb.Run.objects.get(run_id='run-1')
+    dataset = modeldb.Dataset.objects.get(dataset_id=dataset_id)
+    run = modeldb.Run.objects.create(run_id=f'eval-{run_number}-evaluated-run-run-1', input_run=input_run,
+                                     input_dataset=dataset)
+    modeldb.Evaluation.objects.create(run=run, measure_key='ndcg', measure_value=str(run_number / 4))
+    modeldb.Evaluation.objects.create(run=run, measure_key='comment', measure_value=f'run {run_number}')
+    modeldb.Review.objects.create(run=run, published=published, blinded=False)
+    dbops.update_leaderboard_entries([run.run_id])
+
+
+def export(task_id='shared-task-1', **params):
+    request = mock_request(ADMIN, url)
+    request.GET = params
+    response = export_evaluations(request, task_id=task_id)
+
+    return response, b''.join(getattr(response, 'streaming_content', []))
+
+
+class TestEvaluationExport(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        set_up_tira_environment()
+
+    def setUp(self):
+        add_evaluated_run(1)
+        add_evaluated_run(2, published=False)
+
+    def test_evaluations_are_joined_with_the_submissions(self):
+        evaluations = list(tira_model.get_evaluations_for_export([dataset_id]))
+
+        self.assertEqual(2, len(evaluations))
+        self.assertEqual({'dataset': dataset_id, 'team': 'example_participant', 'run_id': 'run-1',
+                          'evaluation_run_id': 'eval-1-evaluated-run-run-1', 'software': 'upload', 'is_upload': True,
+                          'is_docker': False, 'published': True, 'blinded': False,
+                          'measures': {'ndcg': '0.25', 'comment': 'run 1'}}, evaluations[0])
+        self.assertFalse(evaluations[1]['published'])
+        self.assertEqual({'ndcg': True, 'comment': False},
+                         tira_model.get_evaluation_measures_for_export([dataset_id]))
+
+    def test_ndjson_export(self):
+        response, content = export()
+        rows = [json.loads(i) for i in content.decode('utf-8').splitlines()]
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('application/x-ndjson', response['Content-Type'])
+        self.assertEqual([0.25, 0.5], [i['ndcg'] for i in rows if i['dataset'] == dataset_id])
+        self.assertEqual(['run 1', 'run 2'], [i['comment'] for i in rows if i['dataset'] == dataset_id])
+        self.assertEqual({'shared-task-1'}, {i['task'] for i in rows})
+
+    def test_arrow_and_parquet_exports(self):
+        _, arrow = export(format='arrow', datasets=dataset_id)
+        _, parquet = export(format='parquet', datasets=dataset_id)
+
+        for table in [pyarrow.ipc.open_stream(arrow).read_all(), pyarrow.parquet.read_table(BytesIO(parquet))]:
+            self.assertEqual([0.25, 0.5], table.column('ndcg').to_pylist())
+            self.assertEqual(['run 1', 'run 2'], table.column('comment').to_pylist())
+            self.assertEqual([True, False], table.column('published').to_pylist())
+            self.assertEqual(pyarrow.float64(), table.schema.field('ndcg').type)
+
+    def test_exports_are_written_batch_by_batch(self):
+        evaluations = list(tira_model.get_evaluations_for_export([dataset_id])) * 10
+        measures = {'ndcg': True, 'comment': False}
+
+        self.assertEqual(10, len(list(export_chunks('task', evaluations, measures, 'ndjson', batch_size=2))))
+        chunks = list(export_chunks('task', evaluations, measures, 'arrow', batch_size=2))
+        self.assertEqual(11, len(chunks))
+        self.assertEqual(20, pyarrow.ipc.open_stream(b''.join(chunks)).read_all().num_rows)
+
+    def test_invalid_requests(self):
+        self.assertEqual(400, export(format='csv')[0].status_code)
+        self.assertEqual(404, export(datasets='dataset-of-organizer')[0].status_code)
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
@@ -0,0 +1,64 @@
+from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from utils_for_testing import set_up_tira_environment
+from tira.tira_model import model as tira_model
+import tira.model as modeldb
+import tira.data.data as dbops
+
+from datetime import datetime
+
+#Used for some tests
+now = datetime.now().strftime("%Y%m%d")
+dataset_id = f'dataset-1-{now}-training'
+
+
+def add_evaluated_run(run_number, published=True):
+    input_run = modeldb.Run.objects.get(run_id='run-1')
+    dataset = modeldb.Dataset.objects.get(dataset_id=dataset_id)
+    run = modeldb.Run.objects.create(run_id=f'eval-{run_number}-evaluated-run-run-1', input_run=input_run,
+                                     input_dataset=dataset)
+    modeldb.Evaluation.objects.create(run=run, measure_key='ndcg', measure_value=str(run_number / 3))
+    modeldb.Evaluation.objects.create(run=run, measure_key='map', measure_value='0.1')
+    modeldb.Review.objects.create(run=run, published=published, blinded=False)
+    dbops.update_leaderboard_entries([run.run_id])
+
+
+def count_leaderboard_queries():
+    with CaptureQueriesContext(connection) as queries:
+        tira_model.get_evaluations_with_keys_by_dataset(dataset_id, include_unpublished=True)
+
+    return len(queries)
+
+
+class TestLeaderboardQueryCount(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        set_up_tira_environment()
+
+    def test_leaderboard_content(self):
+        add_evaluated_run(1)
+        add_evaluated_run(2, published=False)
+
+        keys, evaluations = tira_model.get_evaluations_with_keys_by_dataset(dataset_id, include_unpublished=True)
+
+        self.assertEqual(['map', 'ndcg'], sorted(keys))
+        self.assertEqual(2, len(evaluations))
+        self.assertEqual('example_participant', evaluations[0]['vm_id'])
+        self.assertEqual('run-1', evaluations[0]['run_id'])
+        self.assertEqual('Run Upload', evaluations[0]['input_software_name'])
+        self.assertEqual({'ndcg': 0.333, 'map': 0.1}, dict(zip(keys, evaluations[0]['measures'])))
+
+    def test_number_of_queries_does_not_grow_with_the_number_of_runs(self):
+        add_evaluated_run(1)
+        queries_for_one_run = count_leaderboard_queries()
+
+        for i in range(2, 21):
+            add_evaluated_run(i)
+
+        self.assertEqual(20, len(tira_model.get_evaluations_with_keys_by_dataset(dataset_id)[1]))
+        self.assertEqual(queries_for_one_run, count_leaderboard_queries())
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
@@ -0,0 +1,98 @@
+from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from utils_for_testing import set_up_tira_environment
+from tira.tira_model import model as tira_model
+import tira.model as modeldb
+import tira.data.data as dbops
+from pathlib import Path
+from unittest.mock import patch
+
+from datetime import datetime
+
+#Used for some tests
+now = datetime.now().strftime("%Y%m%d")
+dataset_id = f'dataset-1-{now}-training'
+
+
+def add_evaluated_run(run_id, published):
+    Path(f'tira-root/data/runs/dataset-1/example_participant/{run_id}').mkdir(parents=True, exist_ok=True)
+    run = modeldb.Run.objects.create(run_id=run_id, input_run=modeldb.Run.objects.get(run_id='run-1'),
+                                     input_dataset=modeldb.Dataset.objects.get(dataset_id=dataset_id))
+    modeldb.Evaluation.objects.create(run=run, measure_key='ndcg', measure_value='0.5')
+    modeldb.Review.objects.create(run=run, published=published, blinded=True)
+
+
+class TestMaterializedLeaderboard(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        set_up_tira_environment()
+
+    def test_unpublished_runs_are_hidden_until_the_review_is_published(self):
+        add_evaluated_run('eval-hidden', published=False)
+        dbops.update_leaderboard_entries(['eval-hidden'])
+
+        self.assertEqual([], tira_model.get_evaluations_with_keys_by_dataset(dataset_id)[1])
+        self.assertEqual(1, len(tira_model.get_evaluations_with_keys_by_dataset(dataset_id, True)[1]))
+
+        tira_model.update_review('dataset-1', 'example_participant', 'eval-hidden', published=True, blinded=False)
+        actual = tira_model.get_evaluations_with_keys_by_dataset(dataset_id)[1]
+
+        self.assertEqual(1, len(actual))
+        self.assertTrue(actual[0]['published'])
+        self.assertFalse(actual[0]['blinded'])
+
+    def test_entries_are_removed_with_deleted_runs(self):
+        add_evaluated_run('eval-to-delete', published=False)
+        modeldb.Review.objects.filter(run__run_id='eval-to-delete').update(no_errors=False)
+        dbops.update_leaderboard_entries(['eval-to-delete'])
+
+        self.assertTrue(tira_model.delete_run(dataset_id, 'example_participant', 'eval-to-delete'))
+        self.assertEqual([], tira_model.get_evaluations_with_keys_by_dataset(dataset_id, True)[1])
+
+    def test_rebuild_command_repairs_an_inconsistent_leaderboard(self):
+        add_evaluated_run('eval-not-materialized', published=True)
+
+        self.assertEqual(['Run eval-not-materialized: leaderboard entry is missing.'],
+                         dbops.leaderboard_inconsistencies())
+        with self.assertRaises(CommandError):
+            call_command('rebuild_leaderboard', verify_only=True)
+
+        call_command('rebuild_leaderboard')
+
+        self.assertEqual([], dbops.leaderboard_inconsistencies())
+        self.assertEqual(1, len(tira_model.get_evaluations_with_keys_by_dataset(dataset_id)[1]))
+
+    def test_entries_are_built_in_batches(self):
+        run_ids = [f'eval-batch-{i}' for i in range(5)]
+        for run_id in run_ids:
+            add_evaluated_run(run_id, published=True)
+
+        with patch.object(dbops, 'LEADERBOARD_BATCH_SIZE', 2):
+            dbops.update_leaderboard_entries(run_ids + ['run-1'])
+            self.assertEqual([], dbops.leaderboard_inconsistencies())
+
+            dbops.rebuild_leaderboard()
+
+        self.assertEqual([], dbops.leaderboard_inconsistencies())
+        self.assertEqual(5, modeldb.LeaderboardEntry.objects.filter(run__run_id__in=run_ids).count())
+
+    def test_entries_show_the_new_name_of_renamed_docker_software(self):
+        software = modeldb.DockerSoftware.objects.create(vm=modeldb.VirtualMachine.objects.get(vm_id='example_participant'),
+                                                         display_name='old-name')
+        modeldb.Run.objects.create(run_id='docker-run', docker_software=software,
+                                   input_dataset=modeldb.Dataset.objects.get(dataset_id=dataset_id))
+        run = modeldb.Run.objects.create(run_id='eval-docker-run', input_run=modeldb.Run.objects.get(run_id='docker-run'),
+                                         input_dataset=modeldb.Dataset.objects.get(dataset_id=dataset_id))
+        modeldb.Evaluation.objects.create(run=run, measure_key='ndcg', measure_value='0.5')
+        dbops.update_leaderboard_entries(['eval-docker-run'])
+        self.assertEqual('old-name', modeldb.LeaderboardEntry.objects.get(run__run_id='eval-docker-run').input_software_name)
+
+        tira_model.update_docker_software_metadata(software.docker_software_id, 'new-name', '', '', False, False)
+
+        self.assertEqual('new-name', modeldb.LeaderboardEntry.objects.get(run__run_id='eval-docker-run').input_software_name)
+        self.assertEqual([], dbops.leaderboard_inconsistencies())
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
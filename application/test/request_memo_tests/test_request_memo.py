@@ -0,0 +1,66 @@
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.http import JsonResponse
+from utils_for_testing import set_up_tira_environment
+from tira.request_memo import request_scope, RequestMemoMiddleware
+import tira.tira_model as model
+
+
+class TestRequestMemo(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        set_up_tira_environment()
+
+    def test_entities_are_loaded_at_most_once_per_request(self):
+        with request_scope() as memo:
+            expected = model.get_dataset('dataset-1', include_stats=False)
+            with CaptureQueriesContext(connection) as ctx:
+                actual = model.get_dataset('dataset-1', include_stats=False)
+                model.get_dataset(dataset_id='dataset-1', include_stats=False)
+
+        self.assertEqual(expected, actual)
+        self.assertEqual(0, len(ctx.captured_queries))
+        self.assertEqual((3, 2), (memo.calls, memo.hits))
+
+    def test_callers_can_modify_memoized_results(self):
+        with request_scope():
+            model.get_task('shared-task-1')['task_name'] = 'modified'
+
+            self.assertEqual('task_name', model.get_task('shared-task-1')['task_name'])
+
+    def test_writes_clear_the_memo(self):
+        with request_scope() as memo:
+            model.get_run_review('dataset-1', 'example_participant', 'run-1')
+            model.update_review('dataset-1', 'example_participant', 'run-1', published=True)
+
+            self.assertTrue(model.get_run_review('dataset-1', 'example_participant', 'run-1')['published'])
+            self.assertEqual(0, memo.hits)
+
+    def test_reads_outside_of_requests_are_not_memoized(self):
+        model.get_dataset('dataset-1', include_stats=False)
+
+        with CaptureQueriesContext(connection) as ctx:
+            model.get_dataset('dataset-1', include_stats=False)
+
+        self.assertGreater(len(ctx.captured_queries), 0)
+
+    @override_settings(DEBUG=True)
+    def test_middleware_reports_model_calls_in_debug_headers(self):
+        def view(request):
+            return JsonResponse({'vm': model.get_vm('example_participant')['vm_id'],
+                                 'exists': model.vm_exists('example_participant') and model.vm_exists('example_participant')})
+
+        response = RequestMemoMiddleware(view)(None)
+
+        self.assertEqual('3', response['X-Tira-Model-Calls'])
+        self.assertEqual('1', response['X-Tira-Model-Cache-Hits'])
+
+    def test_middleware_omits_debug_headers_in_production(self):
+        response = RequestMemoMiddleware(lambda request: JsonResponse({'vm': model.vm_exists('example_participant')}))(None)
+
+        self.assertFalse(response.has_header('X-Tira-Model-Calls'))
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
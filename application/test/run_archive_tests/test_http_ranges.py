@@ -0,0 +1,74 @@
+from django.test import TestCase, RequestFactory
+from tira.http_ranges import byte_range, download_response, etag_matches
+
+CONTENT = bytes(range(100))
+ETAG = '"abc"'
+
+
+def download(**headers):
+    request = RequestFactory().get('/download.zip', headers=headers)
+    response = download_response(request, ETAG, len(CONTENT), lambda start, end: [CONTENT[start:end]],
+                                 'application/zip', 'run.zip')
+    return response, b''.join(getattr(response, 'streaming_content', []))
+
+
+class TestHttpRanges(TestCase):
+    def test_byte_ranges(self):
+        self.assertEqual((0, 100), byte_range('bytes=0-', 100))
+        self.assertEqual((10, 21), byte_range('bytes=10-20', 100))
+        self.assertEqual((10, 100), byte_range('bytes=10-1000', 100))
+        self.assertEqual((90, 100), byte_range('bytes=-10', 100))
+        self.assertEqual((0, 100), byte_range('bytes=-1000', 100))
+
+    def test_headers_that_are_no_single_byte_range_are_ignored(self):
+        for header in [None, '', 'bytes=-', 'bytes=0-1,5-6', 'items=0-1', 'bytes=20-10']:
+            self.assertIsNone(byte_range(header, 100), header)
+
+    def test_unsatisfiable_ranges(self):
+        for header in ['bytes=100-', 'bytes=-0']:
+            self.assertRaises(ValueError, lambda: byte_range(header, 100))
+
+    def test_etags_match_with_weak_comparison(self):
+        self.assertTrue(etag_matches('"abc"', ETAG))
+        self.assertTrue(etag_matches('"x", W/"abc"', ETAG))
+        self.assertTrue(etag_matches('*', ETAG))
+        self.assertFalse(etag_matches('"abcd"', ETAG))
+        self.assertFalse(etag_matches(None, ETAG))
+
+    def test_full_download(self):
+        response, content = download()
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(CONTENT, content)
+        self.assertEqual('100', response['Content-Length'])
+        self.assertEqual(ETAG, response['ETag'])
+        self.assertEqual('bytes', response['Accept-Ranges'])
+        self.assertEqual('attachment; filename="run.zip"', response['Content-Disposition'])
+
+    def test_not_modified(self):
+        response, content = download(if_none_match=ETAG)
+
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(ETAG, response['ETag'])
+
+    def test_partial_download(self):
+        response, content = download(range='bytes=90-')
+
+        self.assertEqual(206, response.status_code)
+        self.assertEqual(CONTENT[90:], content)
+        self.assertEqual('10', response['Content-Length'])
+        self.assertEqual('bytes 90-99/100', response['Content-Range'])
+
+    def test_range_is_ignored_if_the_representation_changed(self):
+        response, content = download(range='bytes=90-', if_range='"old"')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(CONTENT, content)
+
+        response, content = download(range='bytes=90-', if_range=ETAG)
+        self.assertEqual(206, response.status_code)
+
+    def test_range_not_satisfiable(self):
+        response, _ = download(range='bytes=100-')
+
+        self.assertEqual(416, response.status_code)
+        self.assertEqual('bytes */100', response['Content-Range'])
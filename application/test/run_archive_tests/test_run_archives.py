@@ -0,0 +1,95 @@
+from django.test import TestCase
+from io import BytesIO
+from unittest import mock
+from pathlib import Path
+import os
+import tempfile
+import zipfile
+from tira.run_archives import cached_zip, evict, manifest_hash, stream_zip, stream_zip_range, zip_size
+
+
+class TestRunArchives(TestCase):
+    def run_dir(self, files):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        ret = Path(tmp.name) / 'run-1'
+        for name, content in files.items():
+            (ret / name).parent.mkdir(parents=True, exist_ok=True)
+            (ret / name).write_bytes(content)
+
+        return ret
+
+    def cache_dir(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        return Path(tmp.name)
+
+    def test_streamed_zip_contains_all_files_relative_to_the_parent(self):
+        run_dir = self.run_dir({'output/run.txt': b'q1 Q0 d1 1 10 tag\n' * 1000, 'stdout.txt': b'', 'x/y/z.bin': b'\0'})
+        zipped = zipfile.ZipFile(BytesIO(b''.join(stream_zip(run_dir, chunk_size=1000))))
+
+        self.assertIsNone(zipped.testzip())
+        self.assertEqual(['run-1/output/', 'run-1/output/run.txt', 'run-1/stdout.txt', 'run-1/x/', 'run-1/x/y/',
+                          'run-1/x/y/z.bin'], zipped.namelist())
+        self.assertEqual(b'q1 Q0 d1 1 10 tag\n' * 1000, zipped.read('run-1/output/run.txt'))
+        self.assertEqual(b'\0', zipped.read('run-1/x/y/z.bin'))
+
+    def test_streamed_zip_is_yielded_in_bounded_chunks(self):
+        run_dir = self.run_dir({'a.txt': os.urandom(50000), 'b.txt': os.urandom(50000)})
+        chunks = list(stream_zip(run_dir, chunk_size=1000))
+
+        self.assertGreater(len(chunks), 50)
+        self.assertLess(max(len(i) for i in chunks), 3000)
+
+    def test_zip_of_missing_directory_is_empty(self):
+        zipped = zipfile.ZipFile(BytesIO(b''.join(stream_zip(Path('/does-not-exist/run-1')))))
+
+        self.assertEqual([], zipped.namelist())
+
+    def test_size_of_zip_is_known_before_it_is_streamed(self):
+        run_dir = self.run_dir({'output/run.txt': os.urandom(3000), 'stdout.txt': b'', 'ümlaut/ä.txt': b'a'})
+
+        self.assertEqual(len(b''.join(stream_zip(run_dir))), zip_size(run_dir))
+        self.assertEqual(22, zip_size(Path('/does-not-exist/run-1')))
+
+    def test_size_of_zip64_archives(self):
+        run_dir = self.run_dir({f'{i}.txt': os.urandom(i * 100) for i in range(5)})
+
+        with mock.patch.multiple(zipfile, ZIP64_LIMIT=250, ZIP_FILECOUNT_LIMIT=3):
+            zipped = b''.join(stream_zip(run_dir))
+            self.assertEqual(len(zipped), zip_size(run_dir))
+            self.assertIsNone(zipfile.ZipFile(BytesIO(zipped)).testzip())
+
+    def test_ranges_of_streamed_zips(self):
+        run_dir = self.run_dir({'a.txt': os.urandom(5000), 'b.txt': os.urandom(5000)})
+        zipped = b''.join(stream_zip(run_dir))
+
+        for start, end in [(0, 10), (100, 7000), (9000, len(zipped)), (0, len(zipped))]:
+            self.assertEqual(zipped[start:end], b''.join(stream_zip_range(run_dir, start, end, chunk_size=333)))
+
+    def test_archives_are_cached_by_manifest_hash(self):
+        run_dir, cache_dir = self.run_dir({'output/run.txt': b'a'}), self.cache_dir()
+        archive = cached_zip(run_dir, cache_dir)
+
+        self.assertEqual(cache_dir / f'{manifest_hash(run_dir)}.zip', archive)
+        self.assertEqual(archive, cached_zip(run_dir, cache_dir))
+        self.assertEqual(b'a', zipfile.ZipFile(archive).read('run-1/output/run.txt'))
+
+        (run_dir / 'output' / 'run.txt').write_bytes(b'bb')
+        modified = cached_zip(run_dir, cache_dir)
+
+        self.assertNotEqual(archive, modified)
+        self.assertEqual(b'bb', zipfile.ZipFile(modified).read('run-1/output/run.txt'))
+
+    def test_cache_is_disabled_without_cache_dir(self):
+        self.assertIsNone(cached_zip(self.run_dir({'a.txt': b'a'}), ''))
+
+    def test_least_recently_used_archives_are_evicted(self):
+        cache_dir = self.cache_dir()
+        for i, name in enumerate(['old', 'middle', 'new']):
+            (cache_dir / f'{name}.zip').write_bytes(b'x' * 100)
+            os.utime(cache_dir / f'{name}.zip', (i, i))
+
+        evict(cache_dir, 250, keep=cache_dir / 'old.zip')
+
+        self.assertEqual(['new.zip', 'old.zip'], sorted(i.name for i in cache_dir.glob('*.zip')))
@@ -0,0 +1,51 @@
+from django.test import TestCase
+from datetime import datetime
+from pathlib import Path
+from utils_for_testing import method_for_url_pattern, mock_request, set_up_tira_environment
+from tira.tira_data import RUNS_DIR_PATH
+
+ADMIN = 'tira_reviewer'
+URL = 'api/run-log/<str:dataset_id>/<str:vm_id>/<str:run_id>/<str:log>'
+now = datetime.now().strftime("%Y%m%d")
+DATASET_ID = f'dataset-1-{now}-training'
+
+
+class TestRunLogEndpoint(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        set_up_tira_environment()
+        run_dir = Path(RUNS_DIR_PATH) / DATASET_ID / 'example_participant' / 'run-1'
+        run_dir.mkdir(parents=True, exist_ok=True)
+        (run_dir / 'stdout.txt').write_text('0123456789')
+
+    def get_log(self, **params):
+        request = mock_request(ADMIN, URL)
+        request.GET = params
+        return method_for_url_pattern(URL)(request, dataset_id=DATASET_ID, vm_id='example_participant',
+                                           run_id='run-1', log='stdout')
+
+    def test_pages_of_the_log_are_streamed(self):
+        response = self.get_log(offset='2', length='5')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(b'23456', b''.join(response.streaming_content))
+        self.assertEqual(('10', '2', '7'), (response['X-Tira-Log-Size'], response['X-Tira-Log-Offset'],
+                                            response['X-Tira-Log-Next-Offset']))
+
+    def test_negative_offsets_count_from_the_end(self):
+        response = self.get_log(offset='-3')
+
+        self.assertEqual(b'789', b''.join(response.streaming_content))
+        self.assertEqual('', response['X-Tira-Log-Next-Offset'])
+
+    def test_missing_logs_are_not_found(self):
+        request = mock_request(ADMIN, URL)
+        request.GET = {}
+        response = method_for_url_pattern(URL)(request, dataset_id=DATASET_ID, vm_id='example_participant',
+                                               run_id='run-1', log='stderr')
+
+        self.assertEqual(404, response.status_code)
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
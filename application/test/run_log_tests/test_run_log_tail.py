@@ -0,0 +1,48 @@
+from django.test import TestCase
+from pathlib import Path
+import tempfile
+from tira.tira_data import count_lines, read_log_tail, read_log_range, _get_log_tail
+
+
+class TestRunLogTail(TestCase):
+    def log(self, content):
+        f = tempfile.NamedTemporaryFile(suffix='.txt', delete=False)
+        f.write(content.encode('utf-8'))
+        f.close()
+        self.addCleanup(Path(f.name).unlink)
+        return Path(f.name)
+
+    def test_lines_are_counted_like_readlines(self):
+        for content in ['', 'a', 'a\n', 'a\nb', 'a\nb\n', '\n\n']:
+            self.assertEqual(len(self.log(content).open().readlines()), count_lines(self.log(content), chunk_size=1))
+
+    def test_tail_is_read_backwards_in_chunks(self):
+        content = ''.join(f'line {i}\n' for i in range(1000))
+        expected = ''.join(f'line {i}\n' for i in range(990, 1000))
+
+        for chunk_size in [1, 7, 100, 100000]:
+            self.assertEqual(expected, read_log_tail(self.log(content), lines=10, chunk_size=chunk_size))
+
+    def test_tail_of_short_files_and_files_without_trailing_newline(self):
+        self.assertEqual('a\nb', read_log_tail(self.log('a\nb'), lines=10))
+        self.assertEqual('b', read_log_tail(self.log('a\nb'), lines=1))
+        self.assertEqual('', read_log_tail(self.log(''), lines=1))
+
+    def test_tail_is_capped_at_max_bytes_without_incomplete_lines(self):
+        log = self.log('a' * 100 + '\nbbb\nccc\n')
+
+        self.assertEqual('bbb\nccc\n', read_log_tail(log, lines=None, max_bytes=20, chunk_size=3))
+        self.assertEqual('ccc\n', read_log_tail(log, lines=1, max_bytes=20))
+
+    def test_hidden_lines_of_progress_bars_with_carriage_returns(self):
+        log = self.log(''.join(f'{i}%|#\r{i}%|##\r{i}%|###\n' for i in range(30)))
+
+        self.assertIn('[20 more lines]\n', _get_log_tail(log, 10, False))
+        self.assertIn('[0 more lines]\n', _get_log_tail(log, 30, True))
+
+    def test_ranges_are_streamed_in_chunks(self):
+        log = self.log('0123456789')
+
+        self.assertEqual([b'23', b'45', b'6'], list(read_log_range(log, 2, 5, chunk_size=2)))
+        self.assertEqual([b'89'], list(read_log_range(log, 8, 100)))
+        self.assertEqual([], list(read_log_range(log, 10, 100)))
@@ -79,6 +79,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'tira.request_memo.RequestMemoMiddleware',
+    'tira.git_clients.GitClientMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'django_admin.urls'
@@ -235,15 +237,42 @@ def logger_config(log_dir: Path):
         }
     }
 
+# The size of the thread pools that refresh the data from the git hosters and the rate limit of requests to each host
+GIT_REFRESH_THREADS = custom_settings.get('git_refresh_threads', 8)
+GIT_REQUESTS_PER_SECOND_PER_HOST = custom_settings.get('git_requests_per_second_per_host', 20)
+# Requests to the git hosters that fail with 429 or 5xx are retried with jittered exponential backoff (in seconds)
+GIT_RETRIES = custom_settings.get('git_retries', 3)
+GIT_RETRY_BACKOFF = custom_settings.get('git_retry_backoff', 0.5)
+# The shared secret of GitLab webhooks (api/gitlab-webhook) that report pipeline states. Disabled if None.
+GITLAB_WEBHOOK_SECRET = custom_settings.get('gitlab_webhook_secret', None)
+
+# Zips of published runs are cached in this directory (disabled if None), at most the given bytes (no limit if None)
+RUN_ARCHIVE_CACHE_DIR = custom_settings.get('run_archive_cache_dir', None)
+RUN_ARCHIVE_CACHE_MAX_BYTES = custom_settings.get('run_archive_cache_max_bytes', None)
+
+# Exports of ir_datasets are cached in this directory to link them into new datasets (disabled if None)
+IRDS_EXPORT_CACHE_DIR = custom_settings.get('irds_export_cache_dir', TIRA_ROOT / "state" / "irds-export-cache")
+
 IR_MEASURES_IMAGE = custom_settings.get('IR_MEASURES_IMAGE', 'webis/tira-ir-measures-evaluator:0.0.1')
 IR_MEASURES_COMMAND = custom_settings.get('IR_MEASURES_COMMAND', 'echo "hello world"')
 
 # Caching
 CACHES = {
     'default': {
+        'BACKEND': 'tira.tiered_cache.TieredCache',
+        'TIMEOUT': 900, # 900 seconds (i.e., 15 minutes) as timeout, to use for the cache
+        'OPTIONS': {
+            'SHARED_CACHE': 'shared',
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 10,
+        }
+    },
+    'shared': {
+        # The entries of TieredCache are (refreshed_at, value) tuples, the prefix separates them from older raw values
+        'KEY_PREFIX': 'tiered',
         'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
         'LOCATION': 'tira_database_cache_table',
-        'TIMEOUT': 900, # 900 seconds (i.e., 15 minutes) as timeout, to use for the cache
+        'TIMEOUT': 900,
         'OPTIONS': {
             'MAX_ENTRIES': 100000
         }
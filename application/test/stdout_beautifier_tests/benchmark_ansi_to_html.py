@@ -0,0 +1,31 @@
+"""
+Microbenchmark of the ANSI-to-HTML rendering of run logs with 1 MB, 10 MB, and 100 MB.
+
+Usage (from application/test): PYTHONPATH=../src python3 stdout_beautifier_tests/benchmark_ansi_to_html.py [MB ...]
+"""
+import sys
+import time
+from tira.endpoints.stdout_beautifier import beautify_ansi_text
+
+LINES = [
+    '\x1b[32mINFO\x1b[0m 2023-01-01 12:00:00 Processed batch 12 of 100 (loss=0.1234)\n',
+    '\x1b[1;33mWARNING\x1b[0m the document \x1b[36mclueweb09-en0000-00-00000\x1b[0m has no title <title/>\n',
+    '  [\x1b[92mo\x1b[0m] The file run.jsonl is in JSONL format.\n',
+    '[0;32m--> 519[0;31m             [0;32mraise ConnectionError[0;34m(e[0;34m)\n',
+    'Downloading: 100%|##########| 1.2G/1.2G [00:12<00:00, 98.1MB/s]\r\n',
+    '\x1b[38;5;208mextended\x1b[0m \x1b[48;2;10;20;30mtrue color\x1b[0m plain text without any escape codes\n',
+]
+
+
+def log_of_size(megabytes):
+    line = ''.join(LINES)
+    return line * (megabytes * 1024 * 1024 // len(line))
+
+
+if __name__ == '__main__':
+    for megabytes in [int(i) for i in sys.argv[1:]] or [1, 10, 100]:
+        log = log_of_size(megabytes)
+        start = time.perf_counter()
+        html = beautify_ansi_text(log)
+        seconds = time.perf_counter() - start
+        print(f'{megabytes:>4} MB: {seconds:8.3f} s ({megabytes / seconds:6.1f} MB/s, {len(html) / 1024 / 1024:.1f} MB html)')
@@ -0,0 +1,39 @@
+from django.test import TestCase
+from pathlib import Path
+import json
+from tira.endpoints.stdout_beautifier import ansi_to_html, apply_sgr, beautify_ansi_text, DEFAULT_STYLE
+
+# Pairs of logs and the markup that aha 0.5.1 (followed by the extraction of the pre elements) produced for them
+GOLDEN_CORPUS = json.load((Path(__file__).parent / 'golden_corpus.json').open())
+
+
+class TestAnsiToHtml(TestCase):
+    def test_markup_is_identical_to_aha_on_golden_corpus(self):
+        for entry in GOLDEN_CORPUS:
+            self.assertEqual(entry['expected'], beautify_ansi_text(entry['input']), repr(entry['input']))
+
+    def test_escape_character_is_restored_but_not_doubled(self):
+        expected = '<pre>\n<span style="color:red;">a</span>b</pre>'
+
+        self.assertEqual(expected, beautify_ansi_text('[31ma[0mb'))
+        self.assertEqual(expected, beautify_ansi_text('\x1b[31ma\x1b[0mb'))
+
+    def test_html_is_escaped(self):
+        self.assertEqual('&lt;/pre&gt;&lt;script&gt;"&amp;', ansi_to_html('</pre><script>"&'))
+
+    def test_unterminated_escape_sequences_are_dropped(self):
+        self.assertEqual('<span style="color:red;">a</span>', ansi_to_html('\x1b[31ma\x1b[0'))
+        self.assertEqual('a', ansi_to_html('a\x1b'))
+        self.assertEqual('a', ansi_to_html('a\x1b]0;title'))
+
+    def test_inverted_extended_colors(self):
+        self.assertEqual('<span style="color:white;background-color:#878700;">a</span>',
+                         ansi_to_html('\x1b[38;5;100;7ma'))
+        self.assertEqual((0, 0, 0, 0, 0, 0, (2, '#010203'), -1), apply_sgr(DEFAULT_STYLE, False, '38;2;1;2;3')[0])
+
+    def test_reset(self):
+        style, negative = apply_sgr(DEFAULT_STYLE, False, '1;31;7')
+
+        self.assertTrue(negative)
+        self.assertEqual((DEFAULT_STYLE, False), apply_sgr(style, negative, '0'))
+        self.assertEqual((DEFAULT_STYLE, False), apply_sgr(style, negative, ''))
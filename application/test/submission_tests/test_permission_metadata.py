@@ -0,0 +1,79 @@
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.core.cache import cache
+from utils_for_testing import set_up_tira_environment
+import tira.tira_model as model
+import tira.model as modeldb
+import tira.data.data as dbops
+from tira.request_memo import request_scope
+from datetime import datetime
+
+#Used for some tests
+now = datetime.now().strftime("%Y%m%d")
+
+
+class TestPermissionMetadata(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        set_up_tira_environment()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_run_permission_metadata(self):
+        actual = model.get_run_permission_metadata('run-1')
+
+        self.assertEqual(f'dataset-1-{now}-training', actual['dataset_id'])
+        self.assertEqual('example_participant', actual['vm_id'])
+        self.assertFalse(actual['deleted'])
+        self.assertFalse(actual['published'])
+
+    def test_dataset_and_task_permission_metadata(self):
+        self.assertEqual({'task_id': 'task-of-organizer-1', 'organizer_id': 'EXAMPLE-ORGANIZER', 'is_confidential': False},
+                         model.get_dataset_permission_metadata(f'dataset-of-organizer-{now}-training'))
+        self.assertEqual({'organizer_id': 'organizer', 'require_registration': False},
+                         model.get_task_permission_metadata('shared-task-1'))
+
+    def test_non_existing_entities_have_no_permission_metadata(self):
+        self.assertIsNone(model.get_run_permission_metadata('run-does-not-exist'))
+        self.assertIsNone(model.get_dataset_permission_metadata('dataset-does-not-exist'))
+        self.assertIsNone(model.get_task_permission_metadata('task-does-not-exist'))
+
+    def test_permission_metadata_is_cached(self):
+        model.get_run_permission_metadata('run-1')
+
+        with CaptureQueriesContext(connection) as ctx:
+            model.get_run_permission_metadata('run-1')
+
+        # Only the shared cache is queried (the permission metadata bypasses the per-process cache)
+        self.assertTrue(all('tira_database_cache_table' in i['sql'] for i in ctx.captured_queries))
+
+        with request_scope():
+            model.get_run_permission_metadata('run-1')
+            with CaptureQueriesContext(connection) as ctx:
+                model.get_run_permission_metadata('run-1')
+
+        self.assertEqual(0, len(ctx.captured_queries))
+
+    def test_writes_of_the_indexer_invalidate_the_run_permission_metadata(self):
+        self.assertFalse(model.get_run_permission_metadata('run-1')['published'])
+
+        modeldb.Review.objects.filter(run__run_id='run-1').update(published=True)
+        dbops.update_leaderboard_entries(['run-1'])
+        self.assertTrue(model.get_run_permission_metadata('run-1')['published'])
+
+        modeldb.Review.objects.filter(run__run_id='run-1').update(published=False)
+        model.invalidate_all_permission_metadata()
+        self.assertFalse(model.get_run_permission_metadata('run-1')['published'])
+
+    def test_reviews_invalidate_the_run_permission_metadata(self):
+        self.assertFalse(model.get_run_permission_metadata('run-1')['published'])
+
+        model.update_review('dataset-1', 'example_participant', 'run-1', published=True)
+
+        self.assertTrue(model.get_run_permission_metadata('run-1')['published'])
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
@@ -0,0 +1,76 @@
+from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from utils_for_testing import set_up_tira_environment
+from tira.tira_model import model as tira_model
+import tira.model as modeldb
+
+from datetime import datetime
+
+#Used for some tests
+now = datetime.now().strftime("%Y%m%d")
+dataset_id = f'dataset-1-{now}-training'
+
+
+def add_upload_run_with_evaluation(run_number):
+    dataset = modeldb.Dataset.objects.get(dataset_id=dataset_id)
+    upload = modeldb.Upload.objects.get(vm__vm_id='example_participant', task__task_id='shared-task-1')
+    run = modeldb.Run.objects.create(run_id=f'upload-{run_number}', upload=upload, input_dataset=dataset)
+    evaluation = modeldb.Run.objects.create(run_id=f'eval-of-upload-{run_number}', input_run=run,
+                                            input_dataset=dataset)
+    modeldb.Review.objects.create(run=run)
+    modeldb.Review.objects.create(run=evaluation)
+
+
+def count_queries(f):
+    with CaptureQueriesContext(connection) as queries:
+        ret = f()
+
+    return len(queries), ret
+
+
+class TestRunsWithReviewsQueryCount(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        set_up_tira_environment()
+
+    def test_evaluation_runs_follow_their_input_runs(self):
+        add_upload_run_with_evaluation(1)
+        add_upload_run_with_evaluation(2)
+
+        runs = tira_model.get_upload_with_runs('shared-task-1', 'example_participant')['runs']
+        actual = [i['run_id'] for i in runs]
+
+        self.assertEqual(5, len(actual))
+        self.assertEqual(actual.index('upload-1') + 1, actual.index('eval-of-upload-1'))
+        self.assertEqual(actual.index('upload-2') + 1, actual.index('eval-of-upload-2'))
+        self.assertTrue(all(i['is_upload'] for i in runs))
+
+    def test_number_of_queries_for_vms_with_reviews_does_not_grow_with_the_number_of_runs(self):
+        add_upload_run_with_evaluation(1)
+        queries_for_one_run, _ = count_queries(lambda: tira_model.get_vms_with_reviews(dataset_id))
+
+        for i in range(2, 21):
+            add_upload_run_with_evaluation(i)
+        queries_for_many_runs, actual = count_queries(lambda: tira_model.get_vms_with_reviews(dataset_id))
+
+        self.assertEqual(1, len(actual))
+        self.assertEqual(41, len(actual[0]['runs']))
+        self.assertEqual(queries_for_one_run, queries_for_many_runs)
+
+    def test_number_of_queries_for_upload_with_runs_does_not_grow_with_the_number_of_runs(self):
+        add_upload_run_with_evaluation(1)
+        queries_for_one_run, _ = count_queries(
+            lambda: tira_model.get_upload_with_runs('shared-task-1', 'example_participant'))
+
+        for i in range(2, 21):
+            add_upload_run_with_evaluation(i)
+
+        queries_for_many_runs, _ = count_queries(
+            lambda: tira_model.get_upload_with_runs('shared-task-1', 'example_participant'))
+
+        self.assertEqual(queries_for_one_run, queries_for_many_runs)
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
@@ -89,6 +89,7 @@ def mock_request(groups, url_pattern, method='GET', body=None, params=None):
         'CSRF_COOKIE': 'aasa',
     }
     ret.current_app = 'tira'
+    ret.GET = {}
     if method:
         ret.method = method
     if body:
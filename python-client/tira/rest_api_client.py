@@ -95,6 +95,20 @@ class Client():
 
         return pd.DataFrame(ret)
 
+    def export_evaluations(self, task, datasets=None):
+        """ All evaluations of the task (or of the given datasets of the task) joined with their submissions in one
+        request. Only available to organizers of the task and admins. """
+        params = {'format': 'ndjson'}
+        if datasets:
+            params['datasets'] = ','.join(datasets)
+
+        resp = requests.get('https://www.tira.io/api/export/evaluations/' + task, params=params, stream=True,
+                            headers={"Api-Key": self.api_key})
+        if resp.status_code != 200:
+            raise ValueError('Got statuscode ', resp.status_code, 'for the export of ', task, '. Got', resp)
+
+        return pd.DataFrame([json.loads(i) for i in resp.iter_lines() if i])
+
     def run_was_already_executed_on_dataset(self, approach, dataset):
         return self.get_run_execution_or_none(approach, dataset) is not None
 
@@ -159,12 +173,29 @@ class Client():
         return ret
 
     def download_and_extract_zip(self, url, target_dir):
+        # Retries resume the download with a range request if the zip did not change (same ETag) in the meantime
+        content, etag = bytearray(), None
         for i in range(self.failsave_retries):
             try:
-                r = requests.get(url, headers={"Api-Key": self.api_key})
-                z = zipfile.ZipFile(io.BytesIO(r.content))
+                headers = {"Api-Key": self.api_key}
+                if content and etag:
+                    headers['Range'] = f'bytes={len(content)}-'
+                    headers['If-Range'] = etag
+
+                r = requests.get(url, headers=headers, stream=True)
+                if r.status_code == 416:
+                    content, etag = bytearray(), None
+                r.raise_for_status()
+                if r.status_code != 206 or not r.headers.get('Content-Range', '').startswith(f'bytes {len(content)}-'):
+                    content = bytearray()
+                etag = r.headers.get('ETag')
+
+                for chunk in r.iter_content(chunk_size=1024*1024):
+                    content += chunk
+
+                z = zipfile.ZipFile(io.BytesIO(content))
                 z.extractall(target_dir)
-                
+
                 return
             except:
                 sleep_time = 1+int(random()*self.failsave_max_delay)
@@ -1,6 +1,9 @@
 import os
 import json
 import gzip
+import hashlib
+import mmap
+import struct
 
 
 def ensure_pyterrier_is_loaded():
@@ -91,6 +94,99 @@ def load_rerank_data(default_input, load_default_text=True):
             return all_lines_to_pandas(input_file, load_default_text)
 
 
+class TiraDocstore(object):
+    """ Random access to the documents of a dataset by docno in documents.docstore (written by the ir_datasets loader of
+    TIRA with --docstore true). The file is memory-mapped and a lookup decompresses a single block of documents, so
+    documents can be fetched without scanning documents.jsonl. Requires the zstandard package (pip install tira[docstore]).
+    """
+    MAGIC = b'TIRADOCS'
+    VERSION = 1
+    HEADER = struct.Struct('<8sIIQQQQQQQ')
+    RECORD = struct.Struct('<QIIIIQ')
+
+    def __init__(self, path):
+        import zstandard
+
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, self.count, self.num_blocks, self.num_buckets, self.block_offsets, self.buckets, \
+            self.records, self.docnos = self.HEADER.unpack_from(self.mm, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError('The file {} is not a docstore of version {}.'.format(path, self.VERSION))
+        self.decompressor = zstandard.ZstdDecompressor()
+        self.cached_block = (None, None)
+
+    def __len__(self):
+        return self.count
+
+    def _block(self, block):
+        if self.cached_block[0] != block:
+            start, end = struct.unpack_from('<QQ', self.mm, self.block_offsets + 8 * block)
+            self.cached_block = (block, self.decompressor.decompress(self.mm[start:end]))
+
+        return self.cached_block[1]
+
+    def _locate(self, docno):
+        """ The (block, offset, length) of the docno or None if the docno is not in the docstore. """
+        docno = str(docno).encode('utf-8')
+        h = int.from_bytes(hashlib.blake2b(docno, digest_size=8).digest(), 'little')
+        start, end = struct.unpack_from('<QQ', self.mm, self.buckets + 8 * (h % self.num_buckets))
+
+        for i in range(start, end):
+            record_hash, block, offset, length, docno_length, docno_offset = \
+                self.RECORD.unpack_from(self.mm, self.records + self.RECORD.size * i)
+            if record_hash == h and self.mm[self.docnos + docno_offset:self.docnos + docno_offset + docno_length] == docno:
+                return block, offset, length
+
+        return None
+
+    def get_line(self, docno):
+        """ The line of documents.jsonl of the docno or None if the docno is not in the docstore. """
+        location = self._locate(docno)
+        if location is None:
+            return None
+
+        block, offset, length = location
+        return self._block(block)[offset:offset + length].decode('utf-8').rstrip('\n')
+
+    def get(self, docno):
+        """ The document of the docno (a dict with docno, text, and optionally original_document) or None. """
+        line = self.get_line(docno)
+        return json.loads(line) if line is not None else None
+
+    def get_many(self, docnos):
+        """ The documents of the docnos as dict from docno to document, docnos not in the docstore are omitted.
+        The docnos are looked up in the order of their blocks, so each block is decompressed once. """
+        located = sorted((location, docno) for docno, location in ((i, self._locate(i)) for i in set(str(i) for i in docnos))
+                         if location is not None)
+
+        return {docno: json.loads(self._block(block)[offset:offset + length].decode('utf-8'))
+                for (block, offset, length), docno in located}
+
+    def __contains__(self, docno):
+        return self._locate(docno) is not None
+
+    def close(self):
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def load_docstore(default_input):
+    """ The TiraDocstore of the documents in the input directory (or of the documents.docstore file default_input). """
+    default_input = get_input_directory_and_output_directory(default_input)[0]
+
+    if not default_input.endswith('documents.docstore'):
+        default_input = os.path.join(default_input, 'documents.docstore')
+
+    return TiraDocstore(default_input)
+
+
 def persist_and_normalize_run(run, system_name, output_file, depth=1000):
     if not output_file.endswith('run.txt'):
         output_file = output_file + '/run.txt'